@@ -0,0 +1,117 @@
+"""initial schema
+
+Tables as created by Base.metadata.create_all before migrations existed.
+Databases created that way should be stamped instead of upgraded:
+
+    alembic stamp 0001
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_table(
+        "categories",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("name", sa.String(100)),
+        sa.Column("description", sa.Text(), nullable=True),
+    )
+    op.create_index("ix_categories_id", "categories", ["id"])
+    op.create_index("ix_categories_name", "categories", ["name"], unique=True)
+
+    op.create_table(
+        "products",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("name", sa.String(200)),
+        sa.Column("description", sa.Text(), nullable=True),
+        sa.Column("price", sa.Float(), nullable=False),
+        sa.Column("sku", sa.String(50)),
+        sa.Column("category_id", sa.Integer(), sa.ForeignKey("categories.id")),
+        sa.Column("created_at", sa.DateTime()),
+        sa.Column("updated_at", sa.DateTime()),
+    )
+    op.create_index("ix_products_id", "products", ["id"])
+    op.create_index("ix_products_name", "products", ["name"])
+    op.create_index("ix_products_sku", "products", ["sku"], unique=True)
+
+    op.create_table(
+        "inventory",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("product_id", sa.Integer(), sa.ForeignKey("products.id"), unique=True),
+        sa.Column("quantity", sa.Integer()),
+        sa.Column("low_stock_threshold", sa.Integer()),
+        sa.Column("last_restock_date", sa.DateTime()),
+        sa.Column("created_at", sa.DateTime()),
+        sa.Column("updated_at", sa.DateTime()),
+    )
+    op.create_index("ix_inventory_id", "inventory", ["id"])
+
+    op.create_table(
+        "inventory_history",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("inventory_id", sa.Integer(), sa.ForeignKey("inventory.id")),
+        sa.Column("previous_quantity", sa.Integer()),
+        sa.Column("new_quantity", sa.Integer()),
+        sa.Column("change_date", sa.DateTime()),
+        sa.Column("change_reason", sa.String(200), nullable=True),
+        sa.Column("created_at", sa.DateTime()),
+        sa.Column("updated_at", sa.DateTime()),
+    )
+    op.create_index("ix_inventory_history_id", "inventory_history", ["id"])
+
+    op.create_table(
+        "sales",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("order_id", sa.String(50)),
+        sa.Column("order_date", sa.DateTime()),
+        sa.Column("customer_id", sa.String(50)),
+        sa.Column("total_amount", sa.Float(), nullable=False),
+        sa.Column("platform", sa.String(50)),
+        sa.Column("status", sa.String(20)),
+        sa.Column("created_at", sa.DateTime()),
+        sa.Column("updated_at", sa.DateTime()),
+    )
+    op.create_index("ix_sales_id", "sales", ["id"])
+    op.create_index("ix_sales_order_id", "sales", ["order_id"], unique=True)
+    op.create_index("ix_sales_customer_id", "sales", ["customer_id"])
+    op.create_index("ix_sales_platform", "sales", ["platform"])
+
+    op.create_table(
+        "sale_items",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("sale_id", sa.Integer(), sa.ForeignKey("sales.id")),
+        sa.Column("product_id", sa.Integer(), sa.ForeignKey("products.id")),
+        sa.Column("quantity", sa.Integer(), nullable=False),
+        sa.Column("unit_price", sa.Float(), nullable=False),
+        sa.Column("subtotal", sa.Float(), nullable=False),
+        sa.Column("created_at", sa.DateTime()),
+    )
+    op.create_index("ix_sale_items_id", "sale_items", ["id"])
+
+    op.create_table(
+        "sales_daily_rollup",
+        sa.Column("day", sa.Date(), primary_key=True),
+        sa.Column("platform", sa.String(50), primary_key=True),
+        sa.Column("category_id", sa.Integer(), primary_key=True),
+        sa.Column("revenue", sa.Float(), nullable=False),
+        sa.Column("order_count", sa.Integer(), nullable=False),
+        sa.Column("units", sa.Integer(), nullable=False),
+        sa.Column("updated_at", sa.DateTime()),
+    )
+
+def downgrade():
+    op.drop_table("sales_daily_rollup")
+    op.drop_table("sale_items")
+    op.drop_table("sales")
+    op.drop_table("inventory_history")
+    op.drop_table("inventory")
+    op.drop_table("products")
+    op.drop_table("categories")
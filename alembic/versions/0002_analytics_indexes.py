@@ -0,0 +1,58 @@
+"""analytics indexes
+
+Composite and covering indexes for the query shapes in sales_service:
+- sales (order_date, platform) INCLUDE (total_amount): date-window totals and
+  per-platform revenue without heap lookups
+- sale_items (sale_id): joins from sales to their items
+- sale_items (product_id, sale_id): top products and category joins
+- partial inventory index for rows at or below their low-stock threshold
+
+Indexes are built CONCURRENTLY so existing tables stay writable.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_sales_order_date_platform", "sales", ["order_date", "platform"],
+            postgresql_include=["total_amount"],
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        op.create_index(
+            "ix_sale_items_sale_id", "sale_items", ["sale_id"],
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        op.create_index(
+            "ix_sale_items_product_id_sale_id", "sale_items", ["product_id", "sale_id"],
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        op.create_index(
+            "ix_inventory_low_stock", "inventory", ["id"],
+            postgresql_include=["product_id", "quantity", "low_stock_threshold"],
+            postgresql_where=sa.text("quantity <= low_stock_threshold"),
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for name, table in (
+            ("ix_inventory_low_stock", "inventory"),
+            ("ix_sale_items_product_id_sale_id", "sale_items"),
+            ("ix_sale_items_sale_id", "sale_items"),
+            ("ix_sales_order_date_platform", "sales"),
+        ):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
@@ -0,0 +1,58 @@
+"""sale item facts
+
+Denormalize products.category_id and sales.order_date onto sale_items so
+category-filtered analytics read one table:
+- add and backfill sale_items.category_id / sale_items.order_date
+- index (category_id, order_date) INCLUDE (subtotal, sale_id)
+- recompute the per-category rollup rows from line-item subtotals; they used
+  to add the order total once per matching item
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.add_column("sale_items", sa.Column("category_id", sa.Integer(), sa.ForeignKey("categories.id"), nullable=True))
+    op.add_column("sale_items", sa.Column("order_date", sa.DateTime(), nullable=True))
+    op.execute("""
+        UPDATE sale_items
+        SET category_id = products.category_id, order_date = sales.order_date
+        FROM sales, products
+        WHERE sales.id = sale_items.sale_id AND products.id = sale_items.product_id
+    """)
+
+    op.execute("DELETE FROM sales_daily_rollup WHERE category_id <> 0")
+    op.execute("""
+        INSERT INTO sales_daily_rollup (day, platform, category_id, revenue, order_count, units, updated_at)
+        SELECT date(sale_items.order_date), coalesce(sales.platform, ''), sale_items.category_id,
+               sum(sale_items.subtotal), count(DISTINCT sale_items.sale_id), sum(sale_items.quantity), now()
+        FROM sale_items JOIN sales ON sales.id = sale_items.sale_id
+        WHERE sale_items.category_id IS NOT NULL
+        GROUP BY date(sale_items.order_date), coalesce(sales.platform, ''), sale_items.category_id
+    """)
+
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_sale_items_category_id_order_date", "sale_items", ["category_id", "order_date"],
+            postgresql_include=["subtotal", "sale_id"],
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+    op.execute("ANALYZE sale_items")
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            "ix_sale_items_category_id_order_date", table_name="sale_items",
+            postgresql_concurrently=True, if_exists=True,
+        )
+    op.drop_column("sale_items", "order_date")
+    op.drop_column("sale_items", "category_id")
@@ -0,0 +1,43 @@
+"""product daily sales view
+
+Materialized per-day, per-product sale item totals for the top-products part
+of the sales summary, with the unique index REFRESH ... CONCURRENTLY needs,
+and the table recording when each view was last refreshed.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_table(
+        "materialized_view_refreshes",
+        sa.Column("view_name", sa.String(100), primary_key=True),
+        sa.Column("refreshed_at", sa.DateTime(), nullable=False),
+    )
+    op.execute("""
+        CREATE MATERIALIZED VIEW IF NOT EXISTS product_daily_sales AS
+        SELECT date(order_date) AS day, product_id, sum(quantity) AS quantity, sum(subtotal) AS revenue
+        FROM sale_items
+        WHERE order_date IS NOT NULL
+        GROUP BY date(order_date), product_id
+    """)
+    op.execute(
+        "CREATE UNIQUE INDEX IF NOT EXISTS ux_product_daily_sales_day_product_id "
+        "ON product_daily_sales (day, product_id)"
+    )
+    op.execute(
+        "INSERT INTO materialized_view_refreshes (view_name, refreshed_at) "
+        "VALUES ('product_daily_sales', now()) ON CONFLICT (view_name) DO NOTHING"
+    )
+
+def downgrade():
+    op.execute("DROP MATERIALIZED VIEW IF EXISTS product_daily_sales")
+    op.drop_table("materialized_view_refreshes")
@@ -0,0 +1,100 @@
+"""inventory history partitions
+
+Turn inventory_history into a table range-partitioned by month on
+change_date, with monthly partitions from the oldest change to
+PARTITION_MONTHS_AHEAD months ahead, an (inventory_id, change_date, id) index
+for the paginated history, and the inventory_history_daily table old months
+are compacted into. The partition key joins the primary key and change_date
+becomes NOT NULL; rows without one take their created_at.
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18
+"""
+from datetime import date
+from alembic import op
+import sqlalchemy as sa
+from app import partitions
+
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+COLUMNS = "id, inventory_id, previous_quantity, new_quantity, change_date, change_reason, created_at, updated_at"
+
+def upgrade():
+    op.execute("ALTER TABLE inventory_history RENAME TO inventory_history_unpartitioned")
+    op.execute("ALTER TABLE inventory_history_unpartitioned RENAME CONSTRAINT inventory_history_pkey TO inventory_history_unpartitioned_pkey")
+    op.execute("""
+        CREATE TABLE inventory_history (
+            id integer NOT NULL DEFAULT nextval('inventory_history_id_seq'),
+            inventory_id integer REFERENCES inventory (id),
+            previous_quantity integer,
+            new_quantity integer,
+            change_date timestamp NOT NULL,
+            change_reason varchar(200),
+            created_at timestamp,
+            updated_at timestamp,
+            PRIMARY KEY (id, change_date)
+        ) PARTITION BY RANGE (change_date)
+    """)
+    op.execute(
+        "CREATE INDEX ix_inventory_history_inventory_id_change_date "
+        "ON inventory_history (inventory_id, change_date, id)"
+    )
+
+    bind = op.get_bind()
+    oldest = bind.execute(sa.text(
+        "SELECT min(coalesce(change_date, created_at)) FROM inventory_history_unpartitioned"
+    )).scalar()
+    current = partitions.month_start(date.today())
+    partitions.create_monthly_partitions(
+        bind, "inventory_history",
+        partitions.month_start(oldest) if oldest else current,
+        partitions.add_months(current, partitions.PARTITION_MONTHS_AHEAD)
+    )
+    op.execute(f"""
+        INSERT INTO inventory_history ({COLUMNS})
+        SELECT id, inventory_id, previous_quantity, new_quantity, coalesce(change_date, created_at, now()),
+               change_reason, created_at, updated_at
+        FROM inventory_history_unpartitioned
+    """)
+    op.execute("ALTER SEQUENCE inventory_history_id_seq OWNED BY inventory_history.id")
+    op.execute("DROP TABLE inventory_history_unpartitioned")
+    op.execute("ANALYZE inventory_history")
+
+    op.create_table(
+        "inventory_history_daily",
+        sa.Column("inventory_id", sa.Integer(), sa.ForeignKey("inventory.id"), primary_key=True),
+        sa.Column("day", sa.Date(), primary_key=True),
+        sa.Column("changes", sa.Integer(), nullable=False),
+        sa.Column("opening_quantity", sa.Integer()),
+        sa.Column("closing_quantity", sa.Integer()),
+        sa.Column("min_quantity", sa.Integer()),
+        sa.Column("max_quantity", sa.Integer()),
+        sa.Column("units_added", sa.Integer(), nullable=False),
+        sa.Column("units_removed", sa.Integer(), nullable=False),
+    )
+
+def downgrade():
+    # Compacted months are not expanded back into per-change rows
+    op.drop_table("inventory_history_daily")
+    op.execute("ALTER TABLE inventory_history RENAME TO inventory_history_partitioned")
+    op.execute("ALTER TABLE inventory_history_partitioned RENAME CONSTRAINT inventory_history_pkey TO inventory_history_partitioned_pkey")
+    op.execute("""
+        CREATE TABLE inventory_history (
+            id integer PRIMARY KEY DEFAULT nextval('inventory_history_id_seq'),
+            inventory_id integer REFERENCES inventory (id),
+            previous_quantity integer,
+            new_quantity integer,
+            change_date timestamp,
+            change_reason varchar(200),
+            created_at timestamp,
+            updated_at timestamp
+        )
+    """)
+    op.execute(f"INSERT INTO inventory_history ({COLUMNS}) SELECT {COLUMNS} FROM inventory_history_partitioned")
+    op.execute("ALTER SEQUENCE inventory_history_id_seq OWNED BY inventory_history.id")
+    op.execute("DROP TABLE inventory_history_partitioned")
+    op.create_index("ix_inventory_history_id", "inventory_history", ["id"])
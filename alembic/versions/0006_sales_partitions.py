@@ -0,0 +1,199 @@
+"""sales partitions
+
+Turn sales and sale_items into tables range-partitioned by month on
+order_date, with monthly partitions from the oldest order to
+PARTITION_MONTHS_AHEAD months ahead. The partition key joins both primary
+keys and becomes NOT NULL; sale items take the order date of their sale and
+reference it by (sale_id, order_date). A partitioned table can't enforce a
+unique order_id on its own, so the order ids move to sale_order_ids, kept in
+step by a trigger on sales. The product_daily_sales view reads sale_items and
+is recreated on top of the new table.
+
+Rewrites both tables while holding exclusive locks: run it in a maintenance window.
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18
+"""
+from datetime import date
+from alembic import op
+import sqlalchemy as sa
+from app import partitions
+from app.models.sales import SALES_ORDER_ID_FUNCTION, SALES_ORDER_ID_TRIGGER
+
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+SALE_COLUMNS = "id, order_id, order_date, customer_id, total_amount, platform, status, created_at, updated_at"
+ITEM_COLUMNS = "id, sale_id, product_id, quantity, unit_price, subtotal, category_id, order_date, created_at"
+
+OLD_INDEXES = [
+    "ix_sales_id", "ix_sales_order_id", "ix_sales_customer_id", "ix_sales_platform", "ix_sales_order_date_platform",
+    "ix_sale_items_id", "ix_sale_items_sale_id", "ix_sale_items_product_id_sale_id",
+    "ix_sale_items_category_id_order_date",
+]
+
+def create_product_daily_sales():
+    op.execute("""
+        CREATE MATERIALIZED VIEW product_daily_sales AS
+        SELECT date(order_date) AS day, product_id, sum(quantity) AS quantity, sum(subtotal) AS revenue
+        FROM sale_items
+        WHERE order_date IS NOT NULL
+        GROUP BY date(order_date), product_id
+    """)
+    op.execute("CREATE UNIQUE INDEX ux_product_daily_sales_day_product_id ON product_daily_sales (day, product_id)")
+
+def upgrade():
+    op.execute("DROP MATERIALIZED VIEW IF EXISTS product_daily_sales")
+    for table in ("sales", "sale_items"):
+        op.execute(f"ALTER TABLE {table} RENAME TO {table}_unpartitioned")
+        op.execute(f"ALTER TABLE {table}_unpartitioned RENAME CONSTRAINT {table}_pkey TO {table}_unpartitioned_pkey")
+    for index in OLD_INDEXES:
+        op.execute(f"DROP INDEX IF EXISTS {index}")
+
+    op.execute("""
+        CREATE TABLE sales (
+            id integer NOT NULL DEFAULT nextval('sales_id_seq'),
+            order_id varchar(50),
+            order_date timestamp NOT NULL,
+            customer_id varchar(50),
+            total_amount double precision NOT NULL,
+            platform varchar(50),
+            status varchar(20),
+            created_at timestamp,
+            updated_at timestamp,
+            PRIMARY KEY (id, order_date)
+        ) PARTITION BY RANGE (order_date)
+    """)
+    op.execute("""
+        CREATE TABLE sale_items (
+            id integer NOT NULL DEFAULT nextval('sale_items_id_seq'),
+            sale_id integer,
+            product_id integer REFERENCES products (id),
+            quantity integer NOT NULL,
+            unit_price double precision NOT NULL,
+            subtotal double precision NOT NULL,
+            category_id integer REFERENCES categories (id),
+            order_date timestamp NOT NULL,
+            created_at timestamp,
+            PRIMARY KEY (id, order_date),
+            FOREIGN KEY (sale_id, order_date) REFERENCES sales (id, order_date)
+        ) PARTITION BY RANGE (order_date)
+    """)
+
+    bind = op.get_bind()
+    oldest = bind.execute(sa.text(
+        "SELECT min(coalesce(order_date, created_at)) FROM sales_unpartitioned"
+    )).scalar()
+    current = partitions.month_start(date.today())
+    for table in ("sales", "sale_items"):
+        partitions.create_monthly_partitions(
+            bind, table,
+            partitions.month_start(oldest) if oldest else current,
+            partitions.add_months(current, partitions.PARTITION_MONTHS_AHEAD)
+        )
+
+    op.execute(f"""
+        INSERT INTO sales ({SALE_COLUMNS})
+        SELECT id, order_id, coalesce(order_date, created_at, now()), customer_id, total_amount, platform,
+               status, created_at, updated_at
+        FROM sales_unpartitioned
+    """)
+    op.execute(f"""
+        INSERT INTO sale_items ({ITEM_COLUMNS})
+        SELECT items.id, items.sale_id, items.product_id, items.quantity, items.unit_price, items.subtotal,
+               items.category_id, coalesce(sales.order_date, items.order_date, items.created_at, now()),
+               items.created_at
+        FROM sale_items_unpartitioned items
+        LEFT JOIN sales ON sales.id = items.sale_id
+    """)
+    # Items first, they reference the old sales table
+    for table in ("sale_items", "sales"):
+        op.execute(f"ALTER SEQUENCE {table}_id_seq OWNED BY {table}.id")
+        op.execute(f"DROP TABLE {table}_unpartitioned")
+
+    op.create_table(
+        "sale_order_ids",
+        sa.Column("order_id", sa.String(50), primary_key=True),
+        sa.Column("sale_id", sa.Integer(), nullable=False),
+        sa.Column("order_date", sa.DateTime(), nullable=False),
+    )
+    op.execute(
+        "INSERT INTO sale_order_ids (order_id, sale_id, order_date) "
+        "SELECT order_id, id, order_date FROM sales WHERE order_id IS NOT NULL"
+    )
+    op.execute(SALES_ORDER_ID_FUNCTION)
+    op.execute(SALES_ORDER_ID_TRIGGER)
+
+    # Created on the parents, so every partition gets them, including future ones
+    op.create_index("ix_sales_order_id", "sales", ["order_id"])
+    op.create_index("ix_sales_customer_id", "sales", ["customer_id"])
+    op.create_index("ix_sales_platform", "sales", ["platform"])
+    op.create_index("ix_sales_order_date_platform", "sales", ["order_date", "platform"],
+                    postgresql_include=["total_amount"])
+    op.create_index("ix_sale_items_sale_id", "sale_items", ["sale_id"])
+    op.create_index("ix_sale_items_product_id_sale_id", "sale_items", ["product_id", "sale_id"])
+    op.create_index("ix_sale_items_category_id_order_date", "sale_items", ["category_id", "order_date"],
+                    postgresql_include=["subtotal", "sale_id"])
+
+    create_product_daily_sales()
+    op.execute("ANALYZE sales")
+    op.execute("ANALYZE sale_items")
+
+def downgrade():
+    op.execute("DROP MATERIALIZED VIEW IF EXISTS product_daily_sales")
+    op.execute("DROP TRIGGER IF EXISTS sales_order_id ON sales")
+    op.execute("DROP FUNCTION IF EXISTS sales_track_order_id()")
+    op.drop_table("sale_order_ids")
+    for table in ("sale_items", "sales"):
+        op.execute(f"ALTER TABLE {table} RENAME TO {table}_partitioned")
+        op.execute(f"ALTER TABLE {table}_partitioned RENAME CONSTRAINT {table}_pkey TO {table}_partitioned_pkey")
+    for index in OLD_INDEXES:
+        op.execute(f"DROP INDEX IF EXISTS {index}")
+
+    op.execute("""
+        CREATE TABLE sales (
+            id integer PRIMARY KEY DEFAULT nextval('sales_id_seq'),
+            order_id varchar(50),
+            order_date timestamp,
+            customer_id varchar(50),
+            total_amount double precision NOT NULL,
+            platform varchar(50),
+            status varchar(20),
+            created_at timestamp,
+            updated_at timestamp
+        )
+    """)
+    op.execute("""
+        CREATE TABLE sale_items (
+            id integer PRIMARY KEY DEFAULT nextval('sale_items_id_seq'),
+            sale_id integer REFERENCES sales (id),
+            product_id integer REFERENCES products (id),
+            quantity integer NOT NULL,
+            unit_price double precision NOT NULL,
+            subtotal double precision NOT NULL,
+            category_id integer REFERENCES categories (id),
+            order_date timestamp,
+            created_at timestamp
+        )
+    """)
+    op.execute(f"INSERT INTO sales ({SALE_COLUMNS}) SELECT {SALE_COLUMNS} FROM sales_partitioned")
+    op.execute(f"INSERT INTO sale_items ({ITEM_COLUMNS}) SELECT {ITEM_COLUMNS} FROM sale_items_partitioned")
+    for table in ("sale_items", "sales"):
+        op.execute(f"ALTER SEQUENCE {table}_id_seq OWNED BY {table}.id")
+        op.execute(f"DROP TABLE {table}_partitioned")
+
+    op.create_index("ix_sales_id", "sales", ["id"])
+    op.create_index("ix_sales_order_id", "sales", ["order_id"], unique=True)
+    op.create_index("ix_sales_customer_id", "sales", ["customer_id"])
+    op.create_index("ix_sales_platform", "sales", ["platform"])
+    op.create_index("ix_sales_order_date_platform", "sales", ["order_date", "platform"],
+                    postgresql_include=["total_amount"])
+    op.create_index("ix_sale_items_id", "sale_items", ["id"])
+    op.create_index("ix_sale_items_sale_id", "sale_items", ["sale_id"])
+    op.create_index("ix_sale_items_product_id_sale_id", "sale_items", ["product_id", "sale_id"])
+    op.create_index("ix_sale_items_category_id_order_date", "sale_items", ["category_id", "order_date"],
+                    postgresql_include=["subtotal", "sale_id"])
+    create_product_daily_sales()
@@ -0,0 +1,45 @@
+"""analytics jobs
+
+Table of the analytics reports computed in the background by
+services.analytics_jobs, with their results until they expire. A partial
+unique index on the report key allows only one in-flight job per report and
+parameters.
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision = "0007"
+down_revision = "0006"
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_table(
+        "analytics_jobs",
+        sa.Column("id", sa.String(32), primary_key=True),
+        sa.Column("report", sa.String(20), nullable=False),
+        sa.Column("key", sa.Text(), nullable=False),
+        sa.Column("params", postgresql.JSONB(), nullable=False),
+        sa.Column("status", sa.String(20), nullable=False),
+        sa.Column("result", postgresql.JSONB(), nullable=True),
+        sa.Column("error", sa.Text(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("started_at", sa.DateTime(), nullable=True),
+        sa.Column("finished_at", sa.DateTime(), nullable=True),
+        sa.Column("expires_at", sa.DateTime(), nullable=True),
+    )
+    op.create_index(
+        "ux_analytics_jobs_key_in_flight", "analytics_jobs", ["key"], unique=True,
+        postgresql_where=sa.text("status IN ('pending', 'running')")
+    )
+    op.create_index("ix_analytics_jobs_expires_at", "analytics_jobs", ["expires_at"])
+
+def downgrade():
+    op.drop_index("ix_analytics_jobs_expires_at", table_name="analytics_jobs")
+    op.drop_index("ux_analytics_jobs_key_in_flight", table_name="analytics_jobs")
+    op.drop_table("analytics_jobs")
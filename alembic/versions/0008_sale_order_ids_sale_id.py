@@ -0,0 +1,21 @@
+"""sale_order_ids sale_id index
+
+Lets a sale be found from its id through sale_order_ids, which gives its
+order date and so the one partition of sales to read.
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-18
+"""
+from alembic import op
+
+revision = "0008"
+down_revision = "0007"
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_index("ix_sale_order_ids_sale_id", "sale_order_ids", ["sale_id"])
+
+def downgrade():
+    op.drop_index("ix_sale_order_ids_sale_id", table_name="sale_order_ids")
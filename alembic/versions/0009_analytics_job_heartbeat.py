@@ -0,0 +1,22 @@
+"""analytics job heartbeat
+
+Heartbeat of the jobs in flight, refreshed by the worker holding them, so a
+job lost with its worker is failed without waiting for ANALYTICS_JOB_TIMEOUT.
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0009"
+down_revision = "0008"
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.add_column("analytics_jobs", sa.Column("heartbeat_at", sa.DateTime(), nullable=True))
+
+def downgrade():
+    op.drop_column("analytics_jobs", "heartbeat_at")
@@ -1,16 +1,73 @@
-from sqlalchemy import create_engine
+import threading
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import NullPool
 import os
 from dotenv import load_dotenv
+from app import metrics
 
 load_dotenv()
 
 SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL")
 
-engine = create_engine(SQLALCHEMY_DATABASE_URL)
+# Serve the API through AsyncSession and async routers instead of the threadpool
+DATABASE_ASYNC = os.getenv("DATABASE_ASYNC", "false").lower() in ("1", "true", "yes")
+# str(URL) masks the password on SQLAlchemy 2.x, so it is rendered explicitly
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or make_url(
+    SQLALCHEMY_DATABASE_URL
+).set(drivername="postgresql+asyncpg").render_as_string(hide_password=False)
+DATABASE_POOL_SIZE = int(os.getenv("DATABASE_POOL_SIZE", "5"))
+DATABASE_MAX_OVERFLOW = int(os.getenv("DATABASE_MAX_OVERFLOW", "10"))
+
+# Optional read replica for the list and analytics endpoints; unset, they read the primary
+READ_REPLICA_URL = os.getenv("READ_REPLICA_URL")
+ASYNC_READ_REPLICA_URL = os.getenv("ASYNC_READ_REPLICA_URL") or (
+    make_url(READ_REPLICA_URL).set(drivername="postgresql+asyncpg").render_as_string(hide_password=False)
+    if READ_REPLICA_URL else None
+)
+READ_REPLICA_POOL_SIZE = int(os.getenv("READ_REPLICA_POOL_SIZE", str(DATABASE_POOL_SIZE)))
+READ_REPLICA_MAX_OVERFLOW = int(os.getenv("READ_REPLICA_MAX_OVERFLOW", str(DATABASE_MAX_OVERFLOW)))
+
+def _create_engine(url: str, name: str, pool_size: int, max_overflow: int, **kwargs):
+    if metrics.METRICS_ENABLED:
+        kwargs["poolclass"] = metrics.TimedQueuePool
+    created = create_engine(url, pool_size=pool_size, max_overflow=max_overflow, **kwargs)
+    if metrics.METRICS_ENABLED:
+        metrics.instrument_engine(created, name=name)
+    return created
+
+engine = _create_engine(SQLALCHEMY_DATABASE_URL, "primary", DATABASE_POOL_SIZE, DATABASE_MAX_OVERFLOW)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# The LISTEN connections of the background listeners are held for the life of
+# a worker. They are opened unpooled, so they don't take request pool slots or
+# show up in its wait metrics.
+listen_engine = create_engine(SQLALCHEMY_DATABASE_URL, poolclass=NullPool)
+
+# Set by services.replica_monitor while the replica is up and within
+# READ_REPLICA_MAX_LAG; reads go to the primary otherwise, and until the first check
+replica_available = threading.Event()
+
+def _mark_replica_down(exception_context):
+    # A lost or refused replica connection routes reads to the primary until the next good check
+    if exception_context.is_disconnect or exception_context.connection is None:
+        replica_available.clear()
+
+read_engine = None
+ReadSessionLocal = None
+
+if READ_REPLICA_URL:
+    # Read-only sessions, so a write routed to the replica by mistake fails even
+    # when it is a plain second database rather than a hot standby
+    read_engine = _create_engine(
+        READ_REPLICA_URL, "replica", READ_REPLICA_POOL_SIZE, READ_REPLICA_MAX_OVERFLOW,
+        pool_pre_ping=True, execution_options={"postgresql_readonly": True}
+    )
+    event.listen(read_engine, "handle_error", _mark_replica_down)
+    ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
+
 Base = declarative_base()
 
 def get_db():
@@ -18,4 +75,94 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+def read_session():
+    """
+    A session on the read replica while it is available, otherwise on the primary
+    """
+    if ReadSessionLocal is not None and replica_available.is_set():
+        return ReadSessionLocal()
+    return SessionLocal()
+
+def get_read_db():
+    """
+    Session for reads that may trail the latest writes by up to
+    READ_REPLICA_MAX_LAG seconds. Writes and lookups that must see the
+    caller's own writes use get_db.
+    """
+    db = read_session()
+    try:
+        yield db
+    finally:
+        db.close()
+
+# The async engine needs asyncpg, so it is only created when the async path is enabled
+async_engine = None
+AsyncSessionLocal = None
+async_read_engine = None
+AsyncReadSessionLocal = None
+
+if DATABASE_ASYNC:
+    from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+    async_engine = create_async_engine(
+        ASYNC_DATABASE_URL, pool_size=DATABASE_POOL_SIZE, max_overflow=DATABASE_MAX_OVERFLOW
+    )
+    if metrics.METRICS_ENABLED:
+        metrics.instrument_engine(async_engine, name="async")
+    # Objects are serialized after commit, outside the session's greenlet, so they must not expire
+    AsyncSessionLocal = sessionmaker(
+        bind=async_engine,
+        class_=AsyncSession,
+        autocommit=False,
+        autoflush=False,
+        expire_on_commit=False
+    )
+
+    if ASYNC_READ_REPLICA_URL:
+        async_read_engine = create_async_engine(
+            ASYNC_READ_REPLICA_URL, pool_size=READ_REPLICA_POOL_SIZE, max_overflow=READ_REPLICA_MAX_OVERFLOW,
+            pool_pre_ping=True, execution_options={"postgresql_readonly": True}
+        )
+        if metrics.METRICS_ENABLED:
+            metrics.instrument_engine(async_read_engine, name="async_replica")
+        event.listen(async_read_engine.sync_engine, "handle_error", _mark_replica_down)
+        AsyncReadSessionLocal = sessionmaker(
+            bind=async_read_engine,
+            class_=AsyncSession,
+            autocommit=False,
+            autoflush=False,
+            expire_on_commit=False
+        )
+
+def reads_replica(db) -> bool:
+    """
+    Whether db, a Session or the sync session of an AsyncSession, reads from the replica
+    """
+    bind = db.get_bind()
+    return bind is read_engine or (async_read_engine is not None and bind is async_read_engine.sync_engine)
+
+def primary_session(db):
+    """
+    A new session on the primary usable where db is, for reads that must not
+    trail the latest writes: an AsyncSession's sync session gets one on the
+    async engine, so it runs in the same greenlet
+    """
+    if async_read_engine is not None and db.get_bind() is async_read_engine.sync_engine:
+        return Session(bind=async_engine.sync_engine)
+    return SessionLocal()
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+async def get_async_read_db():
+    """
+    Async counterpart of get_read_db
+    """
+    session_factory = AsyncSessionLocal
+    if AsyncReadSessionLocal is not None and replica_available.is_set():
+        session_factory = AsyncReadSessionLocal
+    async with session_factory() as db:
+        yield db
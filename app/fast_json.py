@@ -0,0 +1,24 @@
+"""
+Opt-in fast path for the large list endpoints.
+
+With FAST_JSON_RESPONSES enabled, list endpoints select plain column tuples
+shaped like their response schema and encode them with orjson into a ready
+Response. FastAPI does not validate or re-serialize a returned Response, so the
+ORM objects, orm_mode conversion and response_model validation are skipped,
+while the route keeps its response_model and the OpenAPI schema is unchanged.
+Values are emitted as stored, without the coercion the schema would apply.
+"""
+import os
+from typing import List, Optional
+import orjson
+from fastapi import Response
+from app.services import pagination
+
+FAST_JSON_RESPONSES = os.getenv("FAST_JSON_RESPONSES", "false").lower() in ("1", "true", "yes")
+
+def list_response(rows: List[dict], next_cursor: Optional[str] = None) -> Response:
+    """
+    JSON response for a list of rows, with the next page cursor header when there is one
+    """
+    headers = {pagination.NEXT_CURSOR_HEADER: next_cursor} if next_cursor else None
+    return Response(orjson.dumps(rows), media_type="application/json", headers=headers)
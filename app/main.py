@@ -1,8 +1,18 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from app.routers import products, inventory, sales
-from app.database import engine
-from app import models
+from app.database import engine, DATABASE_ASYNC
+from app.services import (
+    analytics_jobs, columnar_service, materialized_views, pagination, partition_maintenance, product_cache,
+    replica_monitor, stock_alerts
+)
+from app import metrics, models
+from app.routers import metrics as metrics_router
+
+# Async routers run on AsyncSession; the sync ones run on the threadpool
+if DATABASE_ASYNC:
+    from app.routers import async_products as products, async_inventory as inventory, async_sales as sales
+else:
+    from app.routers import products, inventory, sales
 
 # Create database tables
 models.Base.metadata.create_all(bind=engine)
@@ -20,12 +30,47 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[pagination.NEXT_CURSOR_HEADER],
 )
 
+# Per-route request, SQL, serialization and pool timings, exported on /metrics
+if metrics.METRICS_ENABLED:
+    app.add_middleware(metrics.MetricsMiddleware)
+
 # Include routers
 app.include_router(products.router)
 app.include_router(inventory.router)
 app.include_router(sales.router)
+app.include_router(metrics_router.router)
+
+# Keep the materialized analytics views fresh in the background
+if materialized_views.MATVIEW_REFRESH_ENABLED:
+    app.add_event_handler("startup", materialized_views.view_refresher.start)
+    app.add_event_handler("shutdown", materialized_views.view_refresher.stop)
+
+# Route reads to the replica while it is up and caught up
+app.add_event_handler("startup", replica_monitor.replica_monitor.start)
+app.add_event_handler("shutdown", replica_monitor.replica_monitor.stop)
+
+# Evict cached products when any worker writes them
+app.add_event_handler("startup", product_cache.product_cache_listener.start)
+app.add_event_handler("shutdown", product_cache.product_cache_listener.stop)
+
+# Reset the columnar analytics store when any worker changes a product's category
+app.add_event_handler("startup", columnar_service.columnar_reset_listener.start)
+app.add_event_handler("shutdown", columnar_service.columnar_reset_listener.stop)
+
+# Push low-stock alerts committed by any worker to this worker's streams
+app.add_event_handler("startup", stock_alerts.stock_alert_listener.start)
+app.add_event_handler("shutdown", stock_alerts.stock_alert_listener.stop)
+
+# The analytics job processes are started on the first job; stop them with the worker
+app.add_event_handler("shutdown", analytics_jobs.analytics_job_pool.stop)
+
+# Create upcoming partitions and compact old inventory history
+if partition_maintenance.PARTITION_MAINTENANCE_ENABLED:
+    app.add_event_handler("startup", partition_maintenance.partition_maintainer.start)
+    app.add_event_handler("shutdown", partition_maintenance.partition_maintainer.stop)
 
 @app.get("/")
 def read_root():
@@ -0,0 +1,294 @@
+"""
+Per-request instrumentation exported in Prometheus text format.
+
+MetricsMiddleware opens a RequestMetrics for every HTTP request; SQLAlchemy
+engine events and TimedQueuePool add statement counts, DB time and
+connection-pool wait to it, and InstrumentedRoute records the route template
+and the time spent serializing the endpoint's return value. When the request
+finishes the totals are observed into histograms labelled by route.
+
+Observations go to per-thread shards that only their own thread writes to, so
+the hot path takes no locks; /metrics sums the shards when it is scraped.
+Everything is per worker process, as usual for Prometheus multi-process setups.
+"""
+import bisect
+import functools
+import inspect
+import os
+import threading
+import time
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Optional, Tuple
+from fastapi.routing import APIRoute
+from sqlalchemy import event
+from sqlalchemy.pool import QueuePool
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() in ("1", "true", "yes")
+
+SECONDS_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+class RequestMetrics:
+    __slots__ = ("route", "method", "statements", "db_time", "serialization_time",
+                 "pool_wait", "checkouts", "endpoint_done")
+
+    def __init__(self, method: str):
+        self.route = "unmatched"
+        self.method = method
+        self.statements = 0
+        self.db_time = 0.0
+        self.serialization_time = 0.0
+        self.pool_wait = 0.0
+        self.checkouts = 0
+        self.endpoint_done = None
+
+_current_request: ContextVar[Optional[RequestMetrics]] = ContextVar("current_request_metrics", default=None)
+
+def current_request() -> Optional[RequestMetrics]:
+    return _current_request.get()
+
+class _Shard:
+    def __init__(self):
+        self.counters: Dict[Tuple, float] = {}
+        self.histograms: Dict[Tuple, list] = {}
+
+class Registry:
+    """
+    Counters and histograms keyed by (name, labels). Writers only touch their
+    thread's shard; readers merge all shards.
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+        self._shards: List[_Shard] = []
+        self._help: Dict[str, Tuple[str, str, tuple]] = {}
+        self._gauges: Dict[str, Tuple[str, List[Callable[[], List[Tuple[dict, float]]]]]] = {}
+
+    def _shard(self) -> _Shard:
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = self._local.shard = _Shard()
+            self._shards.append(shard)
+        return shard
+
+    def counter(self, name: str, help_text: str):
+        self._help[name] = ("counter", help_text, ())
+
+    def histogram(self, name: str, help_text: str, buckets: tuple):
+        self._help[name] = ("histogram", help_text, buckets)
+
+    def gauge(self, name: str, help_text: str, collect: Callable[[], List[Tuple[dict, float]]]):
+        """
+        Register a gauge whose samples are computed by collect() at scrape time.
+        Registering the same name again adds another collector.
+        """
+        self._gauges.setdefault(name, (help_text, []))[1].append(collect)
+
+    def inc(self, name: str, labels: tuple = (), amount: float = 1):
+        counters = self._shard().counters
+        key = (name, labels)
+        counters[key] = counters.get(key, 0) + amount
+
+    def observe(self, name: str, value: float, labels: tuple = ()):
+        histograms = self._shard().histograms
+        key = (name, labels)
+        entry = histograms.get(key)
+        if entry is None:
+            buckets = self._help[name][2]
+            entry = histograms[key] = [[0] * (len(buckets) + 1), 0.0]
+        entry[0][bisect.bisect_left(self._help[name][2], value)] += 1
+        entry[1] += value
+
+    def render(self) -> str:
+        counters: Dict[Tuple, float] = {}
+        histograms: Dict[Tuple, list] = {}
+        for shard in list(self._shards):
+            for key, value in list(shard.counters.items()):
+                counters[key] = counters.get(key, 0) + value
+            for key, (counts, total) in list(shard.histograms.items()):
+                merged = histograms.setdefault(key, [[0] * len(counts), 0.0])
+                merged[0] = [a + b for a, b in zip(merged[0], counts)]
+                merged[1] += total
+
+        lines = []
+        for name, (kind, help_text, buckets) in self._help.items():
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            if kind == "counter":
+                for (metric, labels), value in sorted(counters.items()):
+                    if metric == name:
+                        lines.append(f"{name}{_labels(labels)} {value:g}")
+                continue
+            for (metric, labels), (counts, total) in sorted(histograms.items()):
+                if metric != name:
+                    continue
+                cumulative = 0
+                for bound, count in zip(buckets, counts):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{_labels(labels + (('le', f'{bound:g}'),))} {cumulative}")
+                cumulative += counts[-1]
+                lines.append(f"{name}_bucket{_labels(labels + (('le', '+Inf'),))} {cumulative}")
+                lines.append(f"{name}_sum{_labels(labels)} {total:g}")
+                lines.append(f"{name}_count{_labels(labels)} {cumulative}")
+
+        for name, (help_text, collectors) in self._gauges.items():
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} gauge")
+            for collect in collectors:
+                for labels, value in collect():
+                    lines.append(f"{name}{_labels(tuple(labels.items()))} {value:g}")
+
+        return "\n".join(lines) + "\n"
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+def _labels(labels: tuple) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels) + "}"
+
+registry = Registry()
+registry.counter("http_requests_total", "HTTP requests by route, method and status")
+registry.histogram("http_request_duration_seconds", "Total request time", SECONDS_BUCKETS)
+registry.histogram("http_request_db_statements", "SQL statements executed per request", COUNT_BUCKETS)
+registry.histogram("http_request_db_seconds", "Time spent executing SQL per request", SECONDS_BUCKETS)
+registry.histogram("http_request_serialization_seconds", "Time spent serializing the response", SECONDS_BUCKETS)
+registry.histogram("http_request_pool_wait_seconds", "Time spent checking connections out of the pool per request", SECONDS_BUCKETS)
+registry.counter("db_pool_checkouts_total", "Connection pool checkouts by route")
+registry.histogram("db_pool_checkout_wait_seconds", "Wait time of individual pool checkouts", SECONDS_BUCKETS)
+
+class MetricsMiddleware:
+    """
+    ASGI middleware opening a RequestMetrics per HTTP request and recording it when done
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        metrics = RequestMetrics(scope["method"])
+        token = _current_request.set(metrics)
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            _current_request.reset(token)
+            _record(metrics, status, time.perf_counter() - started)
+
+def _record(metrics: RequestMetrics, status: int, duration: float):
+    labels = (("route", metrics.route), ("method", metrics.method))
+    registry.inc("http_requests_total", labels + (("status", str(status)),))
+    registry.observe("http_request_duration_seconds", duration, labels)
+    registry.observe("http_request_db_statements", metrics.statements, labels)
+    registry.observe("http_request_db_seconds", metrics.db_time, labels)
+    registry.observe("http_request_serialization_seconds", metrics.serialization_time, labels)
+    registry.observe("http_request_pool_wait_seconds", metrics.pool_wait, labels)
+    if metrics.checkouts:
+        registry.inc("db_pool_checkouts_total", labels, metrics.checkouts)
+
+class InstrumentedRoute(APIRoute):
+    """
+    APIRoute that labels the current request with its path template and times
+    response serialization (from the endpoint returning to the response being built)
+    """
+
+    def __init__(self, path: str, endpoint: Callable, **kwargs):
+        super().__init__(path, _mark_endpoint_done(endpoint), **kwargs)
+
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+        route_path = self.path
+
+        async def instrumented_handler(request):
+            metrics = _current_request.get()
+            if metrics is None:
+                return await handler(request)
+            metrics.route = route_path
+            response = await handler(request)
+            if metrics.endpoint_done is not None:
+                metrics.serialization_time += time.perf_counter() - metrics.endpoint_done
+            return response
+
+        return instrumented_handler
+
+def _mark_endpoint_done(endpoint: Callable):
+    # functools.wraps keeps the signature FastAPI inspects for parameters
+    if inspect.iscoroutinefunction(endpoint):
+        @functools.wraps(endpoint)
+        async def wrapper(*args, **kwargs):
+            result = await endpoint(*args, **kwargs)
+            _set_endpoint_done()
+            return result
+    else:
+        @functools.wraps(endpoint)
+        def wrapper(*args, **kwargs):
+            result = endpoint(*args, **kwargs)
+            _set_endpoint_done()
+            return result
+    return wrapper
+
+def _set_endpoint_done():
+    metrics = _current_request.get()
+    if metrics is not None:
+        metrics.endpoint_done = time.perf_counter()
+
+class TimedQueuePool(QueuePool):
+    """
+    QueuePool that charges the time spent waiting for a connection to the current request
+    """
+
+    def connect(self):
+        started = time.perf_counter()
+        connection = super().connect()
+        wait = time.perf_counter() - started
+        registry.observe("db_pool_checkout_wait_seconds", wait)
+        metrics = _current_request.get()
+        if metrics is not None:
+            metrics.pool_wait += wait
+            metrics.checkouts += 1
+        return connection
+
+def instrument_engine(engine, name: str = "primary"):
+    """
+    Count statements and SQL time for the current request and export pool gauges
+    """
+    sync_engine = getattr(engine, "sync_engine", engine)
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("metrics_query_start", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["metrics_query_start"].pop()
+        metrics = _current_request.get()
+        if metrics is not None:
+            metrics.statements += 1
+            metrics.db_time += time.perf_counter() - started
+
+    @event.listens_for(sync_engine, "handle_error")
+    def handle_error(exception_context):
+        connection = exception_context.connection
+        if connection is not None and connection.info.get("metrics_query_start"):
+            connection.info["metrics_query_start"].pop()
+
+    if hasattr(sync_engine.pool, "checkedout"):
+        # Looked up at scrape time, the engine replaces its pool on dispose()
+        registry.gauge(
+            "db_pool_checked_out",
+            "Connections currently checked out of the pool",
+            lambda: [({"engine": name}, sync_engine.pool.checkedout())]
+        )
@@ -1,4 +1,4 @@
 from app.models.category import Category
 from app.models.product import Product
-from app.models.inventory import Inventory
-from app.models.sales import Sale, SaleItem
\ No newline at end of file
+from app.models.inventory import Inventory, InventoryHistory, InventoryHistoryDaily
+from app.models.sales import Sale, SaleItem, SaleOrderId, SalesDailyRollup, MaterializedViewRefresh, AnalyticsJob, ProductDailySales
@@ -1,10 +1,19 @@
-from sqlalchemy import Column, Integer, DateTime, ForeignKey, String
+from sqlalchemy import Column, Integer, Date, DateTime, ForeignKey, String, Index, event, text
 from sqlalchemy.orm import relationship
 from app.database import Base
+from app import partitions
 from datetime import datetime
 
 class Inventory(Base):
     __tablename__ = "inventory"
+    __table_args__ = (
+        # Only the rows at or below their threshold, for low-stock listings and alerts
+        Index(
+            "ix_inventory_low_stock", "id",
+            postgresql_include=["product_id", "quantity", "low_stock_threshold"],
+            postgresql_where=text("quantity <= low_stock_threshold")
+        ),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     product_id = Column(Integer, ForeignKey("products.id"), unique=True)
@@ -18,15 +27,51 @@ class Inventory(Base):
     history = relationship("InventoryHistory", back_populates="inventory")
 
 class InventoryHistory(Base):
+    """
+    One row per stock change, range-partitioned by month on change_date.
+    Months past the retention period are compacted into InventoryHistoryDaily.
+    """
     __tablename__ = "inventory_history"
+    __table_args__ = (
+        # Newest changes of an inventory row first, for the keyset-paginated history
+        Index("ix_inventory_history_inventory_id_change_date", "inventory_id", "change_date", "id"),
+        {"postgresql_partition_by": "RANGE (change_date)"},
+    )
     
-    id = Column(Integer, primary_key=True, index=True)
+    # The partition key has to be part of the primary key
+    id = Column(Integer, primary_key=True, autoincrement=True)
     inventory_id = Column(Integer, ForeignKey("inventory.id"))
     previous_quantity = Column(Integer)
     new_quantity = Column(Integer)
-    change_date = Column(DateTime, default=datetime.now)
+    change_date = Column(DateTime, primary_key=True, default=datetime.now)
     change_reason = Column(String(200), nullable=True)
     created_at = Column(DateTime, default=datetime.now)
     updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now)
 
-    inventory = relationship("Inventory", back_populates="history")
\ No newline at end of file
+    inventory = relationship("Inventory", back_populates="history")
+
+    @property
+    def changed_at(self):
+        # Name used by schemas.InventoryHistoryInDB
+        return self.change_date
+
+class InventoryHistoryDaily(Base):
+    """
+    Per-day summary of the stock changes of an inventory row, written when its
+    month of InventoryHistory is compacted
+    """
+    __tablename__ = "inventory_history_daily"
+    
+    inventory_id = Column(Integer, ForeignKey("inventory.id"), primary_key=True)
+    day = Column(Date, primary_key=True)
+    changes = Column(Integer, nullable=False)
+    opening_quantity = Column(Integer)
+    closing_quantity = Column(Integer)
+    min_quantity = Column(Integer)
+    max_quantity = Column(Integer)
+    units_added = Column(Integer, nullable=False)
+    units_removed = Column(Integer, nullable=False)
+
+@event.listens_for(InventoryHistory.__table__, "after_create")
+def _create_inventory_history_partitions(target, connection, **kw):
+    partitions.ensure_partitions(connection, target.name)
@@ -1,14 +1,32 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey
+from sqlalchemy import (
+    Column, Integer, String, Float, DateTime, Date, ForeignKey, ForeignKeyConstraint, Index, DDL, Text, event, table,
+    column, text
+)
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import relationship
 from app.database import Base
+from app import partitions
 from datetime import datetime
 
 class Sale(Base):
+    """
+    Range-partitioned by month on order_date, so date-window queries only scan
+    the months they cover. A partitioned table can only enforce uniqueness on
+    keys that include order_date; order_id is kept unique through
+    SaleOrderId, filled by a trigger.
+    """
     __tablename__ = "sales"
+    __table_args__ = (
+        # Date-window analytics: range on order_date, platform filter/grouping,
+        # total_amount read from the index
+        Index("ix_sales_order_date_platform", "order_date", "platform", postgresql_include=["total_amount"]),
+        {"postgresql_partition_by": "RANGE (order_date)"},
+    )
     
-    id = Column(Integer, primary_key=True, index=True)
-    order_id = Column(String(50), unique=True, index=True)
-    order_date = Column(DateTime, default=datetime.now)
+    # The partition key has to be part of the primary key
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    order_id = Column(String(50), index=True)
+    order_date = Column(DateTime, primary_key=True, default=datetime.now)
     customer_id = Column(String(50), index=True)
     total_amount = Column(Float, nullable=False)
     platform = Column(String(50), index=True)
@@ -19,15 +37,159 @@ class Sale(Base):
     items = relationship("SaleItem", back_populates="sale")
 
 class SaleItem(Base):
+    """
+    Range-partitioned by month on order_date, its sale's order date, which
+    is also part of the reference to the sale
+    """
     __tablename__ = "sale_items"
+    __table_args__ = (
+        ForeignKeyConstraint(["sale_id", "order_date"], ["sales.id", "sales.order_date"]),
+        Index("ix_sale_items_sale_id", "sale_id"),
+        Index("ix_sale_items_product_id_sale_id", "product_id", "sale_id"),
+        # Category analytics: range on order_date within a category, read from the index
+        Index("ix_sale_items_category_id_order_date", "category_id", "order_date",
+              postgresql_include=["subtotal", "sale_id"]),
+        {"postgresql_partition_by": "RANGE (order_date)"},
+    )
     
-    id = Column(Integer, primary_key=True, index=True)
-    sale_id = Column(Integer, ForeignKey("sales.id"))
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    sale_id = Column(Integer)
     product_id = Column(Integer, ForeignKey("products.id"))
     quantity = Column(Integer, nullable=False)
     unit_price = Column(Float, nullable=False)
     subtotal = Column(Float, nullable=False)
+    # Copies of products.category_id and sales.order_date, kept in sync on write
+    category_id = Column(Integer, ForeignKey("categories.id"), nullable=True)
+    order_date = Column(DateTime, primary_key=True)
     created_at = Column(DateTime, default=datetime.now)
     
     sale = relationship("Sale", back_populates="items")
-    product = relationship("Product", back_populates="sale_items")
\ No newline at end of file
+    product = relationship("Product", back_populates="sale_items")
+
+class SalesDailyRollup(Base):
+    """
+    Pre-aggregated daily sales facts. Rows with category_id = 0 hold order-level
+    totals; the other rows hold the per-category figures, summed from the line
+    items of that category. A sale without a
+    platform is stored under the empty string so the key stays non-null.
+    """
+    __tablename__ = "sales_daily_rollup"
+
+    day = Column(Date, primary_key=True)
+    platform = Column(String(50), primary_key=True, default="")
+    category_id = Column(Integer, primary_key=True, default=0)
+    revenue = Column(Float, nullable=False, default=0)
+    order_count = Column(Integer, nullable=False, default=0)
+    units = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now)
+
+class SaleOrderId(Base):
+    """
+    The order_id of every sale, unique. Maintained by the sales_order_id
+    trigger, never written directly.
+    """
+    __tablename__ = "sale_order_ids"
+
+    order_id = Column(String(50), primary_key=True)
+    # Finds a sale's order date, and so its partition, from its id
+    sale_id = Column(Integer, nullable=False, index=True)
+    order_date = Column(DateTime, nullable=False)
+
+class MaterializedViewRefresh(Base):
+    """
+    Time of the last refresh of each materialized view
+    """
+    __tablename__ = "materialized_view_refreshes"
+
+    view_name = Column(String(100), primary_key=True)
+    refreshed_at = Column(DateTime, nullable=False)
+
+class AnalyticsJob(Base):
+    """
+    An analytics report computed in the background, and its result until
+    expires_at. At most one job per report and parameters is in flight.
+    """
+    __tablename__ = "analytics_jobs"
+    __table_args__ = (
+        Index("ux_analytics_jobs_key_in_flight", "key", unique=True,
+              postgresql_where=text("status IN ('pending', 'running')")),
+        Index("ix_analytics_jobs_expires_at", "expires_at"),
+    )
+
+    id = Column(String(32), primary_key=True)
+    report = Column(String(20), nullable=False)
+    # analytics_cache key of the report and its parameters
+    key = Column(Text, nullable=False)
+    params = Column(JSONB, nullable=False)
+    status = Column(String(20), nullable=False, default="pending")
+    result = Column(JSONB, nullable=True)
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime, nullable=False, default=datetime.now)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+    expires_at = Column(DateTime, nullable=True)
+    # Refreshed by the worker holding the job while it is in flight
+    heartbeat_at = Column(DateTime, nullable=True)
+
+# Units and revenue per product and day, from the sale items. A materialized
+# view rather than a model so create_all does not make it a table; it is
+# refreshed concurrently, which needs the unique index.
+ProductDailySales = table(
+    "product_daily_sales",
+    column("day", Date),
+    column("product_id", Integer),
+    column("quantity", Integer),
+    column("revenue", Float),
+)
+
+event.listen(Base.metadata, "after_create", DDL("""
+    CREATE MATERIALIZED VIEW IF NOT EXISTS product_daily_sales AS
+    SELECT date(order_date) AS day, product_id, sum(quantity) AS quantity, sum(subtotal) AS revenue
+    FROM sale_items
+    WHERE order_date IS NOT NULL
+    GROUP BY date(order_date), product_id
+"""))
+event.listen(Base.metadata, "after_create", DDL(
+    "CREATE UNIQUE INDEX IF NOT EXISTS ux_product_daily_sales_day_product_id "
+    "ON product_daily_sales (day, product_id)"
+))
+
+# Keeps sale_order_ids in step with sales; a duplicate order_id fails the
+# insert or update of the sale with a unique violation
+SALES_ORDER_ID_FUNCTION = """
+    CREATE OR REPLACE FUNCTION sales_track_order_id() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP IN ('UPDATE', 'DELETE') THEN
+            DELETE FROM sale_order_ids WHERE order_id = OLD.order_id AND sale_id = OLD.id;
+        END IF;
+        IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.order_id IS NOT NULL THEN
+            INSERT INTO sale_order_ids (order_id, sale_id, order_date) VALUES (NEW.order_id, NEW.id, NEW.order_date);
+        END IF;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql
+"""
+SALES_ORDER_ID_TRIGGER = """
+    CREATE TRIGGER sales_order_id AFTER INSERT OR DELETE OR UPDATE OF id, order_id, order_date ON sales
+    FOR EACH ROW EXECUTE FUNCTION sales_track_order_id()
+"""
+
+event.listen(Base.metadata, "after_create", DDL(SALES_ORDER_ID_FUNCTION))
+# create_all runs at every start: creating the trigger locks sales exclusively,
+# so it is only created when missing
+event.listen(Base.metadata, "after_create", DDL(f"""
+    DO $$
+    BEGIN
+        IF NOT EXISTS (
+            SELECT 1 FROM pg_trigger WHERE tgname = 'sales_order_id' AND tgrelid = 'sales'::regclass
+        ) THEN
+            {SALES_ORDER_ID_TRIGGER.strip()};
+        END IF;
+    END
+    $$
+"""))
+
+@event.listens_for(Sale.__table__, "after_create")
+@event.listens_for(SaleItem.__table__, "after_create")
+def _create_sales_partitions(target, connection, **kw):
+    partitions.ensure_partitions(connection, target.name)
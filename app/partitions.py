@@ -0,0 +1,109 @@
+"""
+Monthly range partitions.
+
+A partitioned table is split by calendar month on a timestamp column, with one
+partition per month named <table>_pYYYYMM. A row whose month has no partition
+fails to insert, so partitions are created PARTITION_MONTHS_AHEAD months in
+advance: when the table is created, by the migrations, and then periodically by
+services.partition_maintenance. Writers that can insert rows for any month,
+like sales with a client-supplied order_date, call ensure_partitions_for first.
+"""
+import os
+import threading
+from datetime import date, datetime
+from typing import Iterable, List, Tuple, Union
+from sqlalchemy import text
+
+PARTITION_MONTHS_AHEAD = int(os.getenv("PARTITION_MONTHS_AHEAD", "3"))
+# Seconds creating an on-demand partition may wait for the lock on its parent table
+PARTITION_LOCK_TIMEOUT = float(os.getenv("PARTITION_LOCK_TIMEOUT", "5"))
+
+def month_start(moment: Union[date, datetime]) -> date:
+    return date(moment.year, moment.month, 1)
+
+def add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+def partition_name(table: str, month: date) -> str:
+    return f"{table}_p{month:%Y%m}"
+
+def create_monthly_partitions(connection, table: str, first_month: date, last_month: date) -> List[str]:
+    """
+    Create the missing partitions of table for every month from first_month to
+    last_month inclusive. Returns the names of all partitions in the range.
+    """
+    names = []
+    month = month_start(first_month)
+    while month <= last_month:
+        name = partition_name(table, month)
+        connection.execute(text(
+            f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {table} "
+            f"FOR VALUES FROM ('{month.isoformat()}') TO ('{add_months(month, 1).isoformat()}')"
+        ))
+        names.append(name)
+        month = add_months(month, 1)
+    return names
+
+def ensure_partitions(connection, table: str, months_ahead: int = PARTITION_MONTHS_AHEAD, today: date = None):
+    """
+    Create the partitions of table from the current month to months_ahead months from now
+    """
+    current = month_start(today or date.today())
+    return create_monthly_partitions(connection, table, current, add_months(current, months_ahead))
+
+# Partitions seen to exist by ensure_partitions_for. Only inventory_history
+# partitions are ever dropped, once their month is past the retention period
+# and no longer written, so this only grows.
+_existing = set()
+_existing_lock = threading.Lock()
+
+def ensure_partitions_for(bind, tables: Iterable[str], moments: Iterable[Union[date, datetime]]):
+    """
+    Make sure every table has the partitions of the months of the given
+    moments. A month already seen to exist costs nothing; otherwise it costs a
+    lookup on a connection of bind (an engine).
+
+    Creating a partition locks its parent table exclusively, so missing ones
+    are created and committed in their own short transaction rather than held
+    through the caller's. The creation takes a transaction-level advisory lock
+    so concurrent writers create it once, and waits for the transactions using
+    the parent table. Call this before the caller's transaction touches the
+    tables; the wait is bounded by PARTITION_LOCK_TIMEOUT.
+    """
+    months = {month_start(moment) for moment in moments if moment is not None}
+    missing = [
+        (table, month) for table in tables for month in sorted(months)
+        if partition_name(table, month) not in _existing
+    ]
+    if not missing:
+        return
+    with bind.connect() as connection:
+        for table, month in missing:
+            name = partition_name(table, month)
+            with connection.begin():
+                exists = connection.execute(text("SELECT to_regclass(:name) IS NOT NULL"), {"name": name}).scalar()
+                if not exists:
+                    connection.execute(text("SELECT pg_advisory_xact_lock(hashtext(:name))"), {"name": name})
+                    connection.execute(text(f"SET LOCAL lock_timeout = '{int(PARTITION_LOCK_TIMEOUT * 1000)}ms'"))
+                    create_monthly_partitions(connection, table, month, month)
+            with _existing_lock:
+                _existing.add(name)
+
+def monthly_partitions(connection, table: str) -> List[Tuple[str, date]]:
+    """
+    The (name, month) of every monthly partition of table, oldest first
+    """
+    names = connection.execute(text(
+        "SELECT child.relname FROM pg_inherits "
+        "JOIN pg_class parent ON parent.oid = pg_inherits.inhparent "
+        "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+        "WHERE parent.relname = :table"
+    ), {"table": table}).scalars()
+    prefix = f"{table}_p"
+    partitions = []
+    for name in names:
+        suffix = name[len(prefix):]
+        if name.startswith(prefix) and len(suffix) == 6 and suffix.isdigit():
+            partitions.append((name, date(int(suffix[:4]), int(suffix[4:]), 1)))
+    return sorted(partitions, key=lambda partition: partition[1])
@@ -0,0 +1,50 @@
+from sqlalchemy import event
+from app.database import engine as default_engine
+from typing import Callable, Iterable
+
+class QueryCounter:
+    """
+    Count the SQL statements an engine executes while the context is active
+
+        with QueryCounter() as counter:
+            client.get("/sales/?limit=10")
+        print(counter.count, counter.statements)
+    """
+
+    def __init__(self, engine=None):
+        self.engine = engine or default_engine
+        self.statements = []
+
+    @property
+    def count(self):
+        return len(self.statements)
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+    def __enter__(self):
+        self.statements = []
+        event.listen(self.engine, "before_cursor_execute", self._before_cursor_execute)
+        return self
+
+    def __exit__(self, *exc_info):
+        event.remove(self.engine, "before_cursor_execute", self._before_cursor_execute)
+        return False
+
+def assert_constant_query_count(call: Callable[[int], object],
+                                page_sizes: Iterable[int] = (1, 10, 100),
+                                engine=None):
+    """
+    Run call(page_size) for each page size and raise AssertionError if the
+    number of statements changes with the page size (an N+1 pattern).
+    Returns the statement count per page size.
+    """
+    counts = {}
+    for page_size in page_sizes:
+        with QueryCounter(engine) as counter:
+            call(page_size)
+        counts[page_size] = counter.count
+
+    if len(set(counts.values())) > 1:
+        raise AssertionError(f"Statement count grows with page size: {counts}")
+    return counts
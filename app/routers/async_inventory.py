@@ -0,0 +1,133 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from datetime import date
+from typing import List, Optional
+from app.database import get_async_db, get_async_read_db
+from app.metrics import InstrumentedRoute
+from app import fast_json, schemas
+from app.services import async_inventory_service, inventory_service, pagination, stock_alerts
+
+router = APIRouter(route_class=InstrumentedRoute)
+
+@router.post("/inventory/", response_model=schemas.Inventory)
+async def create_inventory(inventory: schemas.InventoryCreate, db: AsyncSession = Depends(get_async_db)):
+    return await async_inventory_service.create_inventory(db=db, inventory=inventory)
+
+@router.get("/inventory/", response_model=List[schemas.Inventory])
+async def read_inventory(
+    response: Response,
+    skip: int = 0, 
+    limit: int = 100,
+    low_stock_only: bool = False,
+    cursor: Optional[str] = Query(None, description="Opaque cursor from the X-Next-Cursor header of the previous page"),
+    db: AsyncSession = Depends(get_async_read_db)
+):
+    if fast_json.FAST_JSON_RESPONSES:
+        return fast_json.list_response(*await async_inventory_service.get_inventory_rows(
+            db=db,
+            skip=skip,
+            limit=limit,
+            low_stock_only=low_stock_only,
+            cursor=cursor
+        ))
+    inventory = await async_inventory_service.get_inventory(
+        db=db, 
+        skip=skip, 
+        limit=limit,
+        low_stock_only=low_stock_only,
+        cursor=cursor
+    )
+    if inventory and len(inventory) == limit:
+        response.headers[pagination.NEXT_CURSOR_HEADER] = inventory_service.get_inventory_cursor(inventory[-1])
+    return inventory
+
+# Detail and history stay on the primary, so stock changes show up right after they are made
+@router.get("/inventory/{product_id}", response_model=schemas.InventoryWithHistory)
+async def read_inventory_by_product(
+    product_id: int,
+    history_limit: int = Query(inventory_service.INVENTORY_HISTORY_LIMIT, ge=0, le=1000),
+    db: AsyncSession = Depends(get_async_db)
+):
+    db_inventory = await async_inventory_service.get_inventory_detail(db=db, product_id=product_id, history_limit=history_limit)
+    if db_inventory is None:
+        raise HTTPException(status_code=404, detail="Inventory not found for this product")
+    return db_inventory
+
+@router.get("/inventory/{product_id}/history", response_model=List[schemas.InventoryHistoryInDB])
+async def read_inventory_history(
+    product_id: int,
+    response: Response,
+    limit: int = Query(inventory_service.INVENTORY_HISTORY_LIMIT, ge=1, le=1000),
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    cursor: Optional[str] = Query(None, description="Opaque cursor from the X-Next-Cursor header of the previous page"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    db_inventory = await async_inventory_service.get_inventory_by_product(db=db, product_id=product_id)
+    if db_inventory is None:
+        raise HTTPException(status_code=404, detail="Inventory not found for this product")
+    history, next_cursor = await async_inventory_service.get_inventory_history(
+        db=db,
+        inventory_id=db_inventory.id,
+        limit=limit,
+        start_date=start_date,
+        end_date=end_date,
+        cursor=cursor
+    )
+    if next_cursor:
+        response.headers[pagination.NEXT_CURSOR_HEADER] = next_cursor
+    return history
+
+@router.get("/inventory/{product_id}/history/daily", response_model=List[schemas.InventoryHistoryDaily])
+async def read_inventory_history_daily(
+    product_id: int,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    db: AsyncSession = Depends(get_async_read_db)
+):
+    db_inventory = await async_inventory_service.get_inventory_by_product(db=db, product_id=product_id)
+    if db_inventory is None:
+        raise HTTPException(status_code=404, detail="Inventory not found for this product")
+    return await async_inventory_service.get_inventory_history_daily(
+        db=db, inventory_id=db_inventory.id, start_date=start_date, end_date=end_date
+    )
+
+# Declared before /inventory/{product_id} so "bulk" is not taken for a product id
+@router.put("/inventory/bulk", response_model=schemas.BulkInventoryResponse)
+async def update_inventory_bulk(
+    items: List[schemas.InventoryBulkItem],
+    change_reason: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db)
+):
+    return await async_inventory_service.update_inventory_bulk(db=db, items=items, change_reason=change_reason)
+
+@router.put("/inventory/{product_id}", response_model=schemas.Inventory)
+async def update_inventory(
+    product_id: int, 
+    inventory: schemas.InventoryUpdate, 
+    change_reason: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db)
+):
+    db_inventory = await async_inventory_service.get_inventory_by_product(db=db, product_id=product_id)
+    if db_inventory is None:
+        raise HTTPException(status_code=404, detail="Inventory not found for this product")
+    return await async_inventory_service.update_inventory(
+        db=db, 
+        product_id=product_id, 
+        inventory=inventory,
+        change_reason=change_reason
+    )
+
+@router.get("/inventory/low-stock/alerts", response_model=List[schemas.Inventory])
+async def get_low_stock_alerts(db: AsyncSession = Depends(get_async_read_db)):
+    return await async_inventory_service.get_low_stock_alerts(db=db)
+
+# The snapshot is read on the primary, the database the alerts are sent from
+@router.get("/inventory/low-stock/stream", response_class=StreamingResponse)
+async def stream_low_stock_alerts(db: AsyncSession = Depends(get_async_db)):
+    """
+    Server-Sent Events: a snapshot of the low-stock products, then an alert
+    each time a product crosses its threshold
+    """
+    return await stock_alerts.stream_response(lambda: async_inventory_service.get_low_stock_snapshot(db))
@@ -0,0 +1,63 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+from app.database import get_async_db, get_async_read_db
+from app.metrics import InstrumentedRoute
+from app import fast_json, schemas, models
+from app.services import async_product_service, pagination, product_service
+
+router = APIRouter(route_class=InstrumentedRoute)
+
+@router.post("/products/", response_model=schemas.Product, status_code=status.HTTP_201_CREATED)
+async def create_product(product: schemas.ProductCreate, db: AsyncSession = Depends(get_async_db)):
+    return await async_product_service.create_product(db=db, product=product)
+
+@router.get("/products/", response_model=List[schemas.Product])
+async def read_products(
+    response: Response,
+    skip: int = 0, 
+    limit: int = 100, 
+    category_id: Optional[int] = None,
+    cursor: Optional[str] = Query(None, description="Opaque cursor from the X-Next-Cursor header of the previous page"),
+    db: AsyncSession = Depends(get_async_read_db)
+):
+    if fast_json.FAST_JSON_RESPONSES:
+        return fast_json.list_response(*await async_product_service.get_product_rows(
+            db=db, skip=skip, limit=limit, category_id=category_id, cursor=cursor
+        ))
+    products = await async_product_service.get_products(db=db, skip=skip, limit=limit, category_id=category_id, cursor=cursor)
+    if products and len(products) == limit:
+        response.headers[pagination.NEXT_CURSOR_HEADER] = product_service.get_products_cursor(products[-1])
+    return products
+
+# On the primary (through the product cache), so a product can be read right after it was written
+@router.get("/products/{product_id}", response_model=schemas.Product)
+async def read_product(product_id: int, db: AsyncSession = Depends(get_async_db)):
+    db_product = await async_product_service.get_product(db=db, product_id=product_id)
+    if db_product is None:
+        raise HTTPException(status_code=404, detail="Product not found")
+    return db_product
+
+@router.put("/products/{product_id}", response_model=schemas.Product)
+async def update_product(product_id: int, product: schemas.ProductUpdate, db: AsyncSession = Depends(get_async_db)):
+    db_product = await async_product_service.get_product(db=db, product_id=product_id)
+    if db_product is None:
+        raise HTTPException(status_code=404, detail="Product not found")
+    return await async_product_service.update_product(db=db, product_id=product_id, product=product)
+
+@router.delete("/products/{product_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_product(product_id: int, db: AsyncSession = Depends(get_async_db)):
+    db_product = await async_product_service.get_product(db=db, product_id=product_id)
+    if db_product is None:
+        raise HTTPException(status_code=404, detail="Product not found")
+    await async_product_service.delete_product(db=db, product_id=product_id)
+    return {"detail": "Product deleted"}
+
+# Category endpoints
+@router.post("/categories/", response_model=schemas.Category, status_code=status.HTTP_201_CREATED)
+async def create_category(category: schemas.CategoryCreate, db: AsyncSession = Depends(get_async_db)):
+    return await async_product_service.create_category(db=db, category=category)
+
+@router.get("/categories/", response_model=List[schemas.Category])
+async def read_categories(skip: int = 0, limit: int = 100, db: AsyncSession = Depends(get_async_read_db)):
+    return await async_product_service.get_categories(db=db, skip=skip, limit=limit)
\ No newline at end of file
@@ -0,0 +1,229 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+from datetime import datetime, date
+from app.database import get_async_db, get_async_read_db
+from app.metrics import InstrumentedRoute
+from app import fast_json, schemas
+from app.routers import sales as sync_sales
+from app.services import async_sales_service, pagination, sales_service
+
+router = APIRouter(route_class=InstrumentedRoute)
+
+@router.post("/sales/", response_model=schemas.Sale)
+async def create_sale(sale: schemas.SaleCreate, db: AsyncSession = Depends(get_async_db)):
+    return await async_sales_service.create_sale(db=db, sale=sale)
+
+@router.post("/sales/bulk", response_model=schemas.BulkSaleResponse)
+async def create_sales_bulk(sales: List[schemas.SaleCreate], db: AsyncSession = Depends(get_async_db)):
+    return await async_sales_service.create_sales_bulk(db=db, sales=sales)
+
+@router.get("/sales/", response_model=List[schemas.Sale])
+async def read_sales(
+    response: Response,
+    skip: int = 0, 
+    limit: int = 100,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    platform: Optional[str] = None,
+    cursor: Optional[str] = Query(None, description="Opaque cursor from the X-Next-Cursor header of the previous page"),
+    db: AsyncSession = Depends(get_async_read_db)
+):
+    if fast_json.FAST_JSON_RESPONSES:
+        return fast_json.list_response(*await async_sales_service.get_sales_rows(
+            db=db,
+            skip=skip,
+            limit=limit,
+            start_date=start_date,
+            end_date=end_date,
+            platform=platform,
+            cursor=cursor
+        ))
+    sales = await async_sales_service.get_sales(
+        db=db, 
+        skip=skip, 
+        limit=limit, 
+        start_date=start_date,
+        end_date=end_date,
+        platform=platform,
+        cursor=cursor
+    )
+    if sales and len(sales) == limit:
+        response.headers[pagination.NEXT_CURSOR_HEADER] = sales_service.get_sales_cursor(sales[-1])
+    return sales
+
+# The export streams from its own sync session and the cache stats touch no
+# database, so both handlers are shared with the sync router
+router.add_api_route("/sales/export", sync_sales.export_sales, methods=["GET"])
+
+# On the primary, so a sale can be read right after it was created
+@router.get("/sales/{sale_id}", response_model=schemas.Sale)
+async def read_sale(sale_id: int, db: AsyncSession = Depends(get_async_db)):
+    db_sale = await async_sales_service.get_sale_by_id(db=db, sale_id=sale_id)
+    if db_sale is None:
+        raise HTTPException(status_code=404, detail="Sale not found")
+    return db_sale
+
+# Analytics endpoints
+@router.get("/sales/analytics/summary", response_model=schemas.SalesAnalytics)
+async def get_sales_analytics(
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    platform: Optional[str] = None,
+    category_id: Optional[int] = None,
+    engine: Optional[str] = Query(None, regex="^(sql|columnar)$", description="Analytics engine: sql or columnar (default from ANALYTICS_ENGINE)"),
+    db: AsyncSession = Depends(get_async_read_db)
+):
+    return await async_sales_service.get_sales_summary(
+        db=db,
+        start_date=start_date,
+        end_date=end_date,
+        engine=engine
+    )
+
+@router.get("/sales/analytics/revenue", response_model=List[schemas.RevenueByPeriod])
+async def get_revenue_by_period(
+    period_type: str = Query(..., description="Period type: daily, weekly, monthly, yearly"),
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    platform: Optional[str] = None,
+    category_id: Optional[int] = None,
+    engine: Optional[str] = Query(None, regex="^(sql|columnar)$", description="Analytics engine: sql or columnar (default from ANALYTICS_ENGINE)"),
+    db: AsyncSession = Depends(get_async_read_db)
+):
+    return await async_sales_service.get_revenue_by_period(
+        db=db,
+        period_type=period_type,
+        start_date=start_date,
+        end_date=end_date,
+        platform=platform,
+        category_id=category_id,
+        engine=engine
+    )
+
+@router.get("/sales/analytics/series", response_model=schemas.RevenueSeriesResponse)
+async def get_revenue_series(
+    period_type: str = Query("daily", regex="^(daily|weekly|monthly|yearly)$", description="Period type: daily, weekly, monthly, yearly"),
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    group_by: List[str] = Query([], description="Dimensions to split the series by: platform, category_id (repeatable)"),
+    platform: Optional[str] = None,
+    category_id: Optional[int] = None,
+    db: AsyncSession = Depends(get_async_read_db)
+):
+    return await async_sales_service.get_revenue_series(
+        db=db,
+        period_type=period_type,
+        start_date=start_date,
+        end_date=end_date,
+        group_by=group_by,
+        platform=platform,
+        category_id=category_id
+    )
+
+@router.get("/sales/analytics/compare", response_model=dict)
+async def compare_revenue(
+    period_type: str = Query(..., description="Period type: daily, weekly, monthly, yearly"),
+    current_start: date = Query(..., description="Start date of current period"),
+    current_end: date = Query(..., description="End date of current period"),
+    previous_start: date = Query(..., description="Start date of previous period"),
+    previous_end: date = Query(..., description="End date of previous period"),
+    platform: Optional[str] = None,
+    category_id: Optional[int] = None,
+    engine: Optional[str] = Query(None, regex="^(sql|columnar)$", description="Analytics engine: sql or columnar (default from ANALYTICS_ENGINE)"),
+    db: AsyncSession = Depends(get_async_read_db)
+):
+    return await async_sales_service.compare_revenue(
+        db=db,
+        period_type=period_type,
+        current_start=current_start,
+        current_end=current_end,
+        previous_start=previous_start,
+        previous_end=previous_end,
+        platform=platform,
+        category_id=category_id,
+        engine=engine
+    )
+
+# Analytics jobs: the same reports with the same parameters, computed in a
+# process pool. Poll GET /sales/analytics/jobs/{job_id} for the result.
+@router.post("/sales/analytics/summary/jobs", response_model=schemas.AnalyticsJob, status_code=202)
+async def submit_sales_analytics_job(
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    platform: Optional[str] = None,
+    category_id: Optional[int] = None,
+    engine: Optional[str] = Query(None, regex="^(sql|columnar)$", description="Analytics engine: sql or columnar (default from ANALYTICS_ENGINE)"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    return await async_sales_service.submit_analytics_job(db=db, report="summary", params=dict(
+        start_date=start_date,
+        end_date=end_date,
+        engine=engine
+    ))
+
+@router.post("/sales/analytics/revenue/jobs", response_model=schemas.AnalyticsJob, status_code=202)
+async def submit_revenue_by_period_job(
+    period_type: str = Query(..., description="Period type: daily, weekly, monthly, yearly"),
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    platform: Optional[str] = None,
+    category_id: Optional[int] = None,
+    engine: Optional[str] = Query(None, regex="^(sql|columnar)$", description="Analytics engine: sql or columnar (default from ANALYTICS_ENGINE)"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    return await async_sales_service.submit_analytics_job(db=db, report="revenue", params=dict(
+        period_type=period_type,
+        start_date=start_date,
+        end_date=end_date,
+        platform=platform,
+        category_id=category_id,
+        engine=engine
+    ))
+
+@router.post("/sales/analytics/series/jobs", response_model=schemas.AnalyticsJob, status_code=202)
+async def submit_revenue_series_job(
+    period_type: str = Query("daily", regex="^(daily|weekly|monthly|yearly)$", description="Period type: daily, weekly, monthly, yearly"),
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    group_by: List[str] = Query([], description="Dimensions to split the series by: platform, category_id (repeatable)"),
+    platform: Optional[str] = None,
+    category_id: Optional[int] = None,
+    db: AsyncSession = Depends(get_async_db)
+):
+    return await async_sales_service.submit_analytics_job(db=db, report="series", params=dict(
+        period_type=period_type,
+        start_date=start_date,
+        end_date=end_date,
+        group_by=group_by,
+        platform=platform,
+        category_id=category_id
+    ))
+
+@router.post("/sales/analytics/compare/jobs", response_model=schemas.AnalyticsJob, status_code=202)
+async def submit_compare_revenue_job(
+    period_type: str = Query(..., description="Period type: daily, weekly, monthly, yearly"),
+    current_start: date = Query(..., description="Start date of current period"),
+    current_end: date = Query(..., description="End date of current period"),
+    previous_start: date = Query(..., description="Start date of previous period"),
+    previous_end: date = Query(..., description="End date of previous period"),
+    platform: Optional[str] = None,
+    category_id: Optional[int] = None,
+    engine: Optional[str] = Query(None, regex="^(sql|columnar)$", description="Analytics engine: sql or columnar (default from ANALYTICS_ENGINE)"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    return await async_sales_service.submit_analytics_job(db=db, report="compare", params=dict(
+        period_type=period_type,
+        current_start=current_start,
+        current_end=current_end,
+        previous_start=previous_start,
+        previous_end=previous_end,
+        platform=platform,
+        category_id=category_id,
+        engine=engine
+    ))
+
+router.add_api_route("/sales/analytics/cache", sync_sales.get_analytics_cache_stats, methods=["GET"], response_model=dict)
+# Long-polls with its own short sessions, so it is shared with the sync router too
+router.add_api_route("/sales/analytics/jobs/{job_id}", sync_sales.read_analytics_job, methods=["GET"],
+                     response_model=schemas.AnalyticsJob)
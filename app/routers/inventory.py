@@ -1,11 +1,15 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from datetime import date
 from typing import List, Optional
-from app.database import get_db
-from app import schemas
-from app.services import inventory_service
+from app.database import get_db, get_read_db
+from app.metrics import InstrumentedRoute
+from app import fast_json, schemas
+from app.services import inventory_service, pagination, stock_alerts
 
-router = APIRouter()
+router = APIRouter(route_class=InstrumentedRoute)
 
 @router.post("/inventory/", response_model=schemas.Inventory)
 def create_inventory(inventory: schemas.InventoryCreate, db: Session = Depends(get_db)):
@@ -13,25 +17,92 @@ def create_inventory(inventory: schemas.InventoryCreate, db: Session = Depends(g
 
 @router.get("/inventory/", response_model=List[schemas.Inventory])
 def read_inventory(
+    response: Response,
     skip: int = 0, 
     limit: int = 100,
     low_stock_only: bool = False,
-    db: Session = Depends(get_db)
+    cursor: Optional[str] = Query(None, description="Opaque cursor from the X-Next-Cursor header of the previous page"),
+    db: Session = Depends(get_read_db)
 ):
-    return inventory_service.get_inventory(
+    if fast_json.FAST_JSON_RESPONSES:
+        return fast_json.list_response(*inventory_service.get_inventory_rows(
+            db=db,
+            skip=skip,
+            limit=limit,
+            low_stock_only=low_stock_only,
+            cursor=cursor
+        ))
+    inventory = inventory_service.get_inventory(
         db=db, 
         skip=skip, 
         limit=limit,
-        low_stock_only=low_stock_only
+        low_stock_only=low_stock_only,
+        cursor=cursor
     )
+    if inventory and len(inventory) == limit:
+        response.headers[pagination.NEXT_CURSOR_HEADER] = inventory_service.get_inventory_cursor(inventory[-1])
+    return inventory
 
+# Detail and history stay on the primary, so stock changes show up right after they are made
 @router.get("/inventory/{product_id}", response_model=schemas.InventoryWithHistory)
-def read_inventory_by_product(product_id: int, db: Session = Depends(get_db)):
-    db_inventory = inventory_service.get_inventory_by_product(db=db, product_id=product_id)
+def read_inventory_by_product(
+    product_id: int,
+    history_limit: int = Query(inventory_service.INVENTORY_HISTORY_LIMIT, ge=0, le=1000),
+    db: Session = Depends(get_db)
+):
+    db_inventory = inventory_service.get_inventory_detail(db=db, product_id=product_id, history_limit=history_limit)
     if db_inventory is None:
         raise HTTPException(status_code=404, detail="Inventory not found for this product")
     return db_inventory
 
+@router.get("/inventory/{product_id}/history", response_model=List[schemas.InventoryHistoryInDB])
+def read_inventory_history(
+    product_id: int,
+    response: Response,
+    limit: int = Query(inventory_service.INVENTORY_HISTORY_LIMIT, ge=1, le=1000),
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    cursor: Optional[str] = Query(None, description="Opaque cursor from the X-Next-Cursor header of the previous page"),
+    db: Session = Depends(get_db)
+):
+    db_inventory = inventory_service.get_inventory_by_product(db=db, product_id=product_id)
+    if db_inventory is None:
+        raise HTTPException(status_code=404, detail="Inventory not found for this product")
+    history, next_cursor = inventory_service.get_inventory_history(
+        db=db,
+        inventory_id=db_inventory.id,
+        limit=limit,
+        start_date=start_date,
+        end_date=end_date,
+        cursor=cursor
+    )
+    if next_cursor:
+        response.headers[pagination.NEXT_CURSOR_HEADER] = next_cursor
+    return history
+
+@router.get("/inventory/{product_id}/history/daily", response_model=List[schemas.InventoryHistoryDaily])
+def read_inventory_history_daily(
+    product_id: int,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    db: Session = Depends(get_read_db)
+):
+    db_inventory = inventory_service.get_inventory_by_product(db=db, product_id=product_id)
+    if db_inventory is None:
+        raise HTTPException(status_code=404, detail="Inventory not found for this product")
+    return inventory_service.get_inventory_history_daily(
+        db=db, inventory_id=db_inventory.id, start_date=start_date, end_date=end_date
+    )
+
+# Declared before /inventory/{product_id} so "bulk" is not taken for a product id
+@router.put("/inventory/bulk", response_model=schemas.BulkInventoryResponse)
+def update_inventory_bulk(
+    items: List[schemas.InventoryBulkItem],
+    change_reason: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
+    return inventory_service.update_inventory_bulk(db=db, items=items, change_reason=change_reason)
+
 @router.put("/inventory/{product_id}", response_model=schemas.Inventory)
 def update_inventory(
     product_id: int, 
@@ -50,5 +121,16 @@ def update_inventory(
     )
 
 @router.get("/inventory/low-stock/alerts", response_model=List[schemas.Inventory])
-def get_low_stock_alerts(db: Session = Depends(get_db)):
-    return inventory_service.get_low_stock_alerts(db=db)
\ No newline at end of file
+def get_low_stock_alerts(db: Session = Depends(get_read_db)):
+    return inventory_service.get_low_stock_alerts(db=db)
+
+# The snapshot is read on the primary, the database the alerts are sent from
+@router.get("/inventory/low-stock/stream", response_class=StreamingResponse)
+async def stream_low_stock_alerts(db: Session = Depends(get_db)):
+    """
+    Server-Sent Events: a snapshot of the low-stock products, then an alert
+    each time a product crosses its threshold
+    """
+    return await stock_alerts.stream_response(
+        lambda: run_in_threadpool(inventory_service.get_low_stock_snapshot, db)
+    )
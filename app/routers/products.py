@@ -1,11 +1,12 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
 from sqlalchemy.orm import Session
 from typing import List, Optional
-from app.database import get_db
-from app import schemas, models
-from app.services import product_service
+from app.database import get_db, get_read_db
+from app.metrics import InstrumentedRoute
+from app import fast_json, schemas, models
+from app.services import pagination, product_service
 
-router = APIRouter()
+router = APIRouter(route_class=InstrumentedRoute)
 
 @router.post("/products/", response_model=schemas.Product, status_code=status.HTTP_201_CREATED)
 def create_product(product: schemas.ProductCreate, db: Session = Depends(get_db)):
@@ -13,13 +14,23 @@ def create_product(product: schemas.ProductCreate, db: Session = Depends(get_db)
 
 @router.get("/products/", response_model=List[schemas.Product])
 def read_products(
+    response: Response,
     skip: int = 0, 
     limit: int = 100, 
     category_id: Optional[int] = None,
-    db: Session = Depends(get_db)
+    cursor: Optional[str] = Query(None, description="Opaque cursor from the X-Next-Cursor header of the previous page"),
+    db: Session = Depends(get_read_db)
 ):
-    return product_service.get_products(db=db, skip=skip, limit=limit, category_id=category_id)
-
+    if fast_json.FAST_JSON_RESPONSES:
+        return fast_json.list_response(*product_service.get_product_rows(
+            db=db, skip=skip, limit=limit, category_id=category_id, cursor=cursor
+        ))
+    products = product_service.get_products(db=db, skip=skip, limit=limit, category_id=category_id, cursor=cursor)
+    if products and len(products) == limit:
+        response.headers[pagination.NEXT_CURSOR_HEADER] = product_service.get_products_cursor(products[-1])
+    return products
+
+# On the primary (through the product cache), so a product can be read right after it was written
 @router.get("/products/{product_id}", response_model=schemas.Product)
 def read_product(product_id: int, db: Session = Depends(get_db)):
     db_product = product_service.get_product(db=db, product_id=product_id)
@@ -48,5 +59,5 @@ def create_category(category: schemas.CategoryCreate, db: Session = Depends(get_
     return product_service.create_category(db=db, category=category)
 
 @router.get("/categories/", response_model=List[schemas.Category])
-def read_categories(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
+def read_categories(skip: int = 0, limit: int = 100, db: Session = Depends(get_read_db)):
     return product_service.get_categories(db=db, skip=skip, limit=limit)
\ No newline at end of file
@@ -1,38 +1,93 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from datetime import datetime, date
-from app.database import get_db
-from app import schemas
-from app.services import sales_service
+from app.database import get_db, get_read_db, read_session
+from app.metrics import InstrumentedRoute
+from app import fast_json, schemas
+from app.services import analytics_jobs, pagination, sales_service
+from app.services.analytics_cache import analytics_cache
 
-router = APIRouter()
+router = APIRouter(route_class=InstrumentedRoute)
 
 @router.post("/sales/", response_model=schemas.Sale)
 def create_sale(sale: schemas.SaleCreate, db: Session = Depends(get_db)):
     return sales_service.create_sale(db=db, sale=sale)
 
+@router.post("/sales/bulk", response_model=schemas.BulkSaleResponse)
+def create_sales_bulk(sales: List[schemas.SaleCreate], db: Session = Depends(get_db)):
+    return sales_service.create_sales_bulk(db=db, sales=sales)
+
 @router.get("/sales/", response_model=List[schemas.Sale])
 def read_sales(
+    response: Response,
     skip: int = 0, 
     limit: int = 100,
     start_date: Optional[date] = None,
     end_date: Optional[date] = None,
     platform: Optional[str] = None,
-    db: Session = Depends(get_db)
+    cursor: Optional[str] = Query(None, description="Opaque cursor from the X-Next-Cursor header of the previous page"),
+    db: Session = Depends(get_read_db)
 ):
-    return sales_service.get_sales(
+    if fast_json.FAST_JSON_RESPONSES:
+        return fast_json.list_response(*sales_service.get_sales_rows(
+            db=db,
+            skip=skip,
+            limit=limit,
+            start_date=start_date,
+            end_date=end_date,
+            platform=platform,
+            cursor=cursor
+        ))
+    sales = sales_service.get_sales(
         db=db, 
         skip=skip, 
         limit=limit, 
         start_date=start_date,
         end_date=end_date,
-        platform=platform
+        platform=platform,
+        cursor=cursor
     )
+    if sales and len(sales) == limit:
+        response.headers[pagination.NEXT_CURSOR_HEADER] = sales_service.get_sales_cursor(sales[-1])
+    return sales
+
+@router.get("/sales/export")
+def export_sales(
+    format: str = Query("ndjson", regex="^(ndjson|csv)$", description="Export format: ndjson or csv"),
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    platform: Optional[str] = None,
+    status: Optional[str] = None
+):
+    # The stream outlives the request dependencies, so it owns its session
+    def stream():
+        db = read_session()
+        try:
+            yield from sales_service.export_sales(
+                db=db,
+                export_format=format,
+                start_date=start_date,
+                end_date=end_date,
+                platform=platform,
+                status=status
+            )
+        finally:
+            db.close()
 
+    if format == "csv":
+        return StreamingResponse(
+            stream(),
+            media_type="text/csv",
+            headers={"Content-Disposition": "attachment; filename=sales.csv"}
+        )
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+# On the primary, so a sale can be read right after it was created
 @router.get("/sales/{sale_id}", response_model=schemas.Sale)
 def read_sale(sale_id: int, db: Session = Depends(get_db)):
-    db_sale = sales_service.get_sale(db=db, sale_id=sale_id)
+    db_sale = sales_service.get_sale_by_id(db=db, sale_id=sale_id)
     if db_sale is None:
         raise HTTPException(status_code=404, detail="Sale not found")
     return db_sale
@@ -44,12 +99,14 @@ def get_sales_analytics(
     end_date: Optional[date] = None,
     platform: Optional[str] = None,
     category_id: Optional[int] = None,
-    db: Session = Depends(get_db)
+    engine: Optional[str] = Query(None, regex="^(sql|columnar)$", description="Analytics engine: sql or columnar (default from ANALYTICS_ENGINE)"),
+    db: Session = Depends(get_read_db)
 ):
     return sales_service.get_sales_summary(
         db=db,
         start_date=start_date,
-        end_date=end_date
+        end_date=end_date,
+        engine=engine
     )
 
 @router.get("/sales/analytics/revenue", response_model=List[schemas.RevenueByPeriod])
@@ -59,7 +116,8 @@ def get_revenue_by_period(
     end_date: Optional[date] = None,
     platform: Optional[str] = None,
     category_id: Optional[int] = None,
-    db: Session = Depends(get_db)
+    engine: Optional[str] = Query(None, regex="^(sql|columnar)$", description="Analytics engine: sql or columnar (default from ANALYTICS_ENGINE)"),
+    db: Session = Depends(get_read_db)
 ):
     return sales_service.get_revenue_by_period(
         db=db,
@@ -67,6 +125,27 @@ def get_revenue_by_period(
         start_date=start_date,
         end_date=end_date,
         platform=platform,
+        category_id=category_id,
+        engine=engine
+    )
+
+@router.get("/sales/analytics/series", response_model=schemas.RevenueSeriesResponse)
+def get_revenue_series(
+    period_type: str = Query("daily", regex="^(daily|weekly|monthly|yearly)$", description="Period type: daily, weekly, monthly, yearly"),
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    group_by: List[str] = Query([], description="Dimensions to split the series by: platform, category_id (repeatable)"),
+    platform: Optional[str] = None,
+    category_id: Optional[int] = None,
+    db: Session = Depends(get_read_db)
+):
+    return sales_service.get_revenue_series(
+        db=db,
+        period_type=period_type,
+        start_date=start_date,
+        end_date=end_date,
+        group_by=group_by,
+        platform=platform,
         category_id=category_id
     )
 
@@ -79,7 +158,8 @@ def compare_revenue(
     previous_end: date = Query(..., description="End date of previous period"),
     platform: Optional[str] = None,
     category_id: Optional[int] = None,
-    db: Session = Depends(get_db)
+    engine: Optional[str] = Query(None, regex="^(sql|columnar)$", description="Analytics engine: sql or columnar (default from ANALYTICS_ENGINE)"),
+    db: Session = Depends(get_read_db)
 ):
     return sales_service.compare_revenue(
         db=db,
@@ -89,5 +169,98 @@ def compare_revenue(
         previous_start=previous_start,
         previous_end=previous_end,
         platform=platform,
+        category_id=category_id,
+        engine=engine
+    )
+
+# Analytics jobs: the same reports with the same parameters, computed in a
+# process pool. Poll GET /sales/analytics/jobs/{job_id} for the result.
+@router.post("/sales/analytics/summary/jobs", response_model=schemas.AnalyticsJob, status_code=202)
+def submit_sales_analytics_job(
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    platform: Optional[str] = None,
+    category_id: Optional[int] = None,
+    engine: Optional[str] = Query(None, regex="^(sql|columnar)$", description="Analytics engine: sql or columnar (default from ANALYTICS_ENGINE)"),
+    db: Session = Depends(get_db)
+):
+    return analytics_jobs.submit(db=db, report="summary", params=dict(
+        start_date=start_date,
+        end_date=end_date,
+        engine=engine
+    ))
+
+@router.post("/sales/analytics/revenue/jobs", response_model=schemas.AnalyticsJob, status_code=202)
+def submit_revenue_by_period_job(
+    period_type: str = Query(..., description="Period type: daily, weekly, monthly, yearly"),
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    platform: Optional[str] = None,
+    category_id: Optional[int] = None,
+    engine: Optional[str] = Query(None, regex="^(sql|columnar)$", description="Analytics engine: sql or columnar (default from ANALYTICS_ENGINE)"),
+    db: Session = Depends(get_db)
+):
+    return analytics_jobs.submit(db=db, report="revenue", params=dict(
+        period_type=period_type,
+        start_date=start_date,
+        end_date=end_date,
+        platform=platform,
+        category_id=category_id,
+        engine=engine
+    ))
+
+@router.post("/sales/analytics/series/jobs", response_model=schemas.AnalyticsJob, status_code=202)
+def submit_revenue_series_job(
+    period_type: str = Query("daily", regex="^(daily|weekly|monthly|yearly)$", description="Period type: daily, weekly, monthly, yearly"),
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    group_by: List[str] = Query([], description="Dimensions to split the series by: platform, category_id (repeatable)"),
+    platform: Optional[str] = None,
+    category_id: Optional[int] = None,
+    db: Session = Depends(get_db)
+):
+    return analytics_jobs.submit(db=db, report="series", params=dict(
+        period_type=period_type,
+        start_date=start_date,
+        end_date=end_date,
+        group_by=group_by,
+        platform=platform,
         category_id=category_id
-    )
\ No newline at end of file
+    ))
+
+@router.post("/sales/analytics/compare/jobs", response_model=schemas.AnalyticsJob, status_code=202)
+def submit_compare_revenue_job(
+    period_type: str = Query(..., description="Period type: daily, weekly, monthly, yearly"),
+    current_start: date = Query(..., description="Start date of current period"),
+    current_end: date = Query(..., description="End date of current period"),
+    previous_start: date = Query(..., description="Start date of previous period"),
+    previous_end: date = Query(..., description="End date of previous period"),
+    platform: Optional[str] = None,
+    category_id: Optional[int] = None,
+    engine: Optional[str] = Query(None, regex="^(sql|columnar)$", description="Analytics engine: sql or columnar (default from ANALYTICS_ENGINE)"),
+    db: Session = Depends(get_db)
+):
+    return analytics_jobs.submit(db=db, report="compare", params=dict(
+        period_type=period_type,
+        current_start=current_start,
+        current_end=current_end,
+        previous_start=previous_start,
+        previous_end=previous_end,
+        platform=platform,
+        category_id=category_id,
+        engine=engine
+    ))
+
+@router.get("/sales/analytics/jobs/{job_id}", response_model=schemas.AnalyticsJob)
+async def read_analytics_job(
+    job_id: str,
+    wait: float = Query(0, ge=0, le=60, description="Seconds to wait for the job to finish before answering"),
+):
+    job = await analytics_jobs.wait_for_job(job_id, wait)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Analytics job not found")
+    return job
+
+@router.get("/sales/analytics/cache", response_model=dict)
+def get_analytics_cache_stats():
+    return analytics_cache.stats()
@@ -1,4 +1,4 @@
 from app.schemas.category import Category, CategoryCreate, CategoryUpdate
 from app.schemas.product import Product, ProductCreate, ProductUpdate
-from app.schemas.inventory import Inventory, InventoryCreate, InventoryUpdate, InventoryWithHistory
-from app.schemas.sales import Sale, SaleCreate, SalesAnalytics, RevenueByPeriod
\ No newline at end of file
+from app.schemas.inventory import Inventory, InventoryCreate, InventoryUpdate, InventoryWithHistory, InventoryBulkItem, BulkInventoryResponse, InventoryHistoryInDB, InventoryHistoryDaily
+from app.schemas.sales import Sale, SaleCreate, SalesAnalytics, RevenueByPeriod, RevenueSeriesResponse, BulkSaleResponse, AnalyticsJob
\ No newline at end of file
@@ -1,6 +1,6 @@
 from pydantic import BaseModel, Field
 from typing import Optional, List
-from datetime import datetime
+from datetime import date, datetime
 
 class InventoryBase(BaseModel):
     product_id: int
@@ -14,6 +14,21 @@ class InventoryUpdate(BaseModel):
     quantity: Optional[int] = Field(None, ge=0)
     low_stock_threshold: Optional[int] = Field(None, ge=0)
 
+class InventoryBulkItem(InventoryUpdate):
+    product_id: int
+
+class BulkInventoryResult(BaseModel):
+    product_id: int
+    success: bool
+    changed: bool = False
+    error: Optional[str] = None
+
+class BulkInventoryResponse(BaseModel):
+    updated: int
+    unchanged: int
+    failed: int
+    results: List[BulkInventoryResult]
+
 class InventoryHistoryBase(BaseModel):
     previous_quantity: int
     new_quantity: int
@@ -30,6 +45,19 @@ class InventoryHistoryInDB(InventoryHistoryBase):
     class Config:
         orm_mode = True
 
+class InventoryHistoryDaily(BaseModel):
+    day: date
+    changes: int
+    opening_quantity: Optional[int] = None
+    closing_quantity: Optional[int] = None
+    min_quantity: Optional[int] = None
+    max_quantity: Optional[int] = None
+    units_added: int
+    units_removed: int
+
+    class Config:
+        orm_mode = True
+
 class InventoryInDB(InventoryBase):
     id: int
     last_restock_date: Optional[datetime] = None
@@ -43,4 +71,6 @@ class Inventory(InventoryInDB):
     pass
 
 class InventoryWithHistory(Inventory):
-    history: List[InventoryHistoryInDB] = []
\ No newline at end of file
+    # The most recent changes; older ones are paged through /inventory/{product_id}/history
+    history: List[InventoryHistoryInDB] = []
+    history_next_cursor: Optional[str] = None
\ No newline at end of file
@@ -41,6 +41,18 @@ class SaleInDB(SaleBase):
 class Sale(SaleInDB):
     items: List[SaleItemInDB] = []
 
+# For bulk ingestion
+class BulkSaleResult(BaseModel):
+    order_id: str
+    success: bool
+    sale_id: Optional[int] = None
+    error: Optional[str] = None
+
+class BulkSaleResponse(BaseModel):
+    created: int
+    failed: int
+    results: List[BulkSaleResult]
+
 # For analytics
 class PeriodInfo(BaseModel):
     start_date: datetime
@@ -66,6 +78,8 @@ class SalesAnalytics(BaseModel):
     summary: SummaryInfo
     platforms: List[PlatformSales]
     top_products: List[TopProduct]
+    # Top products are read from a periodically refreshed view; None if it never was
+    top_products_refreshed_at: Optional[datetime] = None
     total_sales: float
     total_orders: int
     average_order_value: float
@@ -77,4 +91,38 @@ class SalesAnalytics(BaseModel):
 class RevenueByPeriod(BaseModel):
     period: str
     revenue: float
-    order_count: int
\ No newline at end of file
+    order_count: int
+class RevenueSeries(BaseModel):
+    # Dimension values of the series; None when not grouped by that dimension
+    platform: Optional[str] = None
+    category_id: Optional[int] = None
+    revenue: List[float]
+    order_count: List[int]
+
+class RevenueSeriesResponse(BaseModel):
+    period_type: str
+    group_by: List[str]
+    # Start of every bucket in the window; each series has one value per bucket
+    periods: List[datetime]
+    series: List[RevenueSeries]
+
+# For analytics jobs
+class AnalyticsJob(BaseModel):
+    id: str
+    # summary, revenue, series or compare
+    report: str
+    # pending, running, done or failed
+    status: str
+    params: Dict[str, Any]
+    # The report, shaped like the response of its analytics endpoint, once done
+    result: Optional[Any] = None
+    error: Optional[str] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    # The job and its result are deleted after this
+    expires_at: Optional[datetime] = None
+
+    class Config:
+        orm_mode = True
+        from_attributes = True
@@ -1,3 +1,3 @@
 from app.services.product_service import *
 from app.services.inventory_service import *
-from app.services.sales_service import *
\ No newline at end of file
+from app.services.sales_service import *
@@ -0,0 +1,401 @@
+import functools
+import inspect
+import json
+import os
+import socket
+import socketserver
+import struct
+import threading
+import time
+from collections import OrderedDict, deque
+from datetime import datetime, date
+from app import database
+from app.services import replica_monitor
+from app.services.rollup_service import as_datetime
+from typing import Any, Callable, Iterable, List, Optional, Tuple
+
+# Backend selection: "memory" (per process), "socket" (shared through a cache
+# server on a local socket) or "none"
+ANALYTICS_CACHE_BACKEND = os.getenv("ANALYTICS_CACHE_BACKEND", "memory")
+ANALYTICS_CACHE_TTL = float(os.getenv("ANALYTICS_CACHE_TTL", "30"))
+ANALYTICS_CACHE_SIZE = int(os.getenv("ANALYTICS_CACHE_SIZE", "256"))
+ANALYTICS_CACHE_SOCKET = os.getenv("ANALYTICS_CACHE_SOCKET", "/tmp/analytics-cache.sock")
+# Recent invalidations remembered to check results computed meanwhile against
+INVALIDATION_LOG_SIZE = 1024
+# How far a result read from the replica may trail the primary: its maximum
+# lag, plus the time until the replica monitor notices it was exceeded
+REPLICA_LAG_BOUND = replica_monitor.READ_REPLICA_MAX_LAG + replica_monitor.READ_REPLICA_CHECK_INTERVAL
+
+# A cached result covers one or more (start, end) windows; None is unbounded
+Window = Tuple[Optional[datetime], Optional[datetime]]
+
+def _covers(windows: Iterable[Window], moment: datetime):
+    return any(
+        (start is None or start <= moment) and (end is None or moment <= end)
+        for start, end in windows
+    )
+
+class InMemoryBackend:
+    """
+    Bounded LRU with per-entry TTL, local to the process
+    """
+
+    name = "memory"
+
+    def __init__(self, maxsize: int = ANALYTICS_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        # Numbers the invalidations; the recent ones are logged with their
+        # time and moments (None for a clear) so that a result computed
+        # meanwhile is not stored if one of them falls in its windows
+        self._generation = 0
+        self._invalidations = deque(maxlen=INVALIDATION_LOG_SIZE)
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, _, value = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def generation(self):
+        with self._lock:
+            return self._generation
+
+    def _invalidated_since(self, generation: int, windows: List[Window], since: Optional[float] = None):
+        if generation == self._generation and since is None:
+            return False
+        if generation != self._generation and (
+            not self._invalidations or self._invalidations[0][0] > generation + 1
+        ):
+            # Some of the invalidations since then are no longer logged
+            return True
+        if (since is not None and len(self._invalidations) == self._invalidations.maxlen
+                and self._invalidations[0][1] >= since):
+            # Nor are all of those since the given time
+            return True
+        return any(
+            moments is None or any(_covers(windows, moment) for moment in moments)
+            for seen, at, moments in self._invalidations
+            if seen > generation or (since is not None and at >= since)
+        )
+
+    def set(self, key: str, value: Any, ttl: float, windows: List[Window], generation: int,
+            since: Optional[float] = None):
+        """
+        Store a result computed from data read at generation, unless an
+        invalidation since then covers its windows. For data read from a
+        replica, since is the time.time() its writes may trail to, and
+        invalidations from then on count too.
+        """
+        with self._lock:
+            if self._invalidated_since(generation, windows, since):
+                return
+            self._entries[key] = (time.monotonic() + ttl, windows, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, moments: List[datetime]):
+        with self._lock:
+            self._generation += 1
+            self._invalidations.append((self._generation, time.time(), moments))
+            stale = [
+                key for key, (_, windows, _) in self._entries.items()
+                if any(_covers(windows, moment) for moment in moments)
+            ]
+            for key in stale:
+                del self._entries[key]
+            return len(stale)
+
+    def size(self):
+        with self._lock:
+            return len(self._entries)
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._invalidations.append((self._generation, time.time(), None))
+            self._entries.clear()
+
+# Values crossing the socket are JSON; datetimes are tagged so they round-trip
+def _encode(value):
+    if isinstance(value, datetime):
+        return {"__datetime__": value.isoformat()}
+    if isinstance(value, date):
+        return {"__date__": value.isoformat()}
+    raise TypeError(f"Cannot encode {type(value).__name__}")
+
+def _decode(value):
+    if "__datetime__" in value:
+        return datetime.fromisoformat(value["__datetime__"])
+    if "__date__" in value:
+        return date.fromisoformat(value["__date__"])
+    return value
+
+def _send(sock, message):
+    payload = json.dumps(message, default=_encode).encode()
+    sock.sendall(struct.pack("!I", len(payload)) + payload)
+
+def _receive(sock):
+    header = _receive_exactly(sock, 4)
+    if header is None:
+        return None
+    (length,) = struct.unpack("!I", header)
+    return json.loads(_receive_exactly(sock, length), object_hook=_decode)
+
+def _receive_exactly(sock, length: int):
+    chunks = []
+    while length:
+        chunk = sock.recv(length)
+        if not chunk:
+            return None
+        chunks.append(chunk)
+        length -= len(chunk)
+    return b"".join(chunks)
+
+class _CacheRequestHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        backend = self.server.backend
+        while True:
+            message = _receive(self.request)
+            if message is None:
+                return
+            op, args = message["op"], message.get("args", [])
+            if op == "get":
+                result = backend.get(*args)
+            elif op == "generation":
+                result = backend.generation()
+            elif op == "set":
+                key, value, ttl, windows, generation, since = args
+                result = backend.set(key, value, ttl, [tuple(window) for window in windows], generation, since)
+            elif op == "invalidate":
+                result = backend.invalidate(*args)
+            elif op == "size":
+                result = backend.size()
+            elif op == "clear":
+                result = backend.clear()
+            else:
+                result = None
+            _send(self.request, {"result": result})
+
+class CacheServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """
+    Serves an InMemoryBackend over a Unix socket so several workers share one cache
+    """
+
+    daemon_threads = True
+
+    def __init__(self, path: str = ANALYTICS_CACHE_SOCKET, maxsize: int = ANALYTICS_CACHE_SIZE):
+        if os.path.exists(path):
+            os.unlink(path)
+        self.backend = InMemoryBackend(maxsize)
+        super().__init__(path, _CacheRequestHandler)
+
+class SocketBackend:
+    """
+    Client for a CacheServer. Keeps one connection per thread and reconnects on error.
+    """
+
+    name = "socket"
+
+    def __init__(self, path: str = ANALYTICS_CACHE_SOCKET, timeout: float = 0.5):
+        self.path = path
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _call(self, op: str, *args):
+        sock = getattr(self._local, "sock", None)
+        try:
+            if sock is None:
+                sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                sock.settimeout(self.timeout)
+                sock.connect(self.path)
+                self._local.sock = sock
+            _send(sock, {"op": op, "args": list(args)})
+            response = _receive(sock)
+            if response is None:
+                raise ConnectionError("cache server closed the connection")
+            return response["result"]
+        except OSError:
+            if sock is not None:
+                sock.close()
+            self._local.sock = None
+            raise
+
+    def get(self, key: str):
+        return self._call("get", key)
+
+    def generation(self):
+        return self._call("generation")
+
+    def set(self, key: str, value: Any, ttl: float, windows: List[Window], generation: int,
+            since: Optional[float] = None):
+        self._call("set", key, value, ttl, windows, generation, since)
+
+    def invalidate(self, moments: List[datetime]):
+        return self._call("invalidate", moments)
+
+    def size(self):
+        return self._call("size")
+
+    def clear(self):
+        self._call("clear")
+
+class AnalyticsCache:
+    """
+    Result cache in front of the analytics service functions. Entries are keyed
+    by the normalized call parameters and remember the date windows they cover
+    so a new sale only evicts the results it can change. A result whose
+    computation raced with an invalidation of one of its windows is not
+    stored, so it can't outlive the write that invalidated it. A result read
+    from the replica is held to the same check for the invalidations of the
+    last REPLICA_LAG_BOUND seconds before the read, as the replica may not have
+    replayed their writes yet. Backend errors fall back to computing the
+    result directly.
+    """
+
+    def __init__(self, backend=None, ttl: float = ANALYTICS_CACHE_TTL):
+        self.backend = backend
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.errors = 0
+        self._lock = threading.Lock()
+
+    def _count(self, counter: str, amount: int = 1):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + amount)
+
+    @staticmethod
+    def make_key(namespace: str, params: dict):
+        normalized = {
+            name: as_datetime(value) if isinstance(value, date) else value
+            for name, value in params.items()
+        }
+        return namespace + ":" + json.dumps(normalized, sort_keys=True, default=_encode)
+
+    def get_or_compute(self, namespace: str, params: dict, windows: List[Window], compute: Callable[[], Any],
+                       lag: float = 0):
+        if self.backend is None:
+            return compute()
+
+        key = self.make_key(namespace, params)
+        try:
+            value = self.backend.get(key)
+            # Read before computing: an invalidation meanwhile changes it
+            generation = self.backend.generation() if value is None else None
+        except OSError:
+            self._count("errors")
+            return compute()
+
+        if value is not None:
+            self._count("hits")
+            return value
+
+        self._count("misses")
+        # The data read may trail the writes of the last lag seconds
+        since = time.time() - lag if lag else None
+        value = compute()
+        try:
+            self.backend.set(key, value, self.ttl, windows, generation, since)
+        except OSError:
+            self._count("errors")
+        return value
+
+    def invalidate(self, order_dates: Iterable[datetime]):
+        """
+        Drop every cached result whose windows contain one of the order dates
+        """
+        if self.backend is None:
+            return
+        moments = sorted({as_datetime(order_date) for order_date in order_dates})
+        if not moments:
+            return
+        try:
+            self._count("invalidations", self.backend.invalidate(moments) or 0)
+        except OSError:
+            self._count("errors")
+
+    def clear(self):
+        """
+        Drop every cached result, for changes that are not tied to a few order dates
+        """
+        if self.backend is None:
+            return
+        try:
+            self.backend.clear()
+        except OSError:
+            self._count("errors")
+
+    def stats(self):
+        size = None
+        if self.backend is not None:
+            try:
+                size = self.backend.size()
+            except OSError:
+                pass
+        lookups = self.hits + self.misses
+        return {
+            "backend": self.backend.name if self.backend is not None else "none",
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "invalidations": self.invalidations,
+            "errors": self.errors,
+            "size": size
+        }
+
+    def cached(self, namespace: str, windows: Callable[[dict], List[Window]]):
+        """
+        Decorator for service functions taking db as their first argument.
+        windows(params) returns the date windows the result depends on.
+        The undecorated function stays available as .uncached.
+        """
+        def decorator(func):
+            signature = inspect.signature(func)
+
+            @functools.wraps(func)
+            def wrapper(db, *args, **kwargs):
+                bound = signature.bind(db, *args, **kwargs)
+                bound.apply_defaults()
+                params = {name: value for name, value in bound.arguments.items() if name != "db"}
+                return self.get_or_compute(
+                    namespace,
+                    params,
+                    [(as_datetime(start), as_datetime(end)) for start, end in windows(params)],
+                    lambda: func(db, *args, **kwargs),
+                    lag=REPLICA_LAG_BOUND if database.reads_replica(db) else 0
+                )
+
+            wrapper.uncached = func
+            return wrapper
+        return decorator
+
+def _create_backend():
+    if ANALYTICS_CACHE_BACKEND == "socket":
+        return SocketBackend(ANALYTICS_CACHE_SOCKET)
+    if ANALYTICS_CACHE_BACKEND == "memory":
+        return InMemoryBackend(ANALYTICS_CACHE_SIZE)
+    return None
+
+analytics_cache = AnalyticsCache(_create_backend())
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Shared analytics cache server for the socket backend")
+    parser.add_argument("--socket", default=ANALYTICS_CACHE_SOCKET, help="Unix socket path")
+    parser.add_argument("--size", type=int, default=ANALYTICS_CACHE_SIZE, help="Maximum number of entries")
+    args = parser.parse_args()
+
+    server = CacheServer(args.socket, args.size)
+    print(f"Analytics cache listening on {args.socket}")
+    server.serve_forever()
@@ -0,0 +1,330 @@
+"""
+Analytics reports computed in the background.
+
+Some reports are too slow for the request path, like a yearly revenue over
+several years or a comparison with category joins. Those can be submitted as
+jobs instead. submit() records the job in analytics_jobs and hands it to this
+worker's pool of at most ANALYTICS_JOB_WORKERS processes. The client then polls
+for the result, or long-polls with wait_for_job(). A job for the same report
+and parameters as one still pending or running is not started again: the
+submitter gets the job in flight. A finished job and its result are kept for
+ANALYTICS_JOB_TTL seconds, then deleted by a later submission. The job table
+is shared, so any worker can answer for a job submitted to another.
+
+The worker holding a job, queued or running, refreshes its heartbeat_at every
+ANALYTICS_JOB_HEARTBEAT seconds. A job in flight whose heartbeat is older than
+ANALYTICS_JOB_HEARTBEAT_TIMEOUT, e.g. the worker was restarted, is taken for
+lost and failed, so an identical submission can start it again.
+
+Pool processes are spawned rather than forked, so they inherit neither the
+connections nor the threads of the worker. They compute the report uncached,
+on the replica when the worker routes reads there, and write the result or the
+error to the job themselves.
+"""
+import asyncio
+import logging
+import multiprocessing
+import os
+import threading
+import uuid
+from concurrent.futures import Future, ProcessPoolExecutor
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+from fastapi import HTTPException
+from fastapi.encoders import jsonable_encoder
+from pydantic import parse_obj_as
+from sqlalchemy import text
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from app import database, metrics, models, schemas
+from app.services import sales_service
+from app.services.analytics_cache import analytics_cache
+
+ANALYTICS_JOB_WORKERS = int(os.getenv("ANALYTICS_JOB_WORKERS", "2"))
+# Jobs this worker may have in flight before new submissions are refused with 503
+ANALYTICS_JOB_MAX_QUEUED = int(os.getenv("ANALYTICS_JOB_MAX_QUEUED", "20"))
+# Seconds a finished job and its result are kept
+ANALYTICS_JOB_TTL = float(os.getenv("ANALYTICS_JOB_TTL", "600"))
+# Jobs in flight for longer are failed, even if their worker is still alive
+ANALYTICS_JOB_TIMEOUT = float(os.getenv("ANALYTICS_JOB_TIMEOUT", "1800"))
+# Seconds between heartbeats of the jobs a worker holds, and without one
+# before a job in flight is taken for lost
+ANALYTICS_JOB_HEARTBEAT = float(os.getenv("ANALYTICS_JOB_HEARTBEAT", "10"))
+ANALYTICS_JOB_HEARTBEAT_TIMEOUT = float(os.getenv("ANALYTICS_JOB_HEARTBEAT_TIMEOUT", "60"))
+# Seconds between reads of a job run by another worker while long-polling
+ANALYTICS_JOB_POLL_INTERVAL = 0.5
+
+IN_FLIGHT = ("pending", "running")
+
+# Analytics function and response model of every report
+REPORTS = {
+    "summary": (sales_service.get_sales_summary, schemas.SalesAnalytics),
+    "revenue": (sales_service.get_revenue_by_period, List[schemas.RevenueByPeriod]),
+    "series": (sales_service.get_revenue_series, schemas.RevenueSeriesResponse),
+    "compare": (sales_service.compare_revenue, dict),
+}
+
+logger = logging.getLogger(__name__)
+
+def _finish(job_id: str, status: str, result=None, error: Optional[str] = None):
+    now = datetime.now()
+    db = database.SessionLocal()
+    try:
+        db.query(models.AnalyticsJob).filter(models.AnalyticsJob.id == job_id).update({
+            models.AnalyticsJob.status: status,
+            models.AnalyticsJob.result: result,
+            models.AnalyticsJob.error: error,
+            models.AnalyticsJob.finished_at: now,
+            models.AnalyticsJob.expires_at: now + timedelta(seconds=ANALYTICS_JOB_TTL)
+        }, synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+
+def _run_job(job_id: str, report: str, params: dict, on_replica: bool):
+    # Runs in a pool process
+    db = database.SessionLocal()
+    try:
+        now = datetime.now()
+        started = db.query(models.AnalyticsJob).filter(
+            models.AnalyticsJob.id == job_id, models.AnalyticsJob.status == "pending"
+        ).update({
+            models.AnalyticsJob.status: "running",
+            models.AnalyticsJob.started_at: now,
+            models.AnalyticsJob.heartbeat_at: now
+        }, synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+    if not started:
+        # Failed as lost before a process got to it
+        return
+
+    read_session = database.ReadSessionLocal if on_replica and database.ReadSessionLocal else database.SessionLocal
+    compute, response_model = REPORTS[report]
+    db = read_session()
+    try:
+        # Validated like the endpoint's response, so both have the same shape
+        result = jsonable_encoder(parse_obj_as(response_model, compute.uncached(db, **params)))
+    except HTTPException as e:
+        _finish(job_id, "failed", error=str(e.detail))
+        return
+    except Exception as e:
+        logger.exception("Analytics job %s failed", job_id)
+        _finish(job_id, "failed", error=f"{type(e).__name__}: {e}")
+        return
+    finally:
+        db.close()
+    _finish(job_id, "done", result=result)
+
+class AnalyticsJobPool:
+    """
+    The process pool of this worker and the jobs it runs, created on first use
+    """
+
+    def __init__(self, workers: int = ANALYTICS_JOB_WORKERS, max_queued: int = ANALYTICS_JOB_MAX_QUEUED,
+                 heartbeat: float = ANALYTICS_JOB_HEARTBEAT):
+        self.workers = workers
+        self.max_queued = max_queued
+        self.heartbeat = heartbeat
+        self.submitted = 0
+        self.lost = 0
+        self._executor = None
+        self._stop = None
+        self._futures: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+
+    def check_capacity(self):
+        with self._lock:
+            if len(self._futures) >= self.max_queued:
+                raise HTTPException(
+                    status_code=503,
+                    detail="Too many analytics jobs in progress, retry later",
+                    headers={"Retry-After": "5"}
+                )
+
+    def submit(self, job_id: str, report: str, params: dict):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+                )
+                self._stop = threading.Event()
+                threading.Thread(
+                    target=self._beat, args=(self._stop,), name="analytics-job-heartbeat", daemon=True
+                ).start()
+            future = self._executor.submit(
+                _run_job, job_id, report, params, database.replica_available.is_set()
+            )
+            self._futures[job_id] = future
+            self.submitted += 1
+        future.add_done_callback(lambda done: self._done(job_id, done))
+
+    def _beat(self, stop: threading.Event):
+        # The jobs queued here are out of reach of a pool process, so the
+        # worker beats for every job it holds; a dead pool process fails its
+        # job through _done instead
+        while not stop.wait(self.heartbeat):
+            with self._lock:
+                job_ids = list(self._futures)
+            if not job_ids:
+                continue
+            try:
+                _record_heartbeat(job_ids)
+            except Exception:
+                logger.exception("Could not record the heartbeat of analytics jobs")
+
+    def _done(self, job_id: str, future: Future):
+        with self._lock:
+            self._futures.pop(job_id, None)
+        # The process died or the job was cancelled before it could record the outcome
+        if future.cancelled() or future.exception() is not None:
+            self.lost += 1
+            reason = "Cancelled" if future.cancelled() else f"{type(future.exception()).__name__}: {future.exception()}"
+            try:
+                _fail_in_flight([job_id], reason)
+            except Exception:
+                logger.exception("Could not record the failure of analytics job %s", job_id)
+
+    def future(self, job_id: str) -> Optional[Future]:
+        with self._lock:
+            return self._futures.get(job_id)
+
+    def in_flight(self):
+        with self._lock:
+            return len(self._futures)
+
+    def stop(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+            stop, self._stop = self._stop, None
+        if stop is not None:
+            stop.set()
+        if executor is not None:
+            # Cancelled jobs are failed by their done callbacks
+            executor.shutdown(wait=False, cancel_futures=True)
+
+analytics_job_pool = AnalyticsJobPool()
+
+def _record_heartbeat(job_ids):
+    db = database.SessionLocal()
+    try:
+        db.query(models.AnalyticsJob).filter(
+            models.AnalyticsJob.id.in_(job_ids), models.AnalyticsJob.status.in_(IN_FLIGHT)
+        ).update({models.AnalyticsJob.heartbeat_at: datetime.now()}, synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+
+def _fail_in_flight(job_ids, error: str):
+    db = database.SessionLocal()
+    try:
+        now = datetime.now()
+        db.query(models.AnalyticsJob).filter(
+            models.AnalyticsJob.id.in_(job_ids), models.AnalyticsJob.status.in_(IN_FLIGHT)
+        ).update({
+            models.AnalyticsJob.status: "failed",
+            models.AnalyticsJob.error: error,
+            models.AnalyticsJob.finished_at: now,
+            models.AnalyticsJob.expires_at: now + timedelta(seconds=ANALYTICS_JOB_TTL)
+        }, synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+
+def _expire(db: Session, now: datetime):
+    jobs = models.AnalyticsJob
+    db.query(jobs).filter(jobs.expires_at < now).delete(synchronize_session=False)
+    lost = {
+        "Lost: no heartbeat within ANALYTICS_JOB_HEARTBEAT_TIMEOUT":
+            jobs.heartbeat_at < now - timedelta(seconds=ANALYTICS_JOB_HEARTBEAT_TIMEOUT),
+        "Lost: not finished within ANALYTICS_JOB_TIMEOUT":
+            jobs.created_at < now - timedelta(seconds=ANALYTICS_JOB_TIMEOUT),
+    }
+    for error, condition in lost.items():
+        db.query(jobs).filter(jobs.status.in_(IN_FLIGHT), condition).update({
+            jobs.status: "failed",
+            jobs.error: error,
+            jobs.finished_at: now,
+            jobs.expires_at: now + timedelta(seconds=ANALYTICS_JOB_TTL)
+        }, synchronize_session=False)
+
+def submit(db: Session, report: str, params: dict) -> models.AnalyticsJob:
+    """
+    Start computing report (a key of REPORTS) with the keyword arguments of its
+    analytics function, or return the job already computing it
+    """
+    jobs = models.AnalyticsJob
+    key = analytics_cache.make_key(report, params)
+    while True:
+        now = datetime.now()
+        _expire(db, now)
+        db.commit()
+        existing = db.query(jobs).filter(jobs.key == key, jobs.status.in_(IN_FLIGHT)).first()
+        if existing is not None:
+            return existing
+        # Only a job this worker would start counts against its capacity
+        analytics_job_pool.check_capacity()
+        job_id = uuid.uuid4().hex
+        inserted = db.execute(
+            insert(jobs.__table__).values(
+                id=job_id,
+                report=report,
+                key=key,
+                params=jsonable_encoder(params),
+                status="pending",
+                created_at=now,
+                heartbeat_at=now
+            ).on_conflict_do_nothing(
+                index_elements=["key"], index_where=text("status IN ('pending', 'running')")
+            ).returning(jobs.id)
+        ).scalar()
+        db.commit()
+        if inserted is not None:
+            analytics_job_pool.submit(job_id, report, params)
+            return db.query(jobs).get(job_id)
+        # Submitted meanwhile by another request: the next lookup returns it
+
+def get_job(db: Session, job_id: str) -> Optional[models.AnalyticsJob]:
+    return db.query(models.AnalyticsJob).filter(models.AnalyticsJob.id == job_id).first()
+
+def _load_job(job_id: str) -> Optional[models.AnalyticsJob]:
+    # Always on the primary, where the pool processes write
+    db = database.SessionLocal()
+    try:
+        return get_job(db, job_id)
+    finally:
+        db.close()
+
+async def wait_for_job(job_id: str, wait: float = 0) -> Optional[models.AnalyticsJob]:
+    """
+    The job, once it is finished or after wait seconds, whichever comes
+    first. None if there is no such job.
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + wait
+    while True:
+        job = await run_in_threadpool(_load_job, job_id)
+        remaining = deadline - loop.time()
+        if job is None or job.status not in IN_FLIGHT or remaining <= 0:
+            return job
+        future = analytics_job_pool.future(job_id)
+        if future is None:
+            # Run by another worker, or finishing right now
+            await asyncio.sleep(min(ANALYTICS_JOB_POLL_INTERVAL, remaining))
+            continue
+        try:
+            # Shielded: the timeout must not cancel the job itself
+            await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(future)), remaining)
+        except asyncio.TimeoutError:
+            pass
+        except Exception:
+            # Recorded on the job by the pool
+            pass
+
+metrics.registry.gauge(
+    "analytics_jobs_in_flight",
+    "Analytics jobs submitted to this worker's process pool and not finished",
+    lambda: [({}, analytics_job_pool.in_flight())]
+)
@@ -0,0 +1,55 @@
+# Async counterparts of inventory_service, see async_product_service
+from sqlalchemy.ext.asyncio import AsyncSession
+from app import schemas
+from app.services import inventory_service
+from datetime import date
+from typing import List, Optional
+
+async def get_inventory(db: AsyncSession, skip: int = 0, limit: int = 100, low_stock_only: bool = False, cursor: Optional[str] = None):
+    return await db.run_sync(
+        inventory_service.get_inventory, skip=skip, limit=limit, low_stock_only=low_stock_only, cursor=cursor
+    )
+
+async def get_inventory_rows(db: AsyncSession, skip: int = 0, limit: int = 100, low_stock_only: bool = False, cursor: Optional[str] = None):
+    return await db.run_sync(
+        inventory_service.get_inventory_rows, skip=skip, limit=limit, low_stock_only=low_stock_only, cursor=cursor
+    )
+
+async def get_inventory_by_product(db: AsyncSession, product_id: int, load_options=()):
+    return await db.run_sync(
+        inventory_service.get_inventory_by_product, product_id=product_id, load_options=load_options
+    )
+
+async def get_inventory_detail(db: AsyncSession, product_id: int, history_limit: int = inventory_service.INVENTORY_HISTORY_LIMIT):
+    return await db.run_sync(inventory_service.get_inventory_detail, product_id=product_id, history_limit=history_limit)
+
+async def get_inventory_history(db: AsyncSession, inventory_id: int, limit: int = inventory_service.INVENTORY_HISTORY_LIMIT,
+                                start_date: Optional[date] = None, end_date: Optional[date] = None,
+                                cursor: Optional[str] = None):
+    return await db.run_sync(
+        inventory_service.get_inventory_history,
+        inventory_id=inventory_id, limit=limit, start_date=start_date, end_date=end_date, cursor=cursor
+    )
+
+async def get_inventory_history_daily(db: AsyncSession, inventory_id: int,
+                                      start_date: Optional[date] = None, end_date: Optional[date] = None):
+    return await db.run_sync(
+        inventory_service.get_inventory_history_daily, inventory_id=inventory_id, start_date=start_date, end_date=end_date
+    )
+
+async def create_inventory(db: AsyncSession, inventory: schemas.InventoryCreate):
+    return await db.run_sync(inventory_service.create_inventory, inventory=inventory)
+
+async def update_inventory(db: AsyncSession, product_id: int, inventory: schemas.InventoryUpdate, change_reason: Optional[str] = None):
+    return await db.run_sync(
+        inventory_service.update_inventory, product_id=product_id, inventory=inventory, change_reason=change_reason
+    )
+
+async def update_inventory_bulk(db: AsyncSession, items: List[schemas.InventoryBulkItem], change_reason: Optional[str] = None):
+    return await db.run_sync(inventory_service.update_inventory_bulk, items=items, change_reason=change_reason)
+
+async def get_low_stock_alerts(db: AsyncSession):
+    return await db.run_sync(inventory_service.get_low_stock_alerts)
+
+async def get_low_stock_snapshot(db: AsyncSession):
+    return await db.run_sync(inventory_service.get_low_stock_snapshot)
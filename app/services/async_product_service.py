@@ -0,0 +1,40 @@
+# Async counterparts of product_service for AsyncSession. Each call runs the
+# sync implementation through AsyncSession.run_sync, which drives it on the
+# async driver inside a greenlet, so no threadpool worker is held during IO.
+from sqlalchemy.ext.asyncio import AsyncSession
+from app import schemas
+from app.services import product_service
+
+async def get_product(db: AsyncSession, product_id: int):
+    return await db.run_sync(product_service.get_product, product_id=product_id)
+
+async def get_product_by_sku(db: AsyncSession, sku: str):
+    return await db.run_sync(product_service.get_product_by_sku, sku=sku)
+
+async def get_products(db: AsyncSession, skip: int = 0, limit: int = 100, category_id: int = None, cursor: str = None):
+    return await db.run_sync(
+        product_service.get_products, skip=skip, limit=limit, category_id=category_id, cursor=cursor
+    )
+
+async def get_product_rows(db: AsyncSession, skip: int = 0, limit: int = 100, category_id: int = None, cursor: str = None):
+    return await db.run_sync(
+        product_service.get_product_rows, skip=skip, limit=limit, category_id=category_id, cursor=cursor
+    )
+
+async def create_product(db: AsyncSession, product: schemas.ProductCreate):
+    return await db.run_sync(product_service.create_product, product=product)
+
+async def update_product(db: AsyncSession, product_id: int, product: schemas.ProductUpdate):
+    return await db.run_sync(product_service.update_product, product_id=product_id, product=product)
+
+async def delete_product(db: AsyncSession, product_id: int):
+    return await db.run_sync(product_service.delete_product, product_id=product_id)
+
+async def get_category(db: AsyncSession, category_id: int):
+    return await db.run_sync(product_service.get_category, category_id=category_id)
+
+async def get_categories(db: AsyncSession, skip: int = 0, limit: int = 100):
+    return await db.run_sync(product_service.get_categories, skip=skip, limit=limit)
+
+async def create_category(db: AsyncSession, category: schemas.CategoryCreate):
+    return await db.run_sync(product_service.create_category, category=category)
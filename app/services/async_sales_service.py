@@ -0,0 +1,123 @@
+# Async counterparts of sales_service, see async_product_service
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from datetime import datetime
+from app import schemas
+from app.services import analytics_jobs, sales_service
+from typing import List, Optional
+
+async def get_sales(db: AsyncSession, skip: int = 0, limit: int = 100,
+                    start_date: Optional[datetime] = None,
+                    end_date: Optional[datetime] = None,
+                    platform: Optional[str] = None,
+                    status: Optional[str] = None,
+                    cursor: Optional[str] = None):
+    return await db.run_sync(
+        sales_service.get_sales,
+        skip=skip,
+        limit=limit,
+        start_date=start_date,
+        end_date=end_date,
+        platform=platform,
+        status=status,
+        cursor=cursor
+    )
+
+async def get_sales_rows(db: AsyncSession, skip: int = 0, limit: int = 100,
+                         start_date: Optional[datetime] = None,
+                         end_date: Optional[datetime] = None,
+                         platform: Optional[str] = None,
+                         status: Optional[str] = None,
+                         cursor: Optional[str] = None):
+    return await db.run_sync(
+        sales_service.get_sales_rows,
+        skip=skip,
+        limit=limit,
+        start_date=start_date,
+        end_date=end_date,
+        platform=platform,
+        status=status,
+        cursor=cursor
+    )
+
+async def get_sale_by_id(db: AsyncSession, sale_id: int):
+    return await db.run_sync(sales_service.get_sale_by_id, sale_id=sale_id)
+
+async def get_sale_by_order_id(db: AsyncSession, order_id: str):
+    return await db.run_sync(sales_service.get_sale_by_order_id, order_id=order_id)
+
+def _create_sale_with_items(db: Session, sale: schemas.SaleCreate):
+    db_sale = sales_service.create_sale(db, sale)
+    # Load items while IO is still allowed; the response serializes them
+    db_sale.items
+    return db_sale
+
+async def create_sale(db: AsyncSession, sale: schemas.SaleCreate):
+    return await db.run_sync(_create_sale_with_items, sale=sale)
+
+async def create_sales_bulk(db: AsyncSession, sales: List[schemas.SaleCreate], batch_size: int = 500):
+    return await db.run_sync(sales_service.create_sales_bulk, sales=sales, batch_size=batch_size)
+
+async def get_sales_summary(db: AsyncSession,
+                            start_date: Optional[datetime] = None,
+                            end_date: Optional[datetime] = None,
+                            engine: Optional[str] = None):
+    return await db.run_sync(sales_service.get_sales_summary, start_date=start_date, end_date=end_date, engine=engine)
+
+async def get_revenue_by_period(db: AsyncSession,
+                                period_type: str = "daily",
+                                start_date: Optional[datetime] = None,
+                                end_date: Optional[datetime] = None,
+                                platform: Optional[str] = None,
+                                category_id: Optional[int] = None,
+                                engine: Optional[str] = None):
+    return await db.run_sync(
+        sales_service.get_revenue_by_period,
+        period_type=period_type,
+        start_date=start_date,
+        end_date=end_date,
+        platform=platform,
+        category_id=category_id,
+        engine=engine
+    )
+
+async def get_revenue_series(db: AsyncSession,
+                             period_type: str = "daily",
+                             start_date: Optional[datetime] = None,
+                             end_date: Optional[datetime] = None,
+                             group_by: List[str] = (),
+                             platform: Optional[str] = None,
+                             category_id: Optional[int] = None):
+    return await db.run_sync(
+        sales_service.get_revenue_series,
+        period_type=period_type,
+        start_date=start_date,
+        end_date=end_date,
+        group_by=group_by,
+        platform=platform,
+        category_id=category_id
+    )
+
+async def compare_revenue(db: AsyncSession,
+                          period_type: str = "monthly",
+                          current_start: datetime = None,
+                          current_end: datetime = None,
+                          previous_start: datetime = None,
+                          previous_end: datetime = None,
+                          platform: Optional[str] = None,
+                          category_id: Optional[int] = None,
+                          engine: Optional[str] = None):
+    return await db.run_sync(
+        sales_service.compare_revenue,
+        period_type=period_type,
+        current_start=current_start,
+        current_end=current_end,
+        previous_start=previous_start,
+        previous_end=previous_end,
+        platform=platform,
+        category_id=category_id,
+        engine=engine
+    )
+
+async def submit_analytics_job(db: AsyncSession, report: str, params: dict):
+    return await db.run_sync(analytics_jobs.submit, report=report, params=params)
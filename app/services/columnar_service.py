@@ -0,0 +1,492 @@
+"""
+In-process columnar analytics engine.
+
+Sales and sale items are held in NumPy column arrays: timestamps as int64
+microseconds, platform and category as dictionary-encoded int32 codes and
+amounts as float64. Revenue by period, the sales summary and window totals
+are answered with vectorized masks and group-bys over those arrays instead of
+SQL, with the same semantics as the queries in sales_service. Counts are
+identical to the SQL path's. Revenue figures are float sums taken in a
+different order, so they are equal to the SQL path's after rounding to cents,
+not necessarily in the last bits.
+
+The store loads everything on first use and then catches up incrementally
+from an id watermark per table. Ids that are skipped by the watermark (rows of
+transactions still in flight, or rolled back) are remembered as gaps and
+re-read on later refreshes until ANALYTICS_COLUMNAR_GAP_TTL has passed.
+Rows are never updated in place except by a product category change. The
+writer calls notify_reset() in its transaction, and on commit the
+ColumnarResetListener of every worker resets its store. A listener that loses
+its connection resets the store too, since a reset sent meanwhile is lost.
+It always catches up from the primary, even for a query given a replica
+session.
+"""
+import logging
+import os
+import select as select_module
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from sqlalchemy import select, or_, text
+from sqlalchemy.orm import Session
+from app import models
+from app.database import listen_engine, primary_session, reads_replica
+from app.services.rollup_service import as_datetime
+
+# "sql" or "columnar", the engine used when a request does not pick one
+ANALYTICS_ENGINE = os.getenv("ANALYTICS_ENGINE", "sql")
+# Minimum seconds between catch-ups; 0 catches up before every query
+ANALYTICS_COLUMNAR_REFRESH = float(os.getenv("ANALYTICS_COLUMNAR_REFRESH", "0"))
+ANALYTICS_COLUMNAR_GAP_TTL = float(os.getenv("ANALYTICS_COLUMNAR_GAP_TTL", "300"))
+
+LOAD_BATCH_SIZE = 50_000
+US_PER_DAY = 86_400_000_000
+NULL_CODE = -1
+
+COLUMNAR_RESET_CHANNEL = "columnar_reset"
+
+logger = logging.getLogger(__name__)
+
+def use_columnar(engine: Optional[str] = None):
+    """
+    Whether a request should be answered by the columnar engine
+    """
+    return (engine or ANALYTICS_ENGINE) == "columnar"
+
+def _to_us(value: datetime):
+    return int(np.datetime64(value, "us").astype(np.int64))
+
+class _Dictionary:
+    """
+    Dictionary encoding of a low-cardinality column; None is NULL_CODE
+    """
+
+    def __init__(self):
+        self.values = []
+        self.codes = {}
+
+    def encode(self, values) -> np.ndarray:
+        codes = np.empty(len(values), dtype=np.int32)
+        for index, value in enumerate(values):
+            if value is None:
+                codes[index] = NULL_CODE
+                continue
+            code = self.codes.get(value)
+            if code is None:
+                code = self.codes[value] = len(self.values)
+                self.values.append(value)
+            codes[index] = code
+        return codes
+
+    def code_of(self, value) -> Optional[int]:
+        return self.codes.get(value)
+
+class _Columns:
+    """
+    Append-only column arrays with amortized growth. Readers take views of the
+    first `size` rows; appends never modify those rows, and growing replaces
+    the buffers so earlier views stay valid.
+    """
+
+    def __init__(self, dtypes: Dict[str, type]):
+        self.dtypes = dtypes
+        self.size = 0
+        self.arrays = {name: np.empty(0, dtype=dtype) for name, dtype in dtypes.items()}
+
+    def append(self, columns: Dict[str, np.ndarray]):
+        count = len(next(iter(columns.values())))
+        if not count:
+            return
+        needed = self.size + count
+        capacity = len(self.arrays[next(iter(self.dtypes))])
+        if needed > capacity:
+            capacity = max(needed, capacity * 2, 1024)
+            for name, array in self.arrays.items():
+                grown = np.empty(capacity, dtype=self.dtypes[name])
+                grown[:self.size] = array[:self.size]
+                self.arrays[name] = grown
+        for name, values in columns.items():
+            self.arrays[name][self.size:needed] = values
+        self.size = needed
+
+    def snapshot(self) -> Dict[str, np.ndarray]:
+        size = self.size
+        return {name: array[:size] for name, array in self.arrays.items()}
+
+class _Watermark:
+    """
+    Highest id loaded from a table plus the id ranges below it not seen yet
+    """
+
+    def __init__(self, gap_ttl: float):
+        self.gap_ttl = gap_ttl
+        self.last_id = 0
+        self.gaps: List[Tuple[int, int, float]] = []
+
+    def condition(self, id_column):
+        return or_(id_column > self.last_id, *[id_column.between(low, high) for low, high, _ in self.gaps])
+
+    def advance(self, ids: np.ndarray):
+        now = time.monotonic()
+        ids = np.sort(ids)
+        gaps = []
+        for low, high, seen_at in self.gaps:
+            if now - seen_at < self.gap_ttl:
+                gaps.extend((start, end, seen_at) for start, end in _missing_ranges(ids, low, high))
+        if len(ids) and ids[-1] > self.last_id:
+            gaps.extend((start, end, now) for start, end in _missing_ranges(ids, self.last_id + 1, int(ids[-1])))
+            self.last_id = int(ids[-1])
+        self.gaps = gaps
+
+def _missing_ranges(ids: np.ndarray, low: int, high: int):
+    """
+    Ranges of [low, high] not covered by the sorted ids
+    """
+    inside = ids[(ids >= low) & (ids <= high)]
+    bounds = np.concatenate(([low - 1], inside, [high + 1]))
+    holes = np.nonzero(np.diff(bounds) > 1)[0]
+    return [(int(bounds[i]) + 1, int(bounds[i + 1]) - 1) for i in holes]
+
+class _State:
+    """
+    Columns, dictionaries and watermarks loaded since the last reset. A reset
+    replaces the whole state, and codes are never reassigned within one, so a
+    reader holding a state sees columns and dictionaries that agree.
+    """
+
+    def __init__(self, gap_ttl: float):
+        self.platforms = _Dictionary()
+        self.categories = _Dictionary()
+        self.sales = _Columns({"id": np.int64, "ts": np.int64, "platform": np.int32, "amount": np.float64})
+        self.items = _Columns({
+            "sale_id": np.int64, "ts": np.int64, "platform": np.int32, "category": np.int32,
+            "product_id": np.int64, "quantity": np.int64, "amount": np.float64
+        })
+        self.sales_watermark = _Watermark(gap_ttl)
+        self.items_watermark = _Watermark(gap_ttl)
+        self.refreshed_at = None
+
+class ColumnarStore:
+    """
+    Sales and sale item columns for one process, caught up on demand
+    """
+
+    def __init__(self, refresh_interval: float = ANALYTICS_COLUMNAR_REFRESH,
+                 gap_ttl: float = ANALYTICS_COLUMNAR_GAP_TTL):
+        self.refresh_interval = refresh_interval
+        self.gap_ttl = gap_ttl
+        self.resets = 0
+        self._lock = threading.Lock()
+        self._state = _State(gap_ttl)
+
+    def reset(self):
+        """
+        Drop all loaded rows; the next query reloads from scratch
+        """
+        with self._lock:
+            self._state = _State(self.gap_ttl)
+            self.resets += 1
+
+    def catch_up(self, db: Session) -> _State:
+        """
+        Load the sales and sale items added since the last refresh. Returns the
+        state to answer from.
+        """
+        with self._lock:
+            state = self._state
+            if state.refreshed_at is not None and time.monotonic() - state.refreshed_at < self.refresh_interval:
+                return state
+
+            sale = models.Sale
+            query = select(sale.id, sale.order_date, sale.platform, sale.total_amount).where(
+                state.sales_watermark.condition(sale.id)
+            ).order_by(sale.id)
+            loaded = []
+            for rows in _partitions(db, query):
+                ids, order_dates, platforms, amounts = zip(*rows)
+                loaded.append(np.array(ids, dtype=np.int64))
+                state.sales.append({
+                    "id": loaded[-1],
+                    "ts": _timestamps(order_dates),
+                    "platform": state.platforms.encode(platforms),
+                    "amount": np.array(amounts, dtype=np.float64)
+                })
+            state.sales_watermark.advance(np.concatenate(loaded) if loaded else np.empty(0, dtype=np.int64))
+
+            item = models.SaleItem
+            query = select(
+                item.id, item.sale_id, item.order_date, sale.platform, item.category_id,
+                item.product_id, item.quantity, item.subtotal
+            ).join(sale, sale.id == item.sale_id).where(
+                state.items_watermark.condition(item.id)
+            ).order_by(item.id)
+            loaded = []
+            for rows in _partitions(db, query):
+                ids, sale_ids, order_dates, platforms, categories, product_ids, quantities, amounts = zip(*rows)
+                loaded.append(np.array(ids, dtype=np.int64))
+                state.items.append({
+                    "sale_id": np.array(sale_ids, dtype=np.int64),
+                    "ts": _timestamps(order_dates),
+                    "platform": state.platforms.encode(platforms),
+                    "category": state.categories.encode(categories),
+                    "product_id": np.array(product_ids, dtype=np.int64),
+                    "quantity": np.array(quantities, dtype=np.int64),
+                    "amount": np.array(amounts, dtype=np.float64)
+                })
+            state.items_watermark.advance(np.concatenate(loaded) if loaded else np.empty(0, dtype=np.int64))
+
+            state.refreshed_at = time.monotonic()
+            return state
+
+    def stats(self):
+        state = self._state
+        return {
+            "sales": state.sales.size,
+            "sale_items": state.items.size,
+            "sales_watermark": state.sales_watermark.last_id,
+            "sale_items_watermark": state.items_watermark.last_id,
+            "gaps": len(state.sales_watermark.gaps) + len(state.items_watermark.gaps),
+            "resets": self.resets
+        }
+
+def _partitions(db: Session, query):
+    result = db.execute(query.execution_options(stream_results=True))
+    return result.partitions(LOAD_BATCH_SIZE)
+
+def _timestamps(values) -> np.ndarray:
+    # NULL order dates become NaT (the smallest int64) and never match a window
+    return np.array(values, dtype="datetime64[us]").astype(np.int64)
+
+columnar_store = ColumnarStore()
+
+def notify_reset(db: Session):
+    """
+    Reset the columnar stores of all workers once db's transaction commits.
+    Call before the commit.
+    """
+    db.execute(text("SELECT pg_notify(:channel, '')"), {"channel": COLUMNAR_RESET_CHANNEL})
+
+class ColumnarResetListener:
+    """
+    Background thread LISTENing on the reset channel on its own connection and
+    resetting the store of this worker
+    """
+
+    def __init__(self, store: ColumnarStore = columnar_store, bind=None, retry_interval: float = 5.0):
+        self.store = store
+        self.bind = bind
+        self.retry_interval = retry_interval
+        self.notifications = 0
+        self.reconnects = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="columnar-reset-listener", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self._listen()
+            except Exception:
+                self.reconnects += 1
+                logger.exception("Columnar reset listener lost its connection")
+            # A reset sent while not listening is lost
+            self.store.reset()
+            self._stop.wait(self.retry_interval)
+
+    def _listen(self):
+        connection = (self.bind or listen_engine).raw_connection()
+        try:
+            dbapi_connection = connection.connection
+            # LISTEN only takes effect outside a transaction
+            dbapi_connection.autocommit = True
+            with dbapi_connection.cursor() as cursor:
+                cursor.execute(f"LISTEN {COLUMNAR_RESET_CHANNEL}")
+            # Anything loaded before LISTEN may have missed its reset
+            self.store.reset()
+            while not self._stop.is_set():
+                if select_module.select([dbapi_connection], [], [], 1.0) == ([], [], []):
+                    continue
+                dbapi_connection.poll()
+                if dbapi_connection.notifies:
+                    self.notifications += len(dbapi_connection.notifies)
+                    dbapi_connection.notifies.clear()
+                    self.store.reset()
+        finally:
+            # Switched to autocommit, so it must not be reused: closed rather than returned to a pool
+            connection.invalidate()
+
+columnar_reset_listener = ColumnarResetListener()
+
+def _facts(db: Session, by_items: bool = False):
+    """
+    The caught-up state and the columns of the fact source: sale items for
+    category figures (by_items), sales otherwise (as sales_service._raw_facts)
+    """
+    if reads_replica(db):
+        # A lagging replica would move the watermarks past rows it hasn't replayed yet
+        with primary_session(db) as primary:
+            state = columnar_store.catch_up(primary)
+    else:
+        state = columnar_store.catch_up(db)
+    return state, state.items.snapshot() if by_items else state.sales.snapshot()
+
+def _window_mask(state: _State, columns, start: datetime, end: datetime,
+                 platform: Optional[str] = None, category_id: Optional[int] = None):
+    ts = columns["ts"]
+    mask = (ts >= _to_us(start)) & (ts <= _to_us(end))
+    if platform:
+        code = state.platforms.code_of(platform)
+        if code is None:
+            mask[:] = False
+        else:
+            mask &= columns["platform"] == code
+    if category_id:
+        code = state.categories.code_of(category_id)
+        if code is None:
+            mask[:] = False
+        else:
+            mask &= columns["category"] == code
+    return mask
+
+def _period_keys(period_type: str, ts: np.ndarray):
+    """
+    Integer bucket per timestamp and a function formatting a bucket the way
+    str() formats the SQL period value
+    """
+    days = ts // US_PER_DAY
+    if period_type == "daily":
+        return days, lambda key: str(np.datetime64(int(key), "D"))
+    if period_type == "weekly":
+        # 1970-01-01 was a Thursday; weeks start on Monday as in date_trunc
+        mondays = days - (days + 3) % 7
+        return mondays, lambda key: f"{np.datetime64(int(key), 'D')} 00:00:00"
+    if period_type == "monthly":
+        months = days.astype("datetime64[D]").astype("datetime64[M]").astype(np.int64)
+        return months, lambda key: f"{np.datetime64(int(key), 'M').astype('datetime64[D]')} 00:00:00"
+    years = days.astype("datetime64[D]").astype("datetime64[Y]").astype(np.int64)
+    return years, lambda key: str(1970 + int(key))
+
+def _distinct_counts(keys: np.ndarray, sale_ids: np.ndarray, unique_keys: np.ndarray):
+    """
+    Number of distinct sale ids per key, aligned with unique_keys
+    """
+    if not len(keys):
+        return np.zeros(0, dtype=np.int64)
+    pairs = np.unique(np.stack([keys, sale_ids]), axis=1)
+    pair_keys, counts = np.unique(pairs[0], return_counts=True)
+    return counts[np.searchsorted(pair_keys, unique_keys)]
+
+def get_revenue_by_period(db: Session,
+                          period_type: str,
+                          start_date: datetime,
+                          end_date: datetime,
+                          platform: Optional[str] = None,
+                          category_id: Optional[int] = None):
+    """
+    Columnar counterpart of sales_service.get_revenue_by_period for a resolved window
+    """
+    state, columns = _facts(db, by_items=bool(category_id))
+    mask = _window_mask(state, columns, as_datetime(start_date), as_datetime(end_date), platform, category_id)
+    keys, label = _period_keys(period_type, columns["ts"][mask])
+    unique_keys, inverse = np.unique(keys, return_inverse=True)
+    revenue = np.bincount(inverse, weights=columns["amount"][mask], minlength=len(unique_keys))
+    if category_id:
+        order_count = _distinct_counts(keys, columns["sale_id"][mask], unique_keys)
+    else:
+        order_count = np.bincount(inverse, minlength=len(unique_keys))
+
+    return [
+        {
+            "period": label(key),
+            "revenue": float(total),
+            "order_count": int(count)
+        } for key, total, count in zip(unique_keys, revenue, order_count)
+    ]
+
+def windows_revenue(db: Session, windows, platform: Optional[str] = None, category_id: Optional[int] = None):
+    """
+    Columnar counterpart of sales_service._windows_revenue
+    """
+    state, columns = _facts(db, by_items=bool(category_id))
+    return [
+        float(columns["amount"][_window_mask(
+            state, columns, as_datetime(start), as_datetime(end), platform, category_id
+        )].sum())
+        for start, end in windows
+    ]
+
+def get_sales_summary(db: Session, start_date: datetime, end_date: datetime):
+    """
+    Columnar counterpart of sales_service.get_sales_summary for a resolved window
+    """
+    start, end = as_datetime(start_date), as_datetime(end_date)
+    state, sales = _facts(db)
+    mask = _window_mask(state, sales, start, end)
+    amounts = sales["amount"][mask]
+    total_orders = int(mask.sum())
+    total_revenue = float(amounts.sum())
+
+    codes, inverse = np.unique(sales["platform"][mask], return_inverse=True)
+    platform_revenue = np.bincount(inverse, weights=amounts, minlength=len(codes))
+    platform_orders = np.bincount(inverse, minlength=len(codes))
+    values = state.platforms.values
+    platforms = [
+        {
+            "platform": None if code == NULL_CODE else values[code],
+            "order_count": int(count),
+            "revenue": float(revenue)
+        } for code, count, revenue in zip(codes, platform_orders, platform_revenue)
+    ]
+
+    items = state.items.snapshot()
+    item_mask = _window_mask(state, items, start, end)
+    product_ids, inverse = np.unique(items["product_id"][item_mask], return_inverse=True)
+    quantities = np.bincount(inverse, weights=items["quantity"][item_mask], minlength=len(product_ids))
+    revenue = np.bincount(inverse, weights=items["amount"][item_mask], minlength=len(product_ids))
+    # Highest quantity first, ties by product id
+    top = np.lexsort((product_ids, -quantities))[:5]
+    names = dict(
+        db.query(models.Product.id, models.Product.name).filter(
+            models.Product.id.in_(product_ids[top].tolist())
+        ).all()
+    ) if len(top) else {}
+
+    return {
+        "period": {
+            "start_date": start_date,
+            "end_date": end_date
+        },
+        "summary": {
+            "total_orders": total_orders,
+            "total_revenue": total_revenue
+        },
+        "platforms": platforms,
+        "top_products": [
+            {
+                "id": int(product_ids[index]),
+                "name": names.get(int(product_ids[index])),
+                "total_quantity": int(quantities[index]),
+                "total_revenue": float(revenue[index])
+            } for index in top
+        ],
+        # Computed from the live columns, not the materialized view
+        "top_products_refreshed_at": None,
+        "total_sales": total_revenue,
+        "total_orders": total_orders,
+        "average_order_value": total_revenue / total_orders if total_orders > 0 else 0
+    }
@@ -1,20 +1,99 @@
+import os
 from sqlalchemy.orm import Session
-from sqlalchemy import func
-from datetime import datetime
+from sqlalchemy import func, select, insert, update, values, column, case, cast, or_, tuple_, Integer
+from datetime import date, datetime, timedelta
 from app import models, schemas
+from app.services import pagination, stock_alerts
 from fastapi import HTTPException
-from typing import Optional
+from typing import Dict, List, Optional
 
-def get_inventory(db: Session, skip: int = 0, limit: int = 100, low_stock_only: bool = False):
-    query = db.query(models.Inventory)
-    
+# Reject sales for more units than are in stock instead of clamping stock at 0
+INVENTORY_STRICT_STOCK = os.getenv("INVENTORY_STRICT_STOCK", "false").lower() in ("1", "true", "yes")
+# Stock changes returned with an inventory row, and the default history page size
+INVENTORY_HISTORY_LIMIT = int(os.getenv("INVENTORY_HISTORY_LIMIT", "50"))
+
+def get_inventory(db: Session, skip: int = 0, limit: int = 100, low_stock_only: bool = False, cursor: Optional[str] = None):
+    return _page_inventory(db.query(models.Inventory), skip, limit, low_stock_only, cursor).all()
+
+def _page_inventory(query, skip: int, limit: int, low_stock_only: bool = False, cursor: Optional[str] = None):
     if low_stock_only:
         query = query.filter(models.Inventory.quantity <= models.Inventory.low_stock_threshold)
     
-    return query.offset(skip).limit(limit).all()
+    if cursor:
+        # Keyset page: continue after the inventory id in the cursor instead of skipping
+        (last_id,) = pagination.decode_cursor(cursor, int)
+        query = query.filter(models.Inventory.id > last_id)
+        skip = 0
+    
+    return query.order_by(models.Inventory.id).offset(skip).limit(limit)
+
+def get_inventory_cursor(inventory: models.Inventory):
+    return pagination.encode_cursor(inventory.id)
+
+INVENTORY_FIELDS = list(schemas.Inventory.__fields__)
+
+def get_inventory_rows(db: Session, skip: int = 0, limit: int = 100, low_stock_only: bool = False, cursor: Optional[str] = None):
+    """
+    The get_inventory page as plain dicts with the schemas.Inventory fields.
+    Returns (rows, next page cursor).
+    """
+    query = db.query(*[getattr(models.Inventory, name) for name in INVENTORY_FIELDS])
+    rows = [dict(zip(INVENTORY_FIELDS, row)) for row in _page_inventory(query, skip, limit, low_stock_only, cursor)]
+    next_cursor = pagination.encode_cursor(rows[-1]["id"]) if rows and len(rows) == limit else None
+    return rows, next_cursor
 
-def get_inventory_by_product(db: Session, product_id: int):
-    return db.query(models.Inventory).filter(models.Inventory.product_id == product_id).first()
+def get_inventory_by_product(db: Session, product_id: int, load_options=()):
+    return db.query(models.Inventory).options(*load_options).filter(models.Inventory.product_id == product_id).first()
+
+def get_inventory_detail(db: Session, product_id: int, history_limit: int = INVENTORY_HISTORY_LIMIT):
+    """
+    The inventory row of a product with its most recent stock changes, shaped
+    like schemas.InventoryWithHistory, or None if the product has no inventory
+    """
+    db_inventory = get_inventory_by_product(db, product_id=product_id)
+    if db_inventory is None:
+        return None
+    history, next_cursor = get_inventory_history(db, db_inventory.id, limit=history_limit)
+    return dict(
+        schemas.Inventory.from_orm(db_inventory).dict(),
+        history=history,
+        history_next_cursor=next_cursor
+    )
+
+def get_inventory_history(db: Session, inventory_id: int, limit: int = INVENTORY_HISTORY_LIMIT,
+                          start_date: Optional[date] = None, end_date: Optional[date] = None,
+                          cursor: Optional[str] = None):
+    """
+    Stock changes of an inventory row, newest first. Dates are inclusive days;
+    the cursor continues after the (change_date, id) it encodes.
+    Returns (rows, next page cursor).
+    """
+    history = models.InventoryHistory
+    query = db.query(history).filter(history.inventory_id == inventory_id)
+    if start_date:
+        query = query.filter(history.change_date >= start_date)
+    if end_date:
+        query = query.filter(history.change_date < end_date + timedelta(days=1))
+    if cursor:
+        change_date, history_id = pagination.decode_cursor(cursor, datetime, int)
+        query = query.filter(tuple_(history.change_date, history.id) < tuple_(change_date, history_id))
+
+    rows = query.order_by(history.change_date.desc(), history.id.desc()).limit(limit).all()
+    next_cursor = pagination.encode_cursor(rows[-1].change_date, rows[-1].id) if rows and len(rows) == limit else None
+    return rows, next_cursor
+
+def get_inventory_history_daily(db: Session, inventory_id: int,
+                                start_date: Optional[date] = None, end_date: Optional[date] = None):
+    """
+    Daily summaries of the compacted stock changes of an inventory row, oldest first
+    """
+    daily = models.InventoryHistoryDaily
+    query = db.query(daily).filter(daily.inventory_id == inventory_id)
+    if start_date:
+        query = query.filter(daily.day >= start_date)
+    if end_date:
+        query = query.filter(daily.day <= end_date)
+    return query.order_by(daily.day).all()
 
 def create_inventory(db: Session, inventory: schemas.InventoryCreate):
     db_inventory = get_inventory_by_product(db, product_id=inventory.product_id)
@@ -33,6 +112,7 @@ def create_inventory(db: Session, inventory: schemas.InventoryCreate):
 
 def update_inventory(db: Session, product_id: int, inventory: schemas.InventoryUpdate, change_reason: Optional[str] = None):
     db_inventory = get_inventory_by_product(db, product_id=product_id)
+    previous_quantity, previous_threshold = db_inventory.quantity, db_inventory.low_stock_threshold
     
     if inventory.quantity is not None and inventory.quantity != db_inventory.quantity:
         history = models.InventoryHistory(
@@ -49,12 +129,215 @@ def update_inventory(db: Session, product_id: int, inventory: schemas.InventoryU
     update_data = inventory.dict(exclude_unset=True)
     for key, value in update_data.items():
         setattr(db_inventory, key, value)
+    stock_alerts.publish(db, [(
+        product_id, db_inventory.id, previous_quantity, previous_threshold,
+        db_inventory.quantity, db_inventory.low_stock_threshold
+    )])
     
     db.commit()
     db.refresh(db_inventory)
     return db_inventory
 
+def update_inventory_bulk(db: Session, items: List[schemas.InventoryBulkItem], change_reason: Optional[str] = None,
+                          batch_size: int = 5000):
+    """
+    Apply a stock snapshot in one transaction. Each batch is a single
+    UPDATE ... FROM (VALUES ...) that only touches rows whose quantity or
+    threshold differ, followed by one multi-row insert of history rows for the
+    changed quantities. Items for unknown products or repeated products are
+    reported individually and do not affect the rest.
+    """
+    results = {}
+    snapshot = {}
+    for item in items:
+        if item.product_id in results or item.product_id in snapshot:
+            results[item.product_id] = {"error": "Duplicate product ID in request"}
+            snapshot.pop(item.product_id, None)
+        else:
+            snapshot[item.product_id] = item
+
+    now = datetime.now()
+    product_ids = sorted(snapshot)
+    for offset in range(0, len(product_ids), batch_size):
+        batch = [snapshot[product_id] for product_id in product_ids[offset:offset + batch_size]]
+        changes = _apply_snapshot(db, batch, now)
+        history = []
+        for item in batch:
+            change = changes.get(item.product_id)
+            if change is None:
+                results[item.product_id] = {"error": "Inventory not found for this product"}
+                continue
+            inventory_id, previous_quantity, previous_threshold, new_quantity, new_threshold = change
+            results[item.product_id] = {"changed": new_quantity is not None}
+            if new_quantity is not None and new_quantity != previous_quantity:
+                history.append({
+                    "inventory_id": inventory_id,
+                    "previous_quantity": previous_quantity,
+                    "new_quantity": new_quantity,
+                    "change_date": now,
+                    "change_reason": change_reason,
+                    "created_at": now,
+                    "updated_at": now
+                })
+        if history:
+            db.execute(insert(models.InventoryHistory.__table__).values(history))
+        stock_alerts.publish(db, [
+            (product_id, inventory_id, previous_quantity, previous_threshold, new_quantity, new_threshold)
+            for product_id, (inventory_id, previous_quantity, previous_threshold, new_quantity, new_threshold)
+            in changes.items() if new_quantity is not None
+        ])
+    db.commit()
+
+    outcomes = [
+        {
+            "product_id": item.product_id,
+            "success": "error" not in results[item.product_id],
+            "changed": results[item.product_id].get("changed", False),
+            "error": results[item.product_id].get("error")
+        } for item in items
+    ]
+    updated = sum(1 for outcome in outcomes if outcome["changed"])
+    failed = sum(1 for outcome in outcomes if not outcome["success"])
+    return {
+        "updated": updated,
+        "unchanged": len(outcomes) - updated - failed,
+        "failed": failed,
+        "results": outcomes
+    }
+
+def _apply_snapshot(db: Session, items: List[schemas.InventoryBulkItem], now: datetime):
+    """
+    Update the inventory rows of one batch, locked in product_id order.
+    Returns product_id -> (inventory id, previous quantity, previous threshold,
+    new quantity, new threshold), the new values None when the row did not
+    change, for the products that have inventory.
+    """
+    inventory = models.Inventory.__table__
+    snapshot = values(
+        column("product_id", Integer), column("quantity", Integer), column("low_stock_threshold", Integer),
+        name="snapshot"
+    ).data([(item.product_id, item.quantity, item.low_stock_threshold) for item in items])
+    locked = select(
+        inventory.c.id, inventory.c.product_id, inventory.c.quantity, inventory.c.low_stock_threshold
+    ).where(
+        inventory.c.product_id.in_([item.product_id for item in items])
+    ).order_by(inventory.c.product_id).with_for_update().cte("locked")
+
+    # Omitted fields keep their value; a column of only NULLs has no type, hence the casts
+    quantity = func.coalesce(cast(snapshot.c.quantity, Integer), inventory.c.quantity)
+    threshold = func.coalesce(cast(snapshot.c.low_stock_threshold, Integer), inventory.c.low_stock_threshold)
+    updated = update(inventory).where(
+        inventory.c.id == locked.c.id,
+        snapshot.c.product_id == locked.c.product_id,
+        or_(quantity.is_distinct_from(inventory.c.quantity), threshold.is_distinct_from(inventory.c.low_stock_threshold))
+    ).values(
+        quantity=quantity,
+        low_stock_threshold=threshold,
+        last_restock_date=case((quantity > inventory.c.quantity, now), else_=inventory.c.last_restock_date),
+        updated_at=now
+    ).returning(inventory.c.id, inventory.c.quantity, inventory.c.low_stock_threshold).cte("updated")
+
+    rows = db.execute(
+        select(
+            locked.c.product_id, locked.c.id, locked.c.quantity, locked.c.low_stock_threshold,
+            updated.c.quantity, updated.c.low_stock_threshold
+        ).select_from(
+            locked.outerjoin(updated, updated.c.id == locked.c.id)
+        )
+    ).all()
+    return {product_id: tuple(change) for product_id, *change in rows}
+
+def decrement_stock(db: Session, quantities: Dict[int, int], strict: Optional[bool] = None):
+    """
+    Take sold quantities (product_id -> units) out of inventory in one statement,
+    without committing. The inventory rows are locked in product_id order, so
+    concurrent sales of overlapping products can't deadlock, and each new
+    quantity is computed from the locked row, so no decrement is lost.
+    Stock is clamped at 0, or with strict (default INVENTORY_STRICT_STOCK) the
+    whole sale is rejected with 409 when a product has fewer units than sold;
+    the caller rolls back, or back to its savepoint.
+    Products without an inventory row are skipped. Products taken to or
+    below their threshold are published as low-stock alerts.
+    Returns product_id -> new quantity.
+    """
+    if not quantities:
+        return {}
+    if strict is None:
+        strict = INVENTORY_STRICT_STOCK
+
+    inventory = models.Inventory.__table__
+    sold = values(
+        column("product_id", Integer), column("quantity", Integer), name="sold"
+    ).data(sorted(quantities.items()))
+    locked = select(
+        inventory.c.id, inventory.c.product_id, inventory.c.quantity, inventory.c.low_stock_threshold
+    ).where(
+        inventory.c.product_id.in_(list(quantities))
+    ).order_by(inventory.c.product_id).with_for_update().cte("locked")
+    conditions = [inventory.c.id == locked.c.id, sold.c.product_id == locked.c.product_id]
+    if strict:
+        conditions.append(inventory.c.quantity >= sold.c.quantity)
+    updated = update(inventory).where(*conditions).values(
+        quantity=func.greatest(0, inventory.c.quantity - sold.c.quantity),
+        updated_at=datetime.now()
+    ).returning(inventory.c.product_id, inventory.c.quantity).cte("updated")
+    rows = db.execute(
+        select(
+            locked.c.product_id, locked.c.id, locked.c.low_stock_threshold, locked.c.quantity, updated.c.quantity
+        ).select_from(
+            locked.outerjoin(updated, updated.c.product_id == locked.c.product_id)
+        ).order_by(locked.c.product_id)
+    ).all()
+
+    short = [(product_id, available) for product_id, _, _, available, new_quantity in rows if new_quantity is None]
+    if short:
+        raise HTTPException(status_code=409, detail=insufficient_stock_detail(short, quantities))
+    stock_alerts.publish(db, [
+        (product_id, inventory_id, available, threshold, new_quantity, threshold)
+        for product_id, inventory_id, threshold, available, new_quantity in rows
+    ])
+    return {product_id: new_quantity for product_id, _, _, _, new_quantity in rows}
+
+def lock_stock(db: Session, product_ids) -> Dict[int, int]:
+    """
+    Lock the inventory rows of the products in product_id order, as
+    decrement_stock does, without committing. Returns product_id -> quantity;
+    products without an inventory row are left out.
+    """
+    product_ids = sorted(set(product_ids))
+    if not product_ids:
+        return {}
+    inventory = models.Inventory.__table__
+    return dict(db.execute(
+        select(inventory.c.product_id, inventory.c.quantity).where(
+            inventory.c.product_id.in_(product_ids)
+        ).order_by(inventory.c.product_id).with_for_update()
+    ).all())
+
+def insufficient_stock_detail(short, quantities: Dict[int, int]) -> str:
+    """
+    Error message for (product_id, available) pairs short of the quantities requested
+    """
+    return "Insufficient stock: " + ", ".join(
+        f"product {product_id} has {available}, {quantities[product_id]} requested"
+        for product_id, available in short
+    )
+
 def get_low_stock_alerts(db: Session):
+    # Ordered by id to walk the ix_inventory_low_stock partial index
     return db.query(models.Inventory).filter(
         models.Inventory.quantity <= models.Inventory.low_stock_threshold
-    ).all()
\ No newline at end of file
+    ).order_by(models.Inventory.id).all()
+
+def get_low_stock_snapshot(db: Session):
+    """
+    The products currently low on stock, shaped like the alerts of
+    stock_alerts. Ends db's transaction, so a stream opened with it doesn't
+    hold a pooled connection.
+    """
+    inventory = models.Inventory
+    rows = db.query(inventory.product_id, inventory.id, inventory.quantity, inventory.low_stock_threshold).filter(
+        inventory.quantity <= inventory.low_stock_threshold
+    ).order_by(inventory.id).all()
+    db.rollback()
+    return [stock_alerts.alert(*row) for row in rows]
\ No newline at end of file
@@ -0,0 +1,135 @@
+"""
+Refreshing of the materialized views read by the analytics queries.
+
+ViewRefresher runs REFRESH MATERIALIZED VIEW CONCURRENTLY from a background
+thread every TOP_PRODUCTS_REFRESH_INTERVAL seconds, and sooner once
+TOP_PRODUCTS_REFRESH_AFTER_WRITES sales have been written by this process.
+Readers are not blocked while a refresh runs. Every worker runs a refresher; a
+transaction-level advisory lock keeps them from refreshing at the same time and
+a refresh made by another worker within the interval counts as their own.
+"""
+import logging
+import os
+import threading
+from datetime import datetime
+from typing import Optional
+from sqlalchemy import text
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+from app import models
+from app.database import engine as default_engine
+
+MATVIEW_REFRESH_ENABLED = os.getenv("MATVIEW_REFRESH_ENABLED", "true").lower() in ("1", "true", "yes")
+TOP_PRODUCTS_REFRESH_INTERVAL = float(os.getenv("TOP_PRODUCTS_REFRESH_INTERVAL", "300"))
+# 0 disables write-triggered refreshes
+TOP_PRODUCTS_REFRESH_AFTER_WRITES = int(os.getenv("TOP_PRODUCTS_REFRESH_AFTER_WRITES", "1000"))
+
+PRODUCT_DAILY_SALES = "product_daily_sales"
+REFRESH_LOCK_KEY = 7_340_022
+
+logger = logging.getLogger(__name__)
+
+def refresh_view(view_name: str = PRODUCT_DAILY_SALES, bind=None) -> Optional[datetime]:
+    """
+    Refresh a materialized view concurrently and record the refresh time.
+    Returns the refresh time, or None if another session is refreshing.
+    """
+    with (bind or default_engine).begin() as connection:
+        locked = connection.execute(
+            text("SELECT pg_try_advisory_xact_lock(:key, hashtext(:view_name))"),
+            {"key": REFRESH_LOCK_KEY, "view_name": view_name}
+        ).scalar()
+        if not locked:
+            return None
+
+        # The view reflects the data as of the start of this transaction
+        refreshed_at = connection.execute(text("SELECT now()::timestamp")).scalar()
+        connection.execute(text(f"REFRESH MATERIALIZED VIEW CONCURRENTLY {view_name}"))
+        table = models.MaterializedViewRefresh.__table__
+        stmt = insert(table).values(view_name=view_name, refreshed_at=refreshed_at)
+        connection.execute(stmt.on_conflict_do_update(
+            index_elements=[table.c.view_name],
+            set_={"refreshed_at": stmt.excluded.refreshed_at}
+        ))
+    return refreshed_at
+
+def refreshed_at(db: Session, view_name: str = PRODUCT_DAILY_SALES) -> Optional[datetime]:
+    """
+    When the view was last refreshed, None if never
+    """
+    return db.query(models.MaterializedViewRefresh.refreshed_at).filter(
+        models.MaterializedViewRefresh.view_name == view_name
+    ).scalar()
+
+class ViewRefresher:
+    """
+    Background thread refreshing a materialized view on an interval and after a
+    number of writes
+    """
+
+    def __init__(self, view_name: str = PRODUCT_DAILY_SALES,
+                 interval: float = TOP_PRODUCTS_REFRESH_INTERVAL,
+                 after_writes: int = TOP_PRODUCTS_REFRESH_AFTER_WRITES,
+                 bind=None):
+        self.view_name = view_name
+        self.interval = interval
+        self.after_writes = after_writes
+        self.bind = bind
+        self.refreshes = 0
+        self.errors = 0
+        self._writes = 0
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def record_writes(self, count: int = 1):
+        """
+        Count written sales; wakes the refresher once after_writes is reached
+        """
+        with self._lock:
+            self._writes += count
+            if self.after_writes and self._writes >= self.after_writes:
+                self._wake.set()
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name=f"refresh-{self.view_name}", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._wake.set()
+        self._thread.join()
+        self._thread = None
+
+    def _due(self, triggered_by_writes: bool):
+        if triggered_by_writes:
+            return True
+        with (self.bind or default_engine).connect() as connection:
+            last = connection.execute(
+                text("SELECT now()::timestamp - refreshed_at FROM materialized_view_refreshes WHERE view_name = :view_name"),
+                {"view_name": self.view_name}
+            ).scalar()
+        return last is None or last.total_seconds() >= self.interval
+
+    def _run(self):
+        while not self._stop.is_set():
+            triggered_by_writes = self._wake.wait(self.interval)
+            self._wake.clear()
+            if self._stop.is_set():
+                return
+            with self._lock:
+                self._writes = 0
+            try:
+                if self._due(triggered_by_writes) and refresh_view(self.view_name, self.bind) is not None:
+                    self.refreshes += 1
+            except Exception:
+                self.errors += 1
+                logger.exception("Refreshing %s failed", self.view_name)
+
+view_refresher = ViewRefresher()
@@ -0,0 +1,182 @@
+"""
+Upkeep of the monthly partitioned tables.
+
+PartitionMaintainer runs maintain() from a background thread every
+PARTITION_MAINTENANCE_INTERVAL seconds: it creates the partitions of the coming
+months and compacts the inventory history. Every month of inventory_history
+that ended more than INVENTORY_HISTORY_RETENTION_DAYS ago is summarized into
+inventory_history_daily and its partition dropped, so old changes cost no
+vacuum and the hot table only holds recent months.
+
+Nothing here holds a lock on a parent table for long: every partition is
+created in its own short transaction bounded by PARTITION_LOCK_TIMEOUT, and an
+old partition is detached with DETACH PARTITION ... CONCURRENTLY (PostgreSQL
+14+) before it is summarized and dropped, which then only touches the detached
+table. Like materialized_views, every worker runs a maintainer and an advisory
+lock lets only one of them work at a time. It is a session-level lock held on
+an autocommit connection, as a concurrent detach waits for every open
+transaction, the maintainer's own included.
+
+    python -m app.services.partition_maintenance    # run once, e.g. from cron
+"""
+import logging
+import os
+import threading
+from datetime import date, timedelta
+from typing import List, Optional, Tuple
+from sqlalchemy import text
+from app import partitions
+from app.database import engine as default_engine
+
+PARTITION_MAINTENANCE_ENABLED = os.getenv("PARTITION_MAINTENANCE_ENABLED", "true").lower() in ("1", "true", "yes")
+PARTITION_MAINTENANCE_INTERVAL = float(os.getenv("PARTITION_MAINTENANCE_INTERVAL", "3600"))
+# 0 keeps every change
+INVENTORY_HISTORY_RETENTION_DAYS = int(os.getenv("INVENTORY_HISTORY_RETENTION_DAYS", "90"))
+
+# Tables partitioned by month, kept PARTITION_MONTHS_AHEAD months ahead
+PARTITIONED_TABLES = ["inventory_history", "sales", "sale_items"]
+MAINTENANCE_LOCK_KEY = 7_340_023
+
+logger = logging.getLogger(__name__)
+
+# One summary row per inventory row and day of the partition being compacted
+COMPACT_PARTITION = """
+    INSERT INTO inventory_history_daily (
+        inventory_id, day, changes, opening_quantity, closing_quantity,
+        min_quantity, max_quantity, units_added, units_removed
+    )
+    SELECT
+        inventory_id,
+        date(change_date),
+        count(*),
+        (array_agg(previous_quantity ORDER BY change_date, id))[1],
+        (array_agg(new_quantity ORDER BY change_date DESC, id DESC))[1],
+        least(min(previous_quantity), min(new_quantity)),
+        greatest(max(previous_quantity), max(new_quantity)),
+        coalesce(sum(greatest(new_quantity - previous_quantity, 0)), 0),
+        coalesce(sum(greatest(previous_quantity - new_quantity, 0)), 0)
+    FROM {partition}
+    WHERE inventory_id IS NOT NULL
+    GROUP BY inventory_id, date(change_date)
+"""
+
+def _inventory_history_partitions(connection) -> List[Tuple[str, date, bool, bool]]:
+    """
+    The (name, month, attached, detach_pending) of every monthly
+    inventory_history partition, oldest first, including those left detached
+    or pending detach by an interrupted compaction
+    """
+    rows = connection.execute(text(
+        "SELECT child.relname, pg_inherits.inhrelid IS NOT NULL, coalesce(pg_inherits.inhdetachpending, false) "
+        "FROM pg_class child LEFT JOIN pg_inherits ON pg_inherits.inhrelid = child.oid "
+        "WHERE child.relkind = 'r' AND child.relnamespace = current_schema()::regnamespace "
+        "AND child.relname LIKE 'inventory\\_history\\_p%'"
+    )).all()
+    prefix = "inventory_history_p"
+    found = []
+    for name, attached, pending in rows:
+        suffix = name[len(prefix):]
+        if len(suffix) == 6 and suffix.isdigit():
+            found.append((name, date(int(suffix[:4]), int(suffix[4:]), 1), attached, pending))
+    return sorted(found, key=lambda partition: partition[1])
+
+def compact_inventory_history(bind, retention_days: int = INVENTORY_HISTORY_RETENTION_DAYS,
+                              today: Optional[date] = None) -> List[str]:
+    """
+    Summarize and drop the inventory_history partitions of the months that
+    ended before the retention period. Returns the dropped partitions.
+
+    Each partition is detached concurrently, which doesn't block the reads and
+    writes of inventory_history, then summarized and dropped in one transaction.
+    A partition an interrupted run left detached, or pending detach, is picked
+    up by the next run.
+    """
+    if retention_days <= 0:
+        return []
+    cutoff = (today or date.today()) - timedelta(days=retention_days)
+    with bind.connect() as connection:
+        expired = [
+            (name, attached, pending)
+            for name, month, attached, pending in _inventory_history_partitions(connection)
+            if partitions.add_months(month, 1) <= cutoff
+        ]
+    dropped = []
+    for name, attached, pending in expired:
+        if attached:
+            # CONCURRENTLY can't run in a transaction block; FINALIZE completes an interrupted one
+            with bind.connect() as connection:
+                connection = connection.execution_options(isolation_level="AUTOCOMMIT")
+                mode = "FINALIZE" if pending else "CONCURRENTLY"
+                connection.execute(text(f"ALTER TABLE inventory_history DETACH PARTITION {name} {mode}"))
+        with bind.begin() as connection:
+            connection.execute(text(COMPACT_PARTITION.format(partition=name)))
+            connection.execute(text(f"DROP TABLE {name}"))
+        dropped.append(name)
+    return dropped
+
+def maintain(bind=None, today: Optional[date] = None) -> Optional[dict]:
+    """
+    Create upcoming partitions and compact old inventory history.
+    Returns what was done, or None if another session is maintaining.
+    """
+    bind = bind or default_engine
+    current = partitions.month_start(today or date.today())
+    months = [partitions.add_months(current, ahead) for ahead in range(partitions.PARTITION_MONTHS_AHEAD + 1)]
+    with bind.connect() as lock_connection:
+        lock_connection = lock_connection.execution_options(isolation_level="AUTOCOMMIT")
+        locked = lock_connection.execute(
+            text("SELECT pg_try_advisory_lock(:key)"), {"key": MAINTENANCE_LOCK_KEY}
+        ).scalar()
+        if not locked:
+            return None
+        try:
+            for table in PARTITIONED_TABLES:
+                partitions.ensure_partitions_for(bind, [table], months)
+            return {"compacted": compact_inventory_history(bind, today=today)}
+        finally:
+            lock_connection.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": MAINTENANCE_LOCK_KEY})
+
+class PartitionMaintainer:
+    """
+    Background thread running maintain() on an interval, starting right away
+    """
+
+    def __init__(self, interval: float = PARTITION_MAINTENANCE_INTERVAL, bind=None):
+        self.interval = interval
+        self.bind = bind
+        self.runs = 0
+        self.errors = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="partition-maintenance", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                result = maintain(self.bind)
+                if result is not None:
+                    self.runs += 1
+                    if result["compacted"]:
+                        logger.info("Compacted inventory history partitions %s", ", ".join(result["compacted"]))
+            except Exception:
+                self.errors += 1
+                logger.exception("Partition maintenance failed")
+            self._stop.wait(self.interval)
+
+partition_maintainer = PartitionMaintainer()
+
+if __name__ == "__main__":
+    print(maintain())
@@ -0,0 +1,240 @@
+"""
+Read-through cache of the product catalog, by id and by SKU.
+
+Entries hold the product's column values, not ORM instances, and are attached
+to the caller's session with Session.merge(load=False), so a hit costs no
+query and the returned product behaves like one loaded by that session.
+
+Writes in product_service call notify() inside their transaction; the NOTIFY is
+delivered when the transaction commits, to the ProductCacheListener of every
+worker (including this one), which evicts the product. A listener that loses
+its connection clears the whole cache, since notifications sent meanwhile are
+lost, and the cache is bypassed while no listener is connected. Loads that raced with an eviction are not stored, so a product read just
+before a write can't outlive that write in the cache.
+"""
+import logging
+import os
+import select
+import threading
+from collections import OrderedDict
+from typing import Optional
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.session import make_transient_to_detached
+from app import metrics, models
+from app.database import listen_engine
+
+# 0 disables the cache
+PRODUCT_CACHE_SIZE = int(os.getenv("PRODUCT_CACHE_SIZE", "10000"))
+# Without LISTEN/NOTIFY evictions stay local to the process, for single-worker setups
+PRODUCT_CACHE_NOTIFY = os.getenv("PRODUCT_CACHE_NOTIFY", "true").lower() in ("1", "true", "yes")
+
+PRODUCT_CACHE_CHANNEL = "product_cache"
+# Notification payload that evicts every product
+ALL_PRODUCTS = "*"
+
+PRODUCT_COLUMNS = [column.key for column in models.Product.__mapper__.column_attrs]
+
+logger = logging.getLogger(__name__)
+
+class ProductCache:
+    """
+    Bounded LRU of product column values by id, with a SKU index
+    """
+
+    def __init__(self, maxsize: int = PRODUCT_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._ids_by_sku = {}
+        # Bumped on every eviction; a load started before it is not stored
+        self._generation = 0
+        self._lock = threading.Lock()
+        # Set by the listener while it receives evictions from the other workers
+        self.listening = False
+
+    @property
+    def enabled(self):
+        return self.maxsize > 0
+
+    @property
+    def active(self):
+        """
+        Whether lookups may be served from the cache
+        """
+        return self.enabled and (self.listening or not PRODUCT_CACHE_NOTIFY)
+
+    def get(self, db: Session, product_id: int = None, sku: str = None) -> Optional[models.Product]:
+        """
+        The product with the given id or SKU, from the cache or loaded through db
+        """
+        with self._lock:
+            if product_id is None:
+                product_id = self._ids_by_sku.get(sku)
+            values = self._entries.get(product_id)
+            if values is not None:
+                self._entries.move_to_end(product_id)
+                self.hits += 1
+            else:
+                self.misses += 1
+            generation = self._generation
+
+        if values is not None:
+            product = models.Product(**values)
+            make_transient_to_detached(product)
+            return db.merge(product, load=False)
+
+        query = db.query(models.Product)
+        if product_id is not None:
+            product = query.filter(models.Product.id == product_id).first()
+        else:
+            product = query.filter(models.Product.sku == sku).first()
+        if product is not None:
+            self._store({name: getattr(product, name) for name in PRODUCT_COLUMNS}, generation)
+        return product
+
+    def _store(self, values: dict, generation: int):
+        with self._lock:
+            if generation != self._generation:
+                return
+            self._remove(values["id"])
+            self._entries[values["id"]] = values
+            self._ids_by_sku[values["sku"]] = values["id"]
+            while len(self._entries) > self.maxsize:
+                self._remove(next(iter(self._entries)))
+
+    def _remove(self, product_id: int):
+        values = self._entries.pop(product_id, None)
+        if values is not None and self._ids_by_sku.get(values["sku"]) == product_id:
+            del self._ids_by_sku[values["sku"]]
+
+    def evict(self, product_id: int = None):
+        """
+        Drop one product, or every product when product_id is None
+        """
+        with self._lock:
+            self._generation += 1
+            self.evictions += 1
+            if product_id is None:
+                self._entries.clear()
+                self._ids_by_sku.clear()
+            else:
+                self._remove(product_id)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions
+            }
+
+product_cache = ProductCache()
+
+def notify(db: Session, product_id: int = None):
+    """
+    Evict a product (every product when product_id is None) from the caches of
+    all workers once db's transaction commits. Call before the commit.
+    """
+    if not product_cache.enabled:
+        return
+    if not PRODUCT_CACHE_NOTIFY:
+        product_cache.evict(product_id)
+        return
+    payload = ALL_PRODUCTS if product_id is None else str(product_id)
+    db.execute(text("SELECT pg_notify(:channel, :payload)"), {"channel": PRODUCT_CACHE_CHANNEL, "payload": payload})
+
+def evict_local(product_id: int = None):
+    """
+    Evict a product from this process's cache right away, so the writer doesn't
+    wait for its own notification to read its write
+    """
+    if product_cache.enabled:
+        product_cache.evict(product_id)
+
+class ProductCacheListener:
+    """
+    Background thread LISTENing on the product cache channel on its own
+    connection and evicting the notified products
+    """
+
+    def __init__(self, cache: ProductCache = product_cache, bind=None, retry_interval: float = 5.0):
+        self.cache = cache
+        self.bind = bind
+        self.retry_interval = retry_interval
+        self.notifications = 0
+        self.reconnects = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is not None or not self.cache.enabled or not PRODUCT_CACHE_NOTIFY:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="product-cache-listener", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self._listen()
+            except Exception:
+                self.reconnects += 1
+                logger.exception("Product cache listener lost its connection")
+            # Notifications sent while not listening are lost
+            self.cache.evict()
+            self._stop.wait(self.retry_interval)
+
+    def _listen(self):
+        connection = (self.bind or listen_engine).raw_connection()
+        try:
+            dbapi_connection = connection.connection
+            # LISTEN only takes effect outside a transaction
+            dbapi_connection.autocommit = True
+            with dbapi_connection.cursor() as cursor:
+                cursor.execute(f"LISTEN {PRODUCT_CACHE_CHANNEL}")
+            # Anything cached before LISTEN may have missed its notification
+            self.cache.evict()
+            self.cache.listening = True
+            while not self._stop.is_set():
+                if select.select([dbapi_connection], [], [], 1.0) == ([], [], []):
+                    continue
+                dbapi_connection.poll()
+                while dbapi_connection.notifies:
+                    payload = dbapi_connection.notifies.pop(0).payload
+                    self.notifications += 1
+                    self.cache.evict(None if payload == ALL_PRODUCTS else int(payload))
+        finally:
+            self.cache.listening = False
+            # Switched to autocommit, so it must not be reused: closed rather than returned to a pool
+            connection.invalidate()
+
+product_cache_listener = ProductCacheListener()
+
+metrics.registry.gauge(
+    "product_cache_lookups",
+    "Product cache lookups by result since the worker started",
+    lambda: [({"result": "hit"}, product_cache.hits), ({"result": "miss"}, product_cache.misses)]
+)
+metrics.registry.gauge(
+    "product_cache_hit_ratio",
+    "Share of product lookups served from the cache",
+    lambda: [({}, product_cache.stats()["hit_ratio"])]
+)
+metrics.registry.gauge(
+    "product_cache_entries",
+    "Products currently cached",
+    lambda: [({}, product_cache.stats()["size"])]
+)
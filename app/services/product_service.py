@@ -1,18 +1,50 @@
 from sqlalchemy.orm import Session
 from app import models, schemas
+from app.services import columnar_service, pagination, product_cache, rollup_service
+from app.services.analytics_cache import analytics_cache
 from fastapi import HTTPException
 
 def get_product(db: Session, product_id: int):
+    if product_cache.product_cache.active:
+        return product_cache.product_cache.get(db, product_id=product_id)
     return db.query(models.Product).filter(models.Product.id == product_id).first()
 
 def get_product_by_sku(db: Session, sku: str):
+    if product_cache.product_cache.active:
+        return product_cache.product_cache.get(db, sku=sku)
     return db.query(models.Product).filter(models.Product.sku == sku).first()
 
-def get_products(db: Session, skip: int = 0, limit: int = 100, category_id: int = None):
-    query = db.query(models.Product)
+def _get_product_for_write(db: Session, product_id: int):
+    # Writes start from the stored row, not from a cached copy the session may already hold
+    return db.query(models.Product).populate_existing().filter(models.Product.id == product_id).first()
+
+def get_products(db: Session, skip: int = 0, limit: int = 100, category_id: int = None, cursor: str = None):
+    return _page_products(db.query(models.Product), skip, limit, category_id, cursor).all()
+
+def _page_products(query, skip: int, limit: int, category_id: int = None, cursor: str = None):
     if category_id:
         query = query.filter(models.Product.category_id == category_id)
-    return query.offset(skip).limit(limit).all()
+    if cursor:
+        # Keyset page: continue after the product id in the cursor instead of skipping
+        (last_id,) = pagination.decode_cursor(cursor, int)
+        query = query.filter(models.Product.id > last_id)
+        skip = 0
+    return query.order_by(models.Product.id).offset(skip).limit(limit)
+
+def get_products_cursor(product: models.Product):
+    return pagination.encode_cursor(product.id)
+
+PRODUCT_FIELDS = list(schemas.Product.__fields__)
+
+def get_product_rows(db: Session, skip: int = 0, limit: int = 100, category_id: int = None, cursor: str = None):
+    """
+    The get_products page as plain dicts with the schemas.Product fields.
+    Returns (rows, next page cursor).
+    """
+    query = db.query(*[getattr(models.Product, name) for name in PRODUCT_FIELDS])
+    rows = [dict(zip(PRODUCT_FIELDS, row)) for row in _page_products(query, skip, limit, category_id, cursor)]
+    next_cursor = pagination.encode_cursor(rows[-1]["id"]) if rows and len(rows) == limit else None
+    return rows, next_cursor
 
 def create_product(db: Session, product: schemas.ProductCreate):
     db_product = get_product_by_sku(db, sku=product.sku)
@@ -26,21 +58,36 @@ def create_product(db: Session, product: schemas.ProductCreate):
     return db_product
 
 def update_product(db: Session, product_id: int, product: schemas.ProductUpdate):
-    db_product = get_product(db, product_id=product_id)
+    db_product = _get_product_for_write(db, product_id=product_id)
     
     # Update only provided fields
     update_data = product.dict(exclude_unset=True)
+    category_changed = "category_id" in update_data and update_data["category_id"] != db_product.category_id
     for key, value in update_data.items():
         setattr(db_product, key, value)
     
+    if category_changed:
+        # Sale items carry a copy of the category for the category analytics;
+        # they and the rollup move in the same transaction as the product
+        db.flush()
+        rollup_service.set_product_category(db, product_id, db_product.category_id)
+        columnar_service.notify_reset(db)
+    product_cache.notify(db, product_id)
     db.commit()
+    product_cache.evict_local(product_id)
+    if category_changed:
+        analytics_cache.clear()
+        # Right away here; the other workers reset on the notification
+        columnar_service.columnar_store.reset()
     db.refresh(db_product)
     return db_product
 
 def delete_product(db: Session, product_id: int):
-    db_product = get_product(db, product_id=product_id)
+    db_product = _get_product_for_write(db, product_id=product_id)
     db.delete(db_product)
+    product_cache.notify(db, product_id)
     db.commit()
+    product_cache.evict_local(product_id)
     return db_product
 
 def get_category(db: Session, category_id: int):
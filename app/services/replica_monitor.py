@@ -0,0 +1,107 @@
+"""
+Health of the read replica behind database.get_read_db.
+
+ReplicaMonitor checks the replica from a background thread every
+READ_REPLICA_CHECK_INTERVAL seconds. It sets database.replica_available while
+the replica answers and its replay lag is at most READ_REPLICA_MAX_LAG seconds,
+and clears it otherwise, so reads fall back to the primary while the replica is
+down or behind. A replica connection that fails during a request clears it right
+away. A database that is not in recovery, like a second local instance used for
+testing, counts as having no lag.
+"""
+import logging
+import os
+import threading
+from typing import Optional
+from sqlalchemy import text
+from app import database, metrics
+
+READ_REPLICA_CHECK_INTERVAL = float(os.getenv("READ_REPLICA_CHECK_INTERVAL", "5"))
+READ_REPLICA_MAX_LAG = float(os.getenv("READ_REPLICA_MAX_LAG", "10"))
+
+logger = logging.getLogger(__name__)
+
+# Seconds since the last replayed transaction, 0 when caught up with everything received
+REPLICATION_LAG = """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE coalesce(extract(epoch FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+"""
+
+def replication_lag(bind=None) -> float:
+    with (bind or database.read_engine).connect() as connection:
+        return float(connection.execute(text(REPLICATION_LAG)).scalar())
+
+class ReplicaMonitor:
+    """
+    Background thread checking the replica on an interval, starting right away
+    """
+
+    def __init__(self, interval: float = READ_REPLICA_CHECK_INTERVAL, max_lag: float = READ_REPLICA_MAX_LAG, bind=None):
+        self.interval = interval
+        self.max_lag = max_lag
+        self.bind = bind
+        self.lag: Optional[float] = None
+        self.checks = 0
+        self.errors = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def check(self) -> bool:
+        """
+        Check the replica once and route reads accordingly. Returns whether it is available.
+        """
+        self.checks += 1
+        try:
+            self.lag = replication_lag(self.bind)
+        except Exception:
+            self.errors += 1
+            self.lag = None
+            if database.replica_available.is_set():
+                logger.exception("Read replica unreachable, reading from the primary")
+            database.replica_available.clear()
+            return False
+        if self.lag > self.max_lag:
+            if database.replica_available.is_set():
+                logger.warning("Read replica %.1fs behind, reading from the primary", self.lag)
+            database.replica_available.clear()
+            return False
+        if not database.replica_available.is_set():
+            logger.info("Reading from the replica (%.1fs behind)", self.lag)
+        database.replica_available.set()
+        return True
+
+    def start(self):
+        if self._thread is not None or database.read_engine is None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="replica-monitor", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+        database.replica_available.clear()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.check()
+            self._stop.wait(self.interval)
+
+replica_monitor = ReplicaMonitor()
+
+metrics.registry.gauge(
+    "read_replica_available",
+    "1 while reads are routed to the replica, 0 while they fall back to the primary",
+    lambda: [({}, 1.0 if database.replica_available.is_set() else 0.0)]
+)
+metrics.registry.gauge(
+    "read_replica_lag_seconds",
+    "Replay lag of the read replica at the last check",
+    lambda: [({}, replica_monitor.lag)] if replica_monitor.lag is not None else []
+)
@@ -0,0 +1,279 @@
+from sqlalchemy.orm import Session, aliased
+from sqlalchemy import func, select, literal, literal_column, distinct, update, and_, case, exists, tuple_, union_all
+from sqlalchemy.dialects.postgresql import insert
+from datetime import datetime, date, time, timedelta
+from app import models
+from typing import Any, Iterable, List, Optional, Tuple
+
+# category_id used for the order-level (all categories) rollup rows
+ALL_CATEGORIES = 0
+
+def as_datetime(value):
+    """
+    Normalize a date or datetime bound to a datetime
+    """
+    if value is None or isinstance(value, datetime):
+        return value
+    return datetime.combine(value, time.min)
+
+def split_window(start: datetime, end: datetime):
+    """
+    Split the inclusive window [start, end] into the whole days that can be
+    answered from the rollup and the partial-day edges that still have to be
+    read from the sales table.
+
+    Returns ((first_day, last_day) or None, [(lower, upper, upper_inclusive), ...])
+    """
+    first_day = start.date() if start.time() == time.min else start.date() + timedelta(days=1)
+    last_day = end.date() - timedelta(days=1)
+
+    if first_day > last_day:
+        return None, [(start, end, True)]
+
+    edges = []
+    first_midnight = datetime.combine(first_day, time.min)
+    if start < first_midnight:
+        edges.append((start, first_midnight, False))
+    edges.append((datetime.combine(last_day + timedelta(days=1), time.min), end, True))
+    return (first_day, last_day), edges
+
+def product_categories(db: Session, product_ids: Iterable[int]):
+    """
+    Map product ids to their category ids. The product rows stay share-locked
+    until the caller's transaction ends, so a category change waits for the
+    sales that read the old category and set_product_category sees their items.
+    """
+    product_ids = set(product_ids)
+    if not product_ids:
+        return {}
+    return dict(
+        db.query(models.Product.id, models.Product.category_id).filter(
+            models.Product.id.in_(product_ids)
+        ).order_by(models.Product.id).with_for_update(read=True).all()
+    )
+
+def apply_sale(db: Session, sale: models.Sale, items: Iterable[models.SaleItem], categories: Optional[dict] = None):
+    """
+    Add a new sale to the daily rollup. Runs inside the caller's transaction.
+    """
+    apply_sales(db, [(sale, items)], categories)
+
+def apply_sales(db: Session, sales: Iterable[Tuple[Any, Iterable[Any]]], categories: Optional[dict] = None):
+    """
+    Add a batch of (sale, items) pairs to the daily rollup with a single upsert.
+    Sales and items only need the sale/sale item attributes, so ORM objects and
+    SaleCreate payloads both work. categories maps product ids to category ids
+    and is looked up when not given. Runs inside the caller's transaction.
+    """
+    sales = [(sale, list(items)) for sale, items in sales]
+    if categories is None:
+        categories = product_categories(db, (item.product_id for _, items in sales for item in items))
+
+    rows = {}
+    def add(key, revenue, order_count, units):
+        row = rows.setdefault(key, {"revenue": 0.0, "order_count": 0, "units": 0})
+        row["revenue"] += revenue
+        row["order_count"] += order_count
+        row["units"] += units
+
+    for sale, items in sales:
+        day = sale.order_date.date()
+        platform = sale.platform or ""
+        add((day, platform, ALL_CATEGORIES), sale.total_amount, 1, sum(item.quantity for item in items))
+
+        # Category rows sum the line items of the category and count each order once
+        per_category = {}
+        for item in items:
+            category_id = categories.get(item.product_id)
+            if category_id is not None:
+                subtotal, units = per_category.get(category_id, (0.0, 0))
+                per_category[category_id] = (subtotal + item.subtotal, units + item.quantity)
+        for category_id, (subtotal, units) in per_category.items():
+            add((day, platform, category_id), subtotal, 1, units)
+
+    upsert_rows(db, [
+        dict(day=day, platform=platform, category_id=category_id, **values)
+        for (day, platform, category_id), values in rows.items()
+    ])
+
+def upsert_rows(db: Session, rows: List[dict]):
+    """
+    Add the given revenue/order/unit deltas to the rollup, creating rows as needed
+    """
+    if not rows:
+        return
+
+    # Rows are locked in key order, so concurrent sales can't deadlock on them
+    rows = sorted(rows, key=lambda row: (row["day"], row["platform"], row["category_id"]))
+    now = datetime.now()
+    table = models.SalesDailyRollup.__table__
+    stmt = insert(table).values([dict(row, updated_at=now) for row in rows])
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.day, table.c.platform, table.c.category_id],
+        set_={
+            "revenue": table.c.revenue + stmt.excluded.revenue,
+            "order_count": table.c.order_count + stmt.excluded.order_count,
+            "units": table.c.units + stmt.excluded.units,
+            "updated_at": stmt.excluded.updated_at
+        }
+    )
+    db.execute(stmt)
+
+def rebuild_sales_daily_rollup(db: Session,
+                               start_day: Optional[date] = None,
+                               end_day: Optional[date] = None):
+    """
+    Recompute the rollup from the sales tables for the given day range (all
+    history when no range is given). Commits when done.
+    """
+    rollup = models.SalesDailyRollup
+    day = func.date(models.Sale.order_date)
+    # Literal SQL so the same expression can be repeated in GROUP BY
+    platform = func.coalesce(models.Sale.platform, literal_column("''"))
+
+    delete_query = db.query(rollup)
+    window = []
+    item_window = []
+    if start_day:
+        delete_query = delete_query.filter(rollup.day >= start_day)
+        window.append(models.Sale.order_date >= datetime.combine(start_day, time.min))
+        item_window.append(models.SaleItem.order_date >= datetime.combine(start_day, time.min))
+    if end_day:
+        delete_query = delete_query.filter(rollup.day <= end_day)
+        window.append(models.Sale.order_date < datetime.combine(end_day + timedelta(days=1), time.min))
+        item_window.append(models.SaleItem.order_date < datetime.combine(end_day + timedelta(days=1), time.min))
+    delete_query.delete(synchronize_session=False)
+
+    # Bounded like the sales, and joined on the partition key too, so only the
+    # partitions of the range are scanned
+    item_units = select(
+        models.SaleItem.sale_id,
+        models.SaleItem.order_date,
+        func.sum(models.SaleItem.quantity).label("units")
+    ).where(*item_window).group_by(models.SaleItem.sale_id, models.SaleItem.order_date).subquery()
+
+    totals = select(
+        day,
+        platform,
+        literal(ALL_CATEGORIES),
+        func.sum(models.Sale.total_amount),
+        func.count(models.Sale.id),
+        func.coalesce(func.sum(item_units.c.units), 0),
+        func.now()
+    ).select_from(models.Sale).outerjoin(
+        item_units, and_(
+            item_units.c.sale_id == models.Sale.id, item_units.c.order_date == models.Sale.order_date
+        )
+    ).where(*window).group_by(day, platform)
+
+    # Category rows come from the denormalized line items alone; sales is only
+    # joined for the platform
+    item_day = func.date(models.SaleItem.order_date)
+    per_category = select(
+        item_day,
+        platform,
+        models.SaleItem.category_id,
+        func.sum(models.SaleItem.subtotal),
+        func.count(distinct(models.SaleItem.sale_id)),
+        func.sum(models.SaleItem.quantity),
+        func.now()
+    ).select_from(models.SaleItem).join(
+        models.Sale, and_(
+            models.Sale.id == models.SaleItem.sale_id, models.Sale.order_date == models.SaleItem.order_date
+        )
+    ).where(
+        models.SaleItem.category_id.isnot(None), *item_window, *window
+    ).group_by(item_day, platform, models.SaleItem.category_id)
+
+    columns = ["day", "platform", "category_id", "revenue", "order_count", "units", "updated_at"]
+    table = rollup.__table__
+    db.execute(table.insert().from_select(columns, totals))
+    db.execute(table.insert().from_select(columns, per_category))
+    db.commit()
+
+def set_product_category(db: Session, product_id: int, category_id: Optional[int]):
+    """
+    Move the sale items of a product to its new category, and their figures in
+    the rollup from their old category to the new one, without committing.
+    Call it after the product's new category is flushed: that locks the
+    product, so no sale can add items with the old category meanwhile.
+
+    Only the product's own items are read. Per sale, its revenue and units
+    move, and the order counts once less in the old category and once more
+    in the new one, unless other items of the sale keep it there or already
+    put it there. The deltas are added like those of new sales, so they
+    commute with concurrent apply_sales.
+    """
+    items = models.SaleItem
+    other = aliased(models.SaleItem)
+    platform = func.coalesce(models.Sale.platform, literal_column("''"))
+    day = func.date(items.order_date)
+
+    def other_items_in(category):
+        # Items of other products in the same sale and category
+        return exists().where(
+            other.sale_id == items.sale_id,
+            other.order_date == items.order_date,
+            other.product_id != product_id,
+            other.category_id == category
+        )
+
+    def moved(*columns):
+        return select(*columns).select_from(items).join(
+            models.Sale, and_(models.Sale.id == items.sale_id, models.Sale.order_date == items.order_date)
+        ).where(
+            items.product_id == product_id, items.category_id.is_distinct_from(category_id)
+        )
+
+    # One row per sale and old or new category
+    deltas = [
+        moved(
+            day.label("day"),
+            platform.label("platform"),
+            items.category_id.label("category_id"),
+            (-func.sum(items.subtotal)).label("revenue"),
+            case((other_items_in(items.category_id), 0), else_=-1).label("order_count"),
+            (-func.sum(items.quantity)).label("units")
+        ).where(
+            items.category_id.isnot(None)
+        ).group_by(items.sale_id, items.order_date, platform, items.category_id)
+    ]
+    if category_id is not None:
+        deltas.append(moved(
+            day.label("day"),
+            platform.label("platform"),
+            literal(category_id).label("category_id"),
+            func.sum(items.subtotal).label("revenue"),
+            case((other_items_in(category_id), 0), else_=1).label("order_count"),
+            func.sum(items.quantity).label("units")
+        ).group_by(items.sale_id, items.order_date, platform))
+    per_sale = union_all(*deltas).subquery()
+    rows = [
+        dict(row._mapping) for row in db.execute(
+            select(
+                per_sale.c.day,
+                per_sale.c.platform,
+                per_sale.c.category_id,
+                func.sum(per_sale.c.revenue).label("revenue"),
+                func.sum(per_sale.c.order_count).label("order_count"),
+                func.sum(per_sale.c.units).label("units")
+            ).group_by(per_sale.c.day, per_sale.c.platform, per_sale.c.category_id)
+        )
+    ]
+
+    db.execute(
+        update(items.__table__).where(
+            items.product_id == product_id, items.category_id.is_distinct_from(category_id)
+        ).values(category_id=category_id)
+    )
+    upsert_rows(db, rows)
+
+    # Categories the product's sales have left entirely on a day
+    rollup = models.SalesDailyRollup
+    emptied = [(row["day"], row["platform"], row["category_id"]) for row in rows if row["order_count"] < 0]
+    if emptied:
+        db.query(rollup).filter(
+            tuple_(rollup.day, rollup.platform, rollup.category_id).in_(emptied),
+            rollup.order_count <= 0
+        ).delete(synchronize_session=False)
+    return len(rows)
@@ -1,20 +1,107 @@
-from sqlalchemy.orm import Session
-from sqlalchemy import func, extract
+import csv
+import io
+import orjson
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.orm import Session, selectinload
+from sqlalchemy import (
+    func, extract, cast, tuple_, and_, or_, null, distinct, select, union_all, literal_column,
+    insert, DateTime, Float, Integer, String
+)
 from datetime import datetime, timedelta
-from app import models, schemas
+from app import models, partitions, schemas
+from app.services import columnar_service, inventory_service, materialized_views, pagination, rollup_service
+from app.services.analytics_cache import analytics_cache
 from fastapi import HTTPException
 from typing import List, Optional, Dict, Any
 
+# Relationships serialized by schemas.Sale, loaded with one extra query per page
+# instead of one lazy load per sale
+SALE_LOAD_OPTIONS = (selectinload(models.Sale.items),)
+
 def get_sales(db: Session, skip: int = 0, limit: int = 100, 
               start_date: Optional[datetime] = None, 
               end_date: Optional[datetime] = None,
               platform: Optional[str] = None,
-              status: Optional[str] = None):
+              status: Optional[str] = None,
+              cursor: Optional[str] = None,
+              load_options=SALE_LOAD_OPTIONS):
+    """
+    Get sales with optional filtering by date range, platform, and status.
+    Sales are ordered newest first; when a cursor is given it replaces skip and
+    the page starts right after the (order_date, id) it encodes.
+    load_options are applied to the query; the default loads items up front.
+    """
+    query = _filter_sales(db.query(models.Sale).options(*load_options), start_date, end_date, platform, status)
+    return _page_sales(query, skip, limit, cursor).all()
+
+def _page_sales(query, skip: int, limit: int, cursor: Optional[str]):
     """
-    Get sales with optional filtering by date range, platform, and status
+    Order a sales query newest first and select one page of it
     """
-    query = db.query(models.Sale)
+    if cursor:
+        order_date, sale_id = pagination.decode_cursor(cursor, datetime, int)
+        query = query.filter(
+            tuple_(models.Sale.order_date, models.Sale.id) < tuple_(order_date, sale_id)
+        )
+        skip = 0
     
+    return query.order_by(
+        models.Sale.order_date.desc(), models.Sale.id.desc()
+    ).offset(skip).limit(limit)
+
+def get_sales_cursor(sale: models.Sale):
+    """
+    Cursor pointing just past the given sale in get_sales order
+    """
+    return pagination.encode_cursor(sale.order_date, sale.id)
+
+SALE_FIELDS = [name for name in schemas.Sale.__fields__ if name != "items"]
+SALE_ITEM_FIELDS = list(schemas.SaleItemInDB.__fields__)
+
+def get_sales_rows(db: Session, skip: int = 0, limit: int = 100,
+                   start_date: Optional[datetime] = None,
+                   end_date: Optional[datetime] = None,
+                   platform: Optional[str] = None,
+                   status: Optional[str] = None,
+                   cursor: Optional[str] = None):
+    """
+    The get_sales page as plain dicts with the schemas.Sale fields, read as
+    column tuples without building ORM objects. Returns (rows, next page cursor).
+    """
+    query = _filter_sales(
+        db.query(*[getattr(models.Sale, name) for name in SALE_FIELDS]),
+        start_date, end_date, platform, status
+    )
+    sales = [dict(zip(SALE_FIELDS, row)) for row in _page_sales(query, skip, limit, cursor)]
+    if not sales:
+        return sales, None
+
+    by_id = {}
+    for sale in sales:
+        sale["items"] = by_id[sale["id"]] = []
+    # Bounded by the page's order dates so only its months' partitions are read
+    order_dates = [sale["order_date"] for sale in sales]
+    items = db.query(*[getattr(models.SaleItem, name) for name in SALE_ITEM_FIELDS]).filter(
+        models.SaleItem.sale_id.in_(list(by_id)),
+        models.SaleItem.order_date.between(min(order_dates), max(order_dates))
+    ).order_by(models.SaleItem.id)
+    for row in items:
+        item = dict(zip(SALE_ITEM_FIELDS, row))
+        by_id[item["sale_id"]].append(item)
+
+    next_cursor = None
+    if len(sales) == limit:
+        next_cursor = pagination.encode_cursor(sales[-1]["order_date"], sales[-1]["id"])
+    return sales, next_cursor
+
+def _filter_sales(query,
+                  start_date: Optional[datetime] = None,
+                  end_date: Optional[datetime] = None,
+                  platform: Optional[str] = None,
+                  status: Optional[str] = None):
+    """
+    Apply the sales listing filters to a query
+    """
     if start_date:
         query = query.filter(models.Sale.order_date >= start_date)
     
@@ -27,28 +114,118 @@ def get_sales(db: Session, skip: int = 0, limit: int = 100,
     if status:
         query = query.filter(models.Sale.status == status)
     
-    return query.order_by(models.Sale.order_date.desc()).offset(skip).limit(limit).all()
+    return query
+
+EXPORT_SALE_COLUMNS = ["id", "order_id", "order_date", "customer_id", "total_amount", "platform", "status"]
+EXPORT_ITEM_COLUMNS = ["product_id", "quantity", "unit_price", "subtotal"]
+
+def export_sales(db: Session,
+                 export_format: str = "ndjson",
+                 start_date: Optional[datetime] = None,
+                 end_date: Optional[datetime] = None,
+                 platform: Optional[str] = None,
+                 status: Optional[str] = None,
+                 batch_size: int = 1000):
+    """
+    Stream sales joined with their items as NDJSON (one sale per line, items
+    nested) or CSV (one line per item). Rows are read through a server-side
+    cursor and emitted in chunks, so memory use does not depend on the export size.
+    """
+    sale_columns = [getattr(models.Sale, name) for name in EXPORT_SALE_COLUMNS]
+    item_columns = [getattr(models.SaleItem, name).label(f"item_{name}") for name in EXPORT_ITEM_COLUMNS]
+    query = _filter_sales(
+        db.query(*sale_columns, *item_columns).outerjoin(
+            models.SaleItem,
+            and_(models.Sale.id == models.SaleItem.sale_id, models.Sale.order_date == models.SaleItem.order_date)
+        ),
+        start_date, end_date, platform, status
+    ).order_by(
+        models.Sale.order_date.desc(), models.Sale.id.desc(), models.SaleItem.id
+    ).yield_per(batch_size)
 
-def get_sale_by_id(db: Session, sale_id: int):
+    if export_format == "csv":
+        return _export_sales_csv(query, batch_size)
+    return _export_sales_ndjson(query, batch_size)
+
+def _export_value(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+def _export_sales_ndjson(rows, batch_size: int):
+    # orjson encodes datetimes as isoformat() does and returns bytes. Lines are
+    # compact, with non-ASCII characters as UTF-8 instead of \u escapes.
+    sale_width = len(EXPORT_SALE_COLUMNS)
+    buffer = []
+    current = None
+
+    for row in rows:
+        if current is None or current["id"] != row[0]:
+            if current is not None:
+                buffer.append(orjson.dumps(current))
+                if len(buffer) >= batch_size:
+                    yield b"\n".join(buffer) + b"\n"
+                    buffer = []
+            current = dict(zip(EXPORT_SALE_COLUMNS, row[:sale_width]))
+            current["items"] = []
+        if row[sale_width] is not None:
+            current["items"].append(dict(zip(EXPORT_ITEM_COLUMNS, row[sale_width:])))
+
+    if current is not None:
+        buffer.append(orjson.dumps(current))
+    if buffer:
+        yield b"\n".join(buffer) + b"\n"
+
+def _export_sales_csv(rows, batch_size: int):
+    output = io.StringIO()
+    writer = csv.writer(output)
+    writer.writerow(EXPORT_SALE_COLUMNS + [f"item_{name}" for name in EXPORT_ITEM_COLUMNS])
+
+    for count, row in enumerate(rows, start=1):
+        writer.writerow([_export_value(value) for value in row])
+        if count % batch_size == 0:
+            yield output.getvalue()
+            output.seek(0)
+            output.truncate(0)
+
+    yield output.getvalue()
+
+def get_sale_by_id(db: Session, sale_id: int, load_options=SALE_LOAD_OPTIONS):
     """
-    Get a specific sale by ID
+    Get a specific sale by ID. Its order date is looked up in sale_order_ids
+    first, so only the partition of its month is read.
     """
-    return db.query(models.Sale).filter(models.Sale.id == sale_id).first()
+    query = db.query(models.Sale).options(*load_options).filter(models.Sale.id == sale_id)
+    order_date = db.query(models.SaleOrderId.order_date).filter(models.SaleOrderId.sale_id == sale_id).first()
+    if order_date is not None:
+        query = query.filter(models.Sale.order_date == order_date[0])
+    return query.first()
 
 def get_sale_by_order_id(db: Session, order_id: str):
     """
-    Get a specific sale by order ID
+    Get a specific sale by order ID, found through sale_order_ids
     """
-    return db.query(models.Sale).filter(models.Sale.order_id == order_id).first()
+    found = db.query(models.SaleOrderId.sale_id, models.SaleOrderId.order_date).filter(
+        models.SaleOrderId.order_id == order_id
+    ).first()
+    if found is None:
+        return None
+    return db.query(models.Sale).filter(
+        models.Sale.id == found.sale_id, models.Sale.order_date == found.order_date
+    ).first()
+
+# Partitioned by month on the order date
+SALES_TABLES = ("sales", "sale_items")
 
 def create_sale(db: Session, sale: schemas.SaleCreate):
     """
     Create a new sale with items
     """
+    order_date = sale.order_date or datetime.now()
+    partitions.ensure_partitions_for(db.get_bind(), SALES_TABLES, [order_date])
+    
     # Create the sale
     db_sale = models.Sale(
         order_id=sale.order_id,
-        order_date=sale.order_date or datetime.now(),
+        order_date=order_date,
         customer_id=sale.customer_id,
         total_amount=sale.total_amount,
         platform=sale.platform,
@@ -57,70 +234,330 @@ def create_sale(db: Session, sale: schemas.SaleCreate):
     db.add(db_sale)
     db.flush()
     
+    categories = rollup_service.product_categories(db, (item.product_id for item in sale.items))
+    db_items = []
     for item in sale.items:
         db_item = models.SaleItem(
             sale_id=db_sale.id,
             product_id=item.product_id,
             quantity=item.quantity,
             unit_price=item.unit_price,
-            subtotal=item.subtotal
+            subtotal=item.subtotal,
+            category_id=categories.get(item.product_id),
+            order_date=db_sale.order_date
         )
         db.add(db_item)
-        
-        inventory = db.query(models.Inventory).filter(models.Inventory.product_id == item.product_id).first()
-        if inventory:
-            inventory.quantity = max(0, inventory.quantity - item.quantity)
+        db_items.append(db_item)
+    
+    inventory_service.decrement_stock(db, _sold_quantities([sale]))
+    rollup_service.apply_sale(db, db_sale, db_items, categories)
     
     db.commit()
+    analytics_cache.invalidate([db_sale.order_date])
+    materialized_views.view_refresher.record_writes()
     db.refresh(db_sale)
     return db_sale
 
+def create_sales_bulk(db: Session, sales: List[schemas.SaleCreate], batch_size: int = 500):
+    """
+    Create many sales at once. Each batch is inserted with multi-row INSERTs and a
+    single set-based inventory UPDATE, then committed. Orders that fail validation
+    are reported individually and do not affect the rest of their batch. In
+    strict stock mode that includes orders the stock left by the orders before
+    them in the payload can't cover. A batch the database rejects, e.g. for an
+    order id inserted concurrently, is retried order by order, so only the
+    orders at fault fail, each with its own error.
+    """
+    results = []
+    seen_order_ids = set()
+    # Before any batch reads the sales tables; payloads without an order date are stamped now
+    partitions.ensure_partitions_for(
+        db.get_bind(), SALES_TABLES, [sale.order_date for sale in sales] + [datetime.now()]
+    )
+    
+    for offset in range(0, len(sales), batch_size):
+        batch = sales[offset:offset + batch_size]
+        batch_results = {}
+        
+        # Duplicate order ids, within the payload or already stored
+        existing = {
+            order_id for (order_id,) in db.query(models.SaleOrderId.order_id).filter(
+                models.SaleOrderId.order_id.in_([sale.order_id for sale in batch])
+            )
+        }
+        product_ids = {item.product_id for sale in batch for item in sale.items}
+        known_products = {
+            product_id for (product_id,) in db.query(models.Product.id).filter(
+                models.Product.id.in_(product_ids)
+            )
+        } if product_ids else set()
+        
+        valid = []
+        for index, sale in enumerate(batch):
+            if sale.order_id in existing:
+                batch_results[index] = {"error": "Sale with this order ID already exists"}
+            elif sale.order_id in seen_order_ids:
+                batch_results[index] = {"error": "Duplicate order ID in request"}
+            elif not sale.items:
+                batch_results[index] = {"error": "Sale has no items"}
+            elif any(item.product_id not in known_products for item in sale.items):
+                batch_results[index] = {"error": "Product not found"}
+            else:
+                valid.append((index, sale))
+            seen_order_ids.add(sale.order_id)
+        
+        if valid and inventory_service.INVENTORY_STRICT_STOCK:
+            valid = _reserve_stock(db, valid, batch_results)
+        
+        if valid:
+            try:
+                sale_ids = _insert_sales_batch(db, [sale for _, sale in valid])
+                db.commit()
+            except Exception:
+                # Something in the batch was rejected, like an order id inserted
+                # concurrently: find out which orders by inserting them one by one
+                db.rollback()
+                sale_ids = _insert_sales_individually(db, valid, batch_results)
+            analytics_cache.invalidate(
+                sale.order_date or datetime.now() for _, sale in valid if sale.order_id in sale_ids
+            )
+            materialized_views.view_refresher.record_writes(len(sale_ids))
+            for index, sale in valid:
+                if sale.order_id in sale_ids:
+                    batch_results[index] = {"sale_id": sale_ids[sale.order_id]}
+        
+        for index, sale in enumerate(batch):
+            outcome = batch_results[index]
+            results.append({
+                "order_id": sale.order_id,
+                "success": "sale_id" in outcome,
+                "sale_id": outcome.get("sale_id"),
+                "error": outcome.get("error")
+            })
+    
+    created = sum(1 for result in results if result["success"])
+    return {
+        "created": created,
+        "failed": len(results) - created,
+        "results": results
+    }
+
+def _reserve_stock(db: Session, valid, batch_results: Dict[int, dict]):
+    """
+    Lock the inventory of the products sold by the batch and walk its orders in
+    payload order, taking each order's units from the locked stock. Orders that
+    would oversell a product are reported in batch_results; the others are
+    returned and, with the rows still locked, decrement_stock accepts them all.
+    """
+    product_ids = {item.product_id for _, sale in valid for item in sale.items}
+    # Products before inventory, in the lock order of create_sale
+    rollup_service.product_categories(db, product_ids)
+    stock = inventory_service.lock_stock(db, product_ids)
+    accepted = []
+    for index, sale in valid:
+        sold = _sold_quantities([sale])
+        short = [
+            (product_id, stock[product_id]) for product_id, quantity in sorted(sold.items())
+            if product_id in stock and stock[product_id] < quantity
+        ]
+        if short:
+            batch_results[index] = {"error": inventory_service.insufficient_stock_detail(short, sold)}
+            continue
+        for product_id, quantity in sold.items():
+            if product_id in stock:
+                stock[product_id] -= quantity
+        accepted.append((index, sale))
+    if not accepted:
+        # Nothing left to insert: release the locks
+        db.rollback()
+    return accepted
+
+def _insert_sales_individually(db: Session, valid, batch_results: Dict[int, dict]):
+    """
+    Insert the orders of a batch that failed as a whole, each under its own
+    savepoint, and commit the ones that went in. Orders that fail are reported
+    in batch_results with their own error. Returns a mapping of order_id to the
+    new sale id.
+    """
+    if inventory_service.INVENTORY_STRICT_STOCK:
+        valid = _reserve_stock(db, valid, batch_results)
+    sale_ids = {}
+    for index, sale in valid:
+        try:
+            with db.begin_nested():
+                sale_ids.update(_insert_sales_batch(db, [sale]))
+        except HTTPException as e:
+            batch_results[index] = {"error": str(e.detail)}
+        except DBAPIError as e:
+            batch_results[index] = {"error": str(e.orig).strip().splitlines()[0]}
+        except Exception as e:
+            batch_results[index] = {"error": f"Insert failed: {e.__class__.__name__}"}
+    db.commit()
+    return sale_ids
+
+def _insert_sales_batch(db: Session, sales: List[schemas.SaleCreate]):
+    """
+    Insert validated sales and their items and decrement inventory, without committing.
+    Returns a mapping of order_id to the new sale id.
+    """
+    now = datetime.now()
+    # Payloads without an order date are stamped once, for the sale and its items
+    sales = [sale if sale.order_date else sale.copy(update={"order_date": now}) for sale in sales]
+    sales_table = models.Sale.__table__
+    inserted = db.execute(
+        insert(sales_table).values([
+            {
+                "order_id": sale.order_id,
+                "order_date": sale.order_date,
+                "customer_id": sale.customer_id,
+                "total_amount": sale.total_amount,
+                "platform": sale.platform,
+                "status": sale.status or "completed",
+                "created_at": now,
+                "updated_at": now
+            } for sale in sales
+        ]).returning(sales_table.c.id, sales_table.c.order_id)
+    ).all()
+    sale_ids = {order_id: sale_id for sale_id, order_id in inserted}
+    categories = rollup_service.product_categories(
+        db, (item.product_id for sale in sales for item in sale.items)
+    )
+    
+    db.execute(
+        insert(models.SaleItem.__table__).values([
+            {
+                "sale_id": sale_ids[sale.order_id],
+                "product_id": item.product_id,
+                "quantity": item.quantity,
+                "unit_price": item.unit_price,
+                "subtotal": item.subtotal,
+                "category_id": categories.get(item.product_id),
+                "order_date": sale.order_date,
+                "created_at": now
+            } for sale in sales for item in sale.items
+        ])
+    )
+    
+    # One locked, conditional UPDATE for every product touched by the batch.
+    # Clamping the summed quantity matches applying max(0, ...) item by item.
+    inventory_service.decrement_stock(db, _sold_quantities(sales))
+    
+    rollup_service.apply_sales(db, [(sale, sale.items) for sale in sales], categories)
+    return sale_ids
+
+def _sold_quantities(sales: List[schemas.SaleCreate]):
+    sold = {}
+    for sale in sales:
+        for item in sale.items:
+            sold[item.product_id] = sold.get(item.product_id, 0) + item.quantity
+    return sold
+
+@analytics_cache.cached("summary", lambda params: [(params["start_date"], params["end_date"])])
 def get_sales_summary(db: Session, 
                      start_date: Optional[datetime] = None,
-                     end_date: Optional[datetime] = None):
+                     end_date: Optional[datetime] = None,
+                     engine: Optional[str] = None):
     """
-    Get sales summary statistics
+    Get sales summary statistics. engine picks "sql" or "columnar"
+    (default ANALYTICS_ENGINE).
     """
     if not start_date:
         start_date = datetime.now() - timedelta(days=30)
     if not end_date:
         end_date = datetime.now()
 
-    sales_query = db.query(
-        func.count(models.Sale.id).label("total_orders"),
-        func.sum(models.Sale.total_amount).label("total_revenue")
-    ).filter(
-        models.Sale.order_date.between(start_date, end_date)
-    ).first()
-    
-    total_orders = sales_query.total_orders or 0
-    total_revenue = float(sales_query.total_revenue or 0)
-    average_order_value = total_revenue / total_orders if total_orders > 0 else 0
+    if columnar_service.use_columnar(engine):
+        return columnar_service.get_sales_summary(db, start_date, end_date)
 
-    platform_query = db.query(
-        models.Sale.platform,
-        func.count(models.Sale.id).label("order_count"),
-        func.sum(models.Sale.total_amount).label("revenue")
-    ).filter(
-        models.Sale.order_date.between(start_date, end_date)
-    ).group_by(models.Sale.platform).all()
-    
-    top_products_query = db.query(
-        models.Product.id,
-        models.Product.name,
-        func.sum(models.SaleItem.quantity).label("total_quantity"),
-        func.sum(models.SaleItem.subtotal).label("total_revenue")
-    ).join(
-        models.SaleItem, models.Product.id == models.SaleItem.product_id
-    ).join(
-        models.Sale, models.SaleItem.sale_id == models.Sale.id
-    ).filter(
+    # One statement: ROLLUP over the window yields the per-platform rows plus
+    # the grand total; the top products are ranked from the materialized
+    # product_daily_sales view for whole days and from the line items for the
+    # partial days at either end; the last branch reads the view's freshness
+    platform_rows = select(
+        literal_column("'platform'").label("kind"),
+        func.grouping(models.Sale.platform).label("is_total"),
+        models.Sale.platform.label("platform"),
+        cast(null(), Integer).label("product_id"),
+        cast(null(), String).label("product_name"),
+        func.count(models.Sale.id).label("quantity"),
+        func.sum(models.Sale.total_amount).label("revenue"),
+        cast(null(), DateTime).label("refreshed_at")
+    ).where(
         models.Sale.order_date.between(start_date, end_date)
+    ).group_by(func.rollup(models.Sale.platform))
+
+    full_days, edges = rollup_service.split_window(
+        rollup_service.as_datetime(start_date), rollup_service.as_datetime(end_date)
+    )
+    product_sales = [
+        select(
+            models.SaleItem.product_id,
+            func.sum(models.SaleItem.quantity).label("quantity"),
+            func.sum(models.SaleItem.subtotal).label("revenue")
+        ).where(
+            _edge_condition(edges, models.SaleItem.order_date)
+        ).group_by(models.SaleItem.product_id)
+    ]
+    if full_days:
+        view = models.ProductDailySales
+        product_sales.append(
+            select(
+                view.c.product_id,
+                func.sum(view.c.quantity).label("quantity"),
+                func.sum(view.c.revenue).label("revenue")
+            ).where(view.c.day.between(*full_days)).group_by(view.c.product_id)
+        )
+    product_sales = union_all(*product_sales).subquery()
+
+    top_products = select(
+        product_sales.c.product_id,
+        func.sum(product_sales.c.quantity).label("total_quantity"),
+        func.sum(product_sales.c.revenue).label("total_revenue")
     ).group_by(
-        models.Product.id, models.Product.name
+        product_sales.c.product_id
     ).order_by(
-        func.sum(models.SaleItem.quantity).desc()
-    ).limit(5).all()
+        func.sum(product_sales.c.quantity).desc()
+    ).limit(5).cte("top_products")
+
+    product_rows = select(
+        literal_column("'product'"),
+        literal_column("0"),
+        cast(null(), String),
+        models.Product.id,
+        models.Product.name,
+        top_products.c.total_quantity,
+        top_products.c.total_revenue,
+        cast(null(), DateTime)
+    ).join_from(top_products, models.Product, models.Product.id == top_products.c.product_id)
+
+    refresh_rows = select(
+        literal_column("'refresh'"),
+        literal_column("0"),
+        cast(null(), String),
+        cast(null(), Integer),
+        cast(null(), String),
+        cast(null(), Integer),
+        cast(null(), Float),
+        models.MaterializedViewRefresh.refreshed_at
+    ).where(models.MaterializedViewRefresh.view_name == materialized_views.PRODUCT_DAILY_SALES)
+
+    total_orders = 0
+    total_revenue = 0.0
+    platform_query = []
+    top_products_query = []
+    top_products_refreshed_at = None
+    for row in db.execute(union_all(platform_rows, product_rows, refresh_rows)):
+        if row.kind == "product":
+            top_products_query.append(row)
+        elif row.kind == "refresh":
+            top_products_refreshed_at = row.refreshed_at
+        elif row.is_total:
+            total_orders = int(row.quantity or 0)
+            total_revenue = float(row.revenue or 0)
+        else:
+            platform_query.append(row)
+    top_products_query.sort(key=lambda p: p.quantity, reverse=True)
+    average_order_value = total_revenue / total_orders if total_orders > 0 else 0
     
     return {
         "period": {
@@ -134,84 +571,219 @@ def get_sales_summary(db: Session,
         "platforms": [
             {
                 "platform": p.platform,
-                "order_count": p.order_count,
+                "order_count": int(p.quantity),
                 "revenue": float(p.revenue or 0)
             } for p in platform_query
         ],
         "top_products": [
             {
-                "id": p.id,
-                "name": p.name,
-                "total_quantity": p.total_quantity,
-                "total_revenue": float(p.total_revenue or 0)
+                "id": p.product_id,
+                "name": p.product_name,
+                "total_quantity": int(p.quantity),
+                "total_revenue": float(p.revenue or 0)
             } for p in top_products_query
         ],
+        # Whole days of the top products are as of this refresh of product_daily_sales
+        "top_products_refreshed_at": top_products_refreshed_at,
         "total_sales": total_revenue,
         "total_orders": total_orders,
         "average_order_value": average_order_value
     }
 
+@analytics_cache.cached("revenue", lambda params: [(params["start_date"], params["end_date"])])
 def get_revenue_by_period(db: Session, 
                          period_type: str = "daily",
                          start_date: Optional[datetime] = None,
                          end_date: Optional[datetime] = None,
                          platform: Optional[str] = None,
-                         category_id: Optional[int] = None):
+                         category_id: Optional[int] = None,
+                         engine: Optional[str] = None):
     """
-    Get revenue data grouped by period (daily, weekly, monthly, yearly)
+    Get revenue data grouped by period (daily, weekly, monthly, yearly).
+    engine picks "sql" or "columnar" (default ANALYTICS_ENGINE).
     """
     if not start_date:
-        if period_type == "daily":
-            start_date = datetime.now() - timedelta(days=30)
-        elif period_type == "weekly":
-            start_date = datetime.now() - timedelta(days=90)
-        elif period_type == "monthly":
-            start_date = datetime.now() - timedelta(days=365)
-        else:  # yearly
-            start_date = datetime.now() - timedelta(days=365*3)
+        start_date = _default_period_start(period_type)
     
     if not end_date:
         end_date = datetime.now()
-    if period_type == "daily":
-        date_part = func.date(models.Sale.order_date)
-    elif period_type == "weekly":
-        date_part = func.date_trunc('week', models.Sale.order_date)
-    elif period_type == "monthly":
-        date_part = func.date_trunc('month', models.Sale.order_date)
-    else:  # yearly
-        date_part = extract('year', models.Sale.order_date)
 
-    query = db.query(
-        date_part.label("period"),
-        func.sum(models.Sale.total_amount).label("revenue"),
-        func.count(models.Sale.id).label("order_count")
-    ).filter(
-        models.Sale.order_date.between(start_date, end_date)
-    )
-    
-    if platform:
-        query = query.filter(models.Sale.platform == platform)
-    
-    if category_id:
-        query = query.join(
-            models.SaleItem, models.Sale.id == models.SaleItem.sale_id
-        ).join(
-            models.Product, models.SaleItem.product_id == models.Product.id
-        ).filter(
-            models.Product.category_id == category_id
-        )
-    
-    query = query.group_by(date_part).order_by(date_part)
-    result = query.all()
+    start_date = rollup_service.as_datetime(start_date)
+    end_date = rollup_service.as_datetime(end_date)
+    if columnar_service.use_columnar(engine):
+        return columnar_service.get_revenue_by_period(db, period_type, start_date, end_date, platform, category_id)
+
+    full_days, edges = rollup_service.split_window(start_date, end_date)
+
+    # Whole days come from the rollup, partial days at either end from raw
+    # sales; both are combined in a single statement
+    parts = []
+    if full_days:
+        rollup = models.SalesDailyRollup
+        date_part = _period_expression(period_type, rollup.day)
+        parts.append(_rollup_source(
+            [
+                date_part.label("period"),
+                func.sum(rollup.revenue).label("revenue"),
+                func.sum(rollup.order_count).label("order_count")
+            ],
+            rollup.day.between(*full_days), platform, category_id
+        ).group_by(date_part))
+
+    order_date, revenue, order_count = _raw_facts(by_items=bool(category_id))
+    date_part = _period_expression(period_type, order_date)
+    parts.append(_raw_sales_source(
+        [
+            date_part.label("period"),
+            func.sum(revenue).label("revenue"),
+            order_count.label("order_count")
+        ],
+        _edge_condition(edges, order_date), platform, category_id
+    ).group_by(date_part))
+
+    combined = union_all(*parts).subquery()
+    result = db.execute(
+        select(
+            combined.c.period,
+            func.sum(combined.c.revenue).label("revenue"),
+            func.sum(combined.c.order_count).label("order_count")
+        ).group_by(combined.c.period).order_by(combined.c.period)
+    ).all()
 
     return [
         {
             "period": str(item.period),
             "revenue": float(item.revenue or 0),
-            "order_count": item.order_count
+            "order_count": int(item.order_count or 0)
         } for item in result
     ]
 
+def _default_period_start(period_type: str):
+    if period_type == "daily":
+        return datetime.now() - timedelta(days=30)
+    elif period_type == "weekly":
+        return datetime.now() - timedelta(days=90)
+    elif period_type == "monthly":
+        return datetime.now() - timedelta(days=365)
+    else:  # yearly
+        return datetime.now() - timedelta(days=365*3)
+
+def _period_expression(period_type: str, column):
+    """
+    Bucket expression for a period type. Works on both the timestamp
+    Sale.order_date and the date SalesDailyRollup.day columns. The unit is
+    inlined rather than bound so the expression matches itself in GROUP BY.
+    """
+    if period_type == "daily":
+        return func.date(column)
+    elif period_type == "weekly":
+        return func.date_trunc(literal_column("'week'"), cast(column, DateTime))
+    elif period_type == "monthly":
+        return func.date_trunc(literal_column("'month'"), cast(column, DateTime))
+    else:  # yearly
+        return extract('year', column)
+
+def _edge_condition(edges, order_date=models.Sale.order_date):
+    """
+    Condition matching order_date inside any of the partial-day edges from rollup_service.split_window
+    """
+    return or_(*[
+        and_(
+            order_date >= lower,
+            order_date <= upper if upper_inclusive else order_date < upper
+        ) for lower, upper, upper_inclusive in edges
+    ])
+
+def _raw_facts(by_items: bool = False):
+    """
+    (order date, revenue, order count) expressions of the raw fact source.
+    Category figures (by_items) are summed from the line items, which carry
+    the order date and category themselves; everything else from order totals.
+    """
+    if by_items:
+        return (
+            models.SaleItem.order_date,
+            models.SaleItem.subtotal,
+            func.count(distinct(models.SaleItem.sale_id))
+        )
+    return models.Sale.order_date, models.Sale.total_amount, func.count(models.Sale.id)
+
+def _raw_sales_source(columns, condition, platform: Optional[str] = None, category_id: Optional[int] = None):
+    """
+    Select columns from the raw fact source (see _raw_facts) matching condition
+    and the platform/category filters
+    """
+    if category_id:
+        query = select(*columns).select_from(models.SaleItem).where(
+            models.SaleItem.category_id == category_id, condition
+        )
+        if platform:
+            query = query.join(
+                models.Sale,
+                and_(models.Sale.id == models.SaleItem.sale_id, models.Sale.order_date == models.SaleItem.order_date)
+            ).where(models.Sale.platform == platform)
+        return query
+
+    query = select(*columns).select_from(models.Sale).where(condition)
+    if platform:
+        query = query.where(models.Sale.platform == platform)
+    return query
+
+def _rollup_source(columns, condition, platform: Optional[str] = None, category_id: Optional[int] = None):
+    """
+    Select columns from the daily rollup rows matching condition and the platform/category filters
+    """
+    rollup = models.SalesDailyRollup
+    query = select(*columns).select_from(rollup).where(
+        condition,
+        rollup.category_id == (category_id or rollup_service.ALL_CATEGORIES)
+    )
+    if platform:
+        query = query.where(rollup.platform == platform)
+    return query
+
+def _windows_revenue(db: Session, windows, platform: Optional[str] = None, category_id: Optional[int] = None):
+    """
+    Total revenue for each inclusive (start, end) window, computed in one
+    statement with one FILTERed sum per window
+    """
+    rollup = models.SalesDailyRollup
+    splits = [rollup_service.split_window(start, end) for start, end in windows]
+
+    order_date, revenue, _ = _raw_facts(by_items=bool(category_id))
+    rollup_columns = []
+    raw_columns = []
+    for index, (full_days, edges) in enumerate(splits):
+        name = f"window_{index}"
+        if full_days:
+            rollup_columns.append(func.sum(rollup.revenue).filter(rollup.day.between(*full_days)).label(name))
+        else:
+            rollup_columns.append(cast(null(), Float).label(name))
+        raw_columns.append(func.sum(revenue).filter(_edge_condition(edges, order_date)).label(name))
+
+    parts = [_raw_sales_source(
+        raw_columns,
+        or_(*[_edge_condition(edges, order_date) for _, edges in splits]),
+        platform, category_id
+    )]
+    full_ranges = [full_days for full_days, _ in splits if full_days]
+    if full_ranges:
+        parts.append(_rollup_source(
+            rollup_columns,
+            or_(*[rollup.day.between(*full_days) for full_days in full_ranges]),
+            platform, category_id
+        ))
+
+    combined = union_all(*parts).subquery()
+    totals = db.execute(
+        select(*[func.sum(combined.c[f"window_{index}"]) for index in range(len(windows))])
+    ).one()
+    return [float(total or 0) for total in totals]
+
+@analytics_cache.cached("compare", lambda params: [
+    (params["current_start"], params["current_end"]),
+    (params["previous_start"], params["previous_end"])
+])
 def compare_revenue(db: Session,
                    period_type: str = "monthly",
                    current_start: datetime = None,
@@ -219,9 +791,11 @@ def compare_revenue(db: Session,
                    previous_start: datetime = None,
                    previous_end: datetime = None,
                    platform: Optional[str] = None,
-                   category_id: Optional[int] = None):
+                   category_id: Optional[int] = None,
+                   engine: Optional[str] = None):
     """
-    Compare revenue between two periods
+    Compare revenue between two periods. engine picks "sql" or "columnar"
+    (default ANALYTICS_ENGINE).
     """
 
     if not current_end:
@@ -250,41 +824,16 @@ def compare_revenue(db: Session,
         else:
             previous_start = previous_end - timedelta(days=365)
 
-    current_query = db.query(
-        func.sum(models.Sale.total_amount).label("revenue")
-    ).filter(
-        models.Sale.order_date.between(current_start, current_end)
-    )
-
-    previous_query = db.query(
-        func.sum(models.Sale.total_amount).label("revenue")
-    ).filter(
-        models.Sale.order_date.between(previous_start, previous_end)
+    windows_revenue = columnar_service.windows_revenue if columnar_service.use_columnar(engine) else _windows_revenue
+    current_revenue, previous_revenue = windows_revenue(
+        db,
+        [
+            (rollup_service.as_datetime(current_start), rollup_service.as_datetime(current_end)),
+            (rollup_service.as_datetime(previous_start), rollup_service.as_datetime(previous_end))
+        ],
+        platform=platform,
+        category_id=category_id
     )
-    
-    if platform:
-        current_query = current_query.filter(models.Sale.platform == platform)
-        previous_query = previous_query.filter(models.Sale.platform == platform)
-    
-    if category_id:
-        current_query = current_query.join(
-            models.SaleItem, models.Sale.id == models.SaleItem.sale_id
-        ).join(
-            models.Product, models.SaleItem.product_id == models.Product.id
-        ).filter(
-            models.Product.category_id == category_id
-        )
-        
-        previous_query = previous_query.join(
-            models.SaleItem, models.Sale.id == models.SaleItem.sale_id
-        ).join(
-            models.Product, models.SaleItem.product_id == models.Product.id
-        ).filter(
-            models.Product.category_id == category_id
-        )
-    
-    current_revenue = current_query.scalar() or 0
-    previous_revenue = previous_query.scalar() or 0
 
     change = current_revenue - previous_revenue
     percent_change = (change / previous_revenue * 100) if previous_revenue > 0 else 0
@@ -305,4 +854,152 @@ def compare_revenue(db: Session,
             "change": float(change),
             "percent_change": float(percent_change)
         }
-    }
\ No newline at end of file
+    }
+
+SERIES_DIMENSIONS = ("platform", "category_id")
+SERIES_UNITS = {"daily": "day", "weekly": "week", "monthly": "month", "yearly": "year"}
+MAX_SERIES_PERIODS = 5000
+
+def _series_periods(period_type: str, start: datetime, end: datetime):
+    """
+    Start of every period bucket overlapping [start, end], as date_trunc computes them
+    """
+    period = datetime(start.year, start.month, start.day)
+    if period_type == "weekly":
+        period -= timedelta(days=period.weekday())
+    elif period_type == "monthly":
+        period = period.replace(day=1)
+    elif period_type == "yearly":
+        period = period.replace(month=1, day=1)
+
+    periods = []
+    while period <= end:
+        periods.append(period)
+        if len(periods) > MAX_SERIES_PERIODS:
+            raise HTTPException(status_code=400, detail=f"More than {MAX_SERIES_PERIODS} periods requested")
+        if period_type == "daily":
+            period += timedelta(days=1)
+        elif period_type == "weekly":
+            period += timedelta(days=7)
+        elif period_type == "monthly":
+            period = period.replace(year=period.year + period.month // 12, month=period.month % 12 + 1)
+        else:
+            period = period.replace(year=period.year + 1)
+    return periods
+
+@analytics_cache.cached("series", lambda params: [(params["start_date"], params["end_date"])])
+def get_revenue_series(db: Session,
+                       period_type: str = "daily",
+                       start_date: Optional[datetime] = None,
+                       end_date: Optional[datetime] = None,
+                       group_by: List[str] = (),
+                       platform: Optional[str] = None,
+                       category_id: Optional[int] = None):
+    """
+    Revenue and order count per period for every combination of the group_by
+    dimensions (platform, category_id) in one grouped query. Every series has
+    a value for every period of the window, zero where nothing was sold.
+    """
+    group_by = list(dict.fromkeys(group_by))
+    unknown = [dimension for dimension in group_by if dimension not in SERIES_DIMENSIONS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Cannot group by {', '.join(unknown)}")
+    if period_type not in SERIES_UNITS:
+        raise HTTPException(status_code=400, detail="period_type must be daily, weekly, monthly or yearly")
+
+    start_date = rollup_service.as_datetime(start_date or _default_period_start(period_type))
+    end_date = rollup_service.as_datetime(end_date or datetime.now())
+    periods = _series_periods(period_type, start_date, end_date)
+    by_platform = "platform" in group_by
+    by_category = "category_id" in group_by
+    unit = literal_column(f"'{SERIES_UNITS[period_type]}'")
+
+    full_days, edges = rollup_service.split_window(start_date, end_date)
+    parts = []
+    if full_days:
+        rollup = models.SalesDailyRollup
+        bucket = func.date_trunc(unit, cast(rollup.day, DateTime))
+        dimensions = [rollup.platform.label("platform")] if by_platform else []
+        if by_category:
+            dimensions.append(rollup.category_id.label("category_id"))
+        query = select(
+            bucket.label("period"),
+            *dimensions,
+            func.sum(rollup.revenue).label("revenue"),
+            func.sum(rollup.order_count).label("order_count")
+        ).where(rollup.day.between(*full_days))
+        if category_id:
+            query = query.where(rollup.category_id == category_id)
+        elif by_category:
+            query = query.where(rollup.category_id != rollup_service.ALL_CATEGORIES)
+        else:
+            query = query.where(rollup.category_id == rollup_service.ALL_CATEGORIES)
+        if platform:
+            query = query.where(rollup.platform == platform)
+        parts.append(query.group_by(bucket, *dimensions))
+
+    # Category figures come from the line items, as in get_revenue_by_period
+    item_facts = by_category or bool(category_id)
+    order_date, revenue, order_count = _raw_facts(by_items=item_facts)
+    bucket = func.date_trunc(unit, order_date)
+    # The rollup stores a missing platform as ''
+    platform_column = func.coalesce(models.Sale.platform, literal_column("''"))
+    dimensions = [platform_column.label("platform")] if by_platform else []
+    if by_category:
+        dimensions.append(models.SaleItem.category_id.label("category_id"))
+    query = select(
+        bucket.label("period"),
+        *dimensions,
+        func.sum(revenue).label("revenue"),
+        order_count.label("order_count")
+    )
+    if item_facts:
+        query = query.select_from(models.SaleItem).where(models.SaleItem.category_id.isnot(None))
+        if category_id:
+            query = query.where(models.SaleItem.category_id == category_id)
+        if by_platform or platform:
+            query = query.join(models.Sale, and_(
+                models.Sale.id == models.SaleItem.sale_id, models.Sale.order_date == models.SaleItem.order_date
+            ))
+    else:
+        query = query.select_from(models.Sale)
+    if platform:
+        query = query.where(models.Sale.platform == platform)
+    parts.append(query.where(_edge_condition(edges, order_date)).group_by(bucket, *dimensions))
+
+    combined = union_all(*parts).subquery()
+    keys = [combined.c[dimension] for dimension in group_by]
+    rows = db.execute(
+        select(
+            combined.c.period,
+            *keys,
+            func.sum(combined.c.revenue).label("revenue"),
+            func.sum(combined.c.order_count).label("order_count")
+        ).group_by(combined.c.period, *keys).order_by(*keys)
+    ).all()
+
+    positions = {period: index for index, period in enumerate(periods)}
+    series = {}
+    for row in rows:
+        key = tuple(getattr(row, dimension) for dimension in group_by)
+        entry = series.get(key)
+        if entry is None:
+            entry = series[key] = {
+                dimension: (value or None) if dimension == "platform" else value
+                for dimension, value in zip(group_by, key)
+            }
+            entry["revenue"] = [0.0] * len(periods)
+            entry["order_count"] = [0] * len(periods)
+        index = positions[row.period]
+        entry["revenue"][index] = float(row.revenue or 0)
+        entry["order_count"][index] = int(row.order_count or 0)
+
+    if not series and not group_by:
+        series[()] = {"revenue": [0.0] * len(periods), "order_count": [0] * len(periods)}
+
+    return {
+        "period_type": period_type,
+        "group_by": group_by,
+        "periods": periods,
+        "series": list(series.values())
+    }
@@ -0,0 +1,281 @@
+"""
+Push delivery of low-stock alerts.
+
+A product is low on stock while its quantity is at or below its
+low_stock_threshold. The inventory writes (decrement_stock for sales,
+update_inventory and the bulk snapshot) call publish() inside their transaction
+with the rows they changed. publish() sends a NOTIFY for every row that crossed
+its threshold, either way. The NOTIFY is delivered when the transaction commits,
+so rolled back changes raise no alert. It goes to the StockAlertListener of
+every worker, which hands the events to the subscribers of that worker.
+
+GET /inventory/low-stock/stream is a Server-Sent Events stream. It sends a
+"snapshot" event with every product currently low on stock, then an "alert"
+event per crossing:
+
+    {"product_id": 7, "inventory_id": 7, "quantity": 3, "low_stock_threshold": 10, "low_stock": true}
+
+Events describe the new state, so one that was already reflected in the
+snapshot is harmless to apply again. A subscriber that falls too far behind, or
+whose listener reconnected and may have missed notifications, has its stream
+closed; EventSource clients then reconnect and get a fresh snapshot.
+"""
+import asyncio
+import json
+import logging
+import os
+import select
+import threading
+from typing import Awaitable, Callable, Iterable, List, Optional, Tuple
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from app import metrics
+from app.database import listen_engine
+
+STOCK_ALERTS_ENABLED = os.getenv("STOCK_ALERTS_ENABLED", "true").lower() in ("1", "true", "yes")
+# Seconds between keepalive comments on an idle stream
+STOCK_ALERT_HEARTBEAT = float(os.getenv("STOCK_ALERT_HEARTBEAT", "15"))
+# Undelivered notifications a subscriber may lag behind before its stream is closed
+STOCK_ALERT_QUEUE_SIZE = int(os.getenv("STOCK_ALERT_QUEUE_SIZE", "1000"))
+
+STOCK_ALERT_CHANNEL = "stock_alerts"
+# Events per NOTIFY, well within the 8000 byte payload limit
+EVENTS_PER_NOTIFICATION = 50
+
+logger = logging.getLogger(__name__)
+
+def is_low(quantity: Optional[int], threshold: Optional[int]) -> bool:
+    return quantity is not None and threshold is not None and quantity <= threshold
+
+def alert(product_id: int, inventory_id: int, quantity: int, threshold: int) -> dict:
+    return {
+        "product_id": product_id,
+        "inventory_id": inventory_id,
+        "quantity": quantity,
+        "low_stock_threshold": threshold,
+        "low_stock": is_low(quantity, threshold)
+    }
+
+# (product_id, inventory_id, previous quantity, previous threshold, quantity, threshold)
+StockChange = Tuple[int, int, Optional[int], Optional[int], Optional[int], Optional[int]]
+
+def crossings(changes: Iterable[StockChange]) -> List[dict]:
+    """
+    Alerts for the changes that took a product below its threshold or back above it
+    """
+    return [
+        alert(product_id, inventory_id, quantity, threshold)
+        for product_id, inventory_id, previous_quantity, previous_threshold, quantity, threshold in changes
+        if is_low(previous_quantity, previous_threshold) != is_low(quantity, threshold)
+    ]
+
+def publish(db: Session, changes: Iterable[StockChange]):
+    """
+    Send the threshold crossings among changes to the subscribers of every
+    worker once db's transaction commits. Call before the commit.
+    """
+    if not STOCK_ALERTS_ENABLED:
+        return
+    events = crossings(changes)
+    if not events:
+        return
+    payloads = [
+        json.dumps(events[offset:offset + EVENTS_PER_NOTIFICATION])
+        for offset in range(0, len(events), EVENTS_PER_NOTIFICATION)
+    ]
+    db.execute(
+        text("SELECT pg_notify(:channel, payload) FROM unnest(CAST(:payloads AS text[])) AS payload"),
+        {"channel": STOCK_ALERT_CHANNEL, "payloads": payloads}
+    )
+
+class Subscription:
+    """
+    Queue of alert lists for one stream, fed from the listener thread. None
+    in the queue closes the stream.
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, maxsize: int = STOCK_ALERT_QUEUE_SIZE):
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize)
+        self.closed = False
+
+    def deliver(self, events: Optional[List[dict]]):
+        # Runs on the subscriber's event loop
+        if self.closed:
+            return
+        if events is not None:
+            try:
+                self.queue.put_nowait(events)
+                return
+            except asyncio.QueueFull:
+                logger.warning("Closing a low-stock alert stream that fell %d notifications behind", self.queue.qsize())
+        self.closed = True
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self.queue.put_nowait(None)
+
+class StockAlertHub:
+    """
+    The open streams of this worker
+    """
+
+    def __init__(self):
+        self.events = 0
+        self.closed = 0
+        self._subscriptions = set()
+        self._lock = threading.Lock()
+
+    def subscribe(self) -> Subscription:
+        """
+        Start receiving alerts on the running event loop
+        """
+        subscription = Subscription(asyncio.get_running_loop())
+        with self._lock:
+            self._subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            self._subscriptions.discard(subscription)
+
+    def dispatch(self, events: Optional[List[dict]]):
+        """
+        Hand events to every subscriber, or close every stream when events is None
+        """
+        with self._lock:
+            subscriptions = list(self._subscriptions)
+            if events is None:
+                self.closed += len(subscriptions)
+                self._subscriptions.clear()
+            else:
+                self.events += len(events)
+        for subscription in subscriptions:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.deliver, events)
+            except RuntimeError:
+                # Its event loop is gone
+                self.unsubscribe(subscription)
+
+    def size(self):
+        with self._lock:
+            return len(self._subscriptions)
+
+stock_alert_hub = StockAlertHub()
+
+def _server_sent_event(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+async def _stream(subscription: Subscription, snapshot: List[dict], heartbeat: float):
+    try:
+        yield _server_sent_event("snapshot", snapshot)
+        while True:
+            try:
+                events = await asyncio.wait_for(subscription.queue.get(), heartbeat)
+            except asyncio.TimeoutError:
+                yield ": keepalive\n\n"
+                continue
+            if events is None:
+                return
+            for event in events:
+                yield _server_sent_event("alert", event)
+    finally:
+        stock_alert_hub.unsubscribe(subscription)
+
+async def stream_response(snapshot: Callable[[], Awaitable[List[dict]]],
+                          heartbeat: float = STOCK_ALERT_HEARTBEAT) -> StreamingResponse:
+    """
+    Server-Sent Events response of the alerts snapshot() returns followed by
+    every crossing committed from now on. The subscription is taken before the
+    snapshot is read, so no crossing falls between the two.
+    """
+    if not STOCK_ALERTS_ENABLED:
+        raise HTTPException(status_code=404, detail="Low-stock alert stream is disabled")
+    subscription = stock_alert_hub.subscribe()
+    try:
+        alerts = await snapshot()
+    except BaseException:
+        stock_alert_hub.unsubscribe(subscription)
+        raise
+    return StreamingResponse(
+        _stream(subscription, alerts, heartbeat),
+        media_type="text/event-stream",
+        # Keep proxies from caching or buffering the stream
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+class StockAlertListener:
+    """
+    Background thread LISTENing on the stock alert channel on its own
+    connection and dispatching the notified alerts to the hub
+    """
+
+    def __init__(self, hub: StockAlertHub = stock_alert_hub, bind=None, retry_interval: float = 5.0):
+        self.hub = hub
+        self.bind = bind
+        self.retry_interval = retry_interval
+        self.notifications = 0
+        self.reconnects = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is not None or not STOCK_ALERTS_ENABLED:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="stock-alert-listener", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+        # Let the open streams end instead of waiting for alerts that won't come
+        self.hub.dispatch(None)
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self._listen()
+            except Exception:
+                self.reconnects += 1
+                logger.exception("Stock alert listener lost its connection")
+            self._stop.wait(self.retry_interval)
+
+    def _listen(self):
+        connection = (self.bind or listen_engine).raw_connection()
+        try:
+            dbapi_connection = connection.connection
+            # LISTEN only takes effect outside a transaction
+            dbapi_connection.autocommit = True
+            with dbapi_connection.cursor() as cursor:
+                cursor.execute(f"LISTEN {STOCK_ALERT_CHANNEL}")
+            # Streams opened before LISTEN may have missed crossings: make them resync
+            self.hub.dispatch(None)
+            while not self._stop.is_set():
+                if select.select([dbapi_connection], [], [], 1.0) == ([], [], []):
+                    continue
+                dbapi_connection.poll()
+                while dbapi_connection.notifies:
+                    payload = dbapi_connection.notifies.pop(0).payload
+                    self.notifications += 1
+                    self.hub.dispatch(json.loads(payload))
+        finally:
+            # Switched to autocommit, so it must not be reused: closed rather than returned to a pool
+            connection.invalidate()
+
+stock_alert_listener = StockAlertListener()
+
+metrics.registry.gauge(
+    "stock_alert_streams",
+    "Open low-stock alert streams",
+    lambda: [({}, stock_alert_hub.size())]
+)
+metrics.registry.gauge(
+    "stock_alert_events",
+    "Low-stock alerts dispatched to this worker's streams since it started",
+    lambda: [({}, stock_alert_hub.events)]
+)
@@ -0,0 +1,136 @@
+"""
+Heavy analytics reports as jobs against the same reports on the request path.
+
+- Times a multi-year yearly revenue report and a category compare through
+  their endpoints, then as jobs: the submission, and the long-poll until the
+  result.
+- Checks that each job result matches the endpoint's response, and that
+  identical concurrent submissions share one job.
+- Measures the latency of a light endpoint while several heavy reports run on
+  the request path, and again while they run as jobs.
+
+Exits non-zero if a result differs or identical submissions start more than one job.
+
+    python -m benchmarks.analytics_jobs --years 3 --concurrency 8
+"""
+import argparse
+import itertools
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from fastapi.testclient import TestClient
+from app.main import app
+from app.services.analytics_cache import analytics_cache
+
+def reports(years: int):
+    today = date.today()
+    start = today.replace(year=today.year - years)
+    return [
+        ("revenue yearly", "/sales/analytics/revenue", {
+            "period_type": "yearly", "start_date": start.isoformat(), "end_date": today.isoformat(), "engine": "sql"
+        }),
+        ("compare by category", "/sales/analytics/compare", {
+            "period_type": "monthly",
+            "current_start": today.replace(year=today.year - 1).isoformat(), "current_end": today.isoformat(),
+            "previous_start": start.isoformat(), "previous_end": today.replace(year=today.year - 1).isoformat(),
+            "category_id": 1, "engine": "sql"
+        }),
+    ]
+
+def run_job(client: TestClient, path: str, params: dict):
+    """
+    Returns (job, seconds to submit, seconds until the result)
+    """
+    started = time.perf_counter()
+    response = client.post(f"{path}/jobs", params=params)
+    response.raise_for_status()
+    submitted = time.perf_counter() - started
+    job = response.json()
+    while job["status"] in ("pending", "running"):
+        response = client.get(f"/sales/analytics/jobs/{job['id']}", params={"wait": 30})
+        response.raise_for_status()
+        job = response.json()
+    return job, submitted, time.perf_counter() - started
+
+def light_latency(client: TestClient, stop: threading.Event):
+    latencies = []
+    while not stop.is_set():
+        started = time.perf_counter()
+        client.get("/products/", params={"limit": 10}).raise_for_status()
+        latencies.append((time.perf_counter() - started) * 1000)
+    if not latencies:
+        return 0.0, 0.0
+    latencies.sort()
+    return latencies[len(latencies) // 2], latencies[int(len(latencies) * 0.95)]
+
+def under_load(client: TestClient, heavy, concurrency: int):
+    """
+    p50 and p95 latency in ms of a light endpoint while heavy() runs concurrency times
+    """
+    stop = threading.Event()
+    with ThreadPoolExecutor(max_workers=1) as probe:
+        latency = probe.submit(light_latency, client, stop)
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            list(pool.map(lambda _: heavy(), range(concurrency)))
+        stop.set()
+        return latency.result()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--years", type=int, default=3)
+    parser.add_argument("--concurrency", type=int, default=8)
+    args = parser.parse_args()
+
+    ok = True
+    with TestClient(app) as client:
+        for name, path, params in reports(args.years):
+            analytics_cache.clear()
+            started = time.perf_counter()
+            response = client.get(path, params=params)
+            response.raise_for_status()
+            inline = time.perf_counter() - started
+
+            job, submitted, finished = run_job(client, path, params)
+            print(f"{name:<20} endpoint {inline:>7.2f}s  job submit {submitted * 1000:>6.1f} ms, "
+                  f"result {finished:>7.2f}s ({job['status']})")
+            if job["status"] != "done" or job["result"] != response.json():
+                ok = False
+                print(f"FAIL {name}: job result differs from the endpoint ({job['error']})")
+
+        # Identical submissions while the first is in flight share its job
+        name, path, params = reports(args.years + 1)[0]
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            jobs = list(pool.map(
+                lambda _: client.post(f"{path}/jobs", params=params).json(), range(args.concurrency)
+            ))
+        ids = {job["id"] for job in jobs}
+        print(f"{args.concurrency} identical submissions -> {len(ids)} job(s)")
+        if len(ids) != 1:
+            ok = False
+            print("FAIL identical in-flight submissions were not deduplicated")
+        for job_id in ids:
+            client.get(f"/sales/analytics/jobs/{job_id}", params={"wait": 60})
+
+        # Distinct windows, so neither the cache nor deduplication skips any work
+        name, path, params = reports(args.years)[1]
+        shifts = itertools.count(1)
+
+        def distinct():
+            start = date.fromisoformat(params["previous_start"]) - timedelta(days=next(shifts))
+            return dict(params, previous_start=start.isoformat())
+
+        def heavy_inline():
+            client.get(path, params=distinct()).raise_for_status()
+
+        def heavy_job():
+            run_job(client, path, distinct())
+
+        for label, heavy in (("on the request path", heavy_inline), ("as jobs", heavy_job)):
+            p50, p95 = under_load(client, heavy, args.concurrency)
+            print(f"light endpoint, {args.concurrency} heavy reports {label:<20} p50 {p50:>7.1f} ms  p95 {p95:>7.1f} ms")
+    return 0 if ok else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,41 @@
+"""
+Concurrent-request throughput of the sync (threadpool) and async (AsyncSession)
+database paths. Starts one uvicorn server per mode against DATABASE_URL and
+drives the same endpoints with many concurrent clients.
+
+    python -m benchmarks.async_load --concurrency 200 --requests 5000
+"""
+import argparse
+import asyncio
+from benchmarks.load import local_server, run_load
+
+ENDPOINTS = [
+    "/sales/analytics/summary",
+    "/sales/analytics/revenue?period_type=monthly",
+    "/sales/?limit=50",
+    "/products/?limit=50",
+]
+
+def run_mode(async_mode: bool, port: int, concurrency: int, total: int):
+    env = {"DATABASE_ASYNC": "true" if async_mode else "false"}
+    with local_server(port, env) as base_url:
+        return asyncio.run(run_load(
+            base_url,
+            lambda i: ("GET", ENDPOINTS[i % len(ENDPOINTS)], None),
+            concurrency,
+            total
+        ))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare sync and async database paths under load")
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    for mode, async_mode in (("sync", False), ("async", True)):
+        result = run_mode(async_mode, args.port, args.concurrency, args.requests)
+        print(
+            f"{mode:5}: {result['throughput_rps']:,.0f} req/s, p50 {result['p50_ms']:.1f} ms, "
+            f"p95 {result['p95_ms']:.1f} ms, {result['errors']} errors"
+        )
@@ -0,0 +1,97 @@
+"""
+Compare applying a stock snapshot through PUT /inventory/{product_id} one
+product at a time against a single PUT /inventory/bulk, in statements and
+seconds, and check that both leave the same stock and history behind. Writes
+real rows, so point DATABASE_URL at a scratch database.
+
+    python -m benchmarks.bulk_inventory --products 2000
+"""
+import argparse
+import random
+import sys
+import time
+from fastapi.testclient import TestClient
+from app import models
+from app.database import SessionLocal
+from app.main import app
+from app.query_counter import QueryCounter
+
+def snapshot(inventory, changed_share: float = 0.3):
+    # A warehouse count: most products unchanged, some restocked or sold down
+    return [
+        {"product_id": product_id,
+         "quantity": max(0, quantity + random.randint(-20, 50)) if random.random() < changed_share else quantity}
+        for product_id, quantity in inventory
+    ]
+
+def state(db, product_ids):
+    stock = dict(db.query(models.Inventory.product_id, models.Inventory.quantity).filter(
+        models.Inventory.product_id.in_(product_ids)
+    ))
+    history = db.query(models.InventoryHistory).join(models.Inventory).filter(
+        models.Inventory.product_id.in_(product_ids)
+    ).count()
+    return stock, history
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--products", type=int, default=2000)
+    args = parser.parse_args()
+
+    client = TestClient(app)
+    db = SessionLocal()
+    try:
+        inventory = db.query(models.Inventory.product_id, models.Inventory.quantity).order_by(
+            models.Inventory.product_id
+        ).limit(args.products).all()
+        product_ids = [product_id for product_id, _ in inventory]
+        counts = snapshot(inventory)
+        changed = sum(1 for (_, before), count in zip(inventory, counts) if count["quantity"] != before)
+
+        _, history_before = state(db, product_ids)
+        with QueryCounter() as counter:
+            started = time.perf_counter()
+            for count in counts:
+                client.put(f"/inventory/{count['product_id']}", params={"change_reason": "benchmark"},
+                           json={"quantity": count["quantity"]}).raise_for_status()
+            single_elapsed = time.perf_counter() - started
+        single_statements = counter.count
+        db.expire_all()
+        single_stock, history_single = state(db, product_ids)
+
+        # Back to the original counts through the bulk endpoint, then apply the snapshot again
+        client.put("/inventory/bulk", params={"change_reason": "benchmark reset"},
+                   json=[{"product_id": product_id, "quantity": quantity} for product_id, quantity in inventory]
+                   ).raise_for_status()
+        db.expire_all()
+        _, history_reset = state(db, product_ids)
+        with QueryCounter() as counter:
+            started = time.perf_counter()
+            result = client.put("/inventory/bulk", params={"change_reason": "benchmark"}, json=counts)
+            result.raise_for_status()
+            bulk_elapsed = time.perf_counter() - started
+        bulk_statements = counter.count
+        db.expire_all()
+        bulk_stock, history_bulk = state(db, product_ids)
+    finally:
+        db.close()
+
+    print(f"{len(counts)} products, {changed} changed")
+    print(f"single: {single_elapsed:.2f}s, {single_statements} statements, {history_single - history_before} history rows")
+    print(f"bulk:   {bulk_elapsed:.2f}s, {bulk_statements} statements, {history_bulk - history_reset} history rows")
+    print(f"speedup: {single_elapsed / bulk_elapsed:.1f}x")
+
+    ok = True
+    if bulk_stock != single_stock:
+        ok = False
+        print("FAIL stock differs between the single and bulk updates")
+    if history_bulk - history_reset != changed or history_single - history_before != changed:
+        ok = False
+        print(f"FAIL expected {changed} history rows per run")
+    if result.json()["updated"] != changed:
+        ok = False
+        print(f"FAIL bulk reported {result.json()['updated']} updated rows, expected {changed}")
+    return 0 if ok else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,92 @@
+"""
+Compare orders/second of the single-order create_sale path against
+create_sales_bulk. Writes real rows, so point DATABASE_URL at a scratch database.
+
+    python -m benchmarks.bulk_sales --orders 2000
+"""
+import argparse
+import random
+import time
+import uuid
+from datetime import datetime, timedelta
+from app.database import SessionLocal, engine, Base
+from app import models, schemas
+from app.services import sales_service
+
+Base.metadata.create_all(bind=engine)
+
+def ensure_products(db, count: int = 50):
+    products = db.query(models.Product).limit(count).all()
+    if products:
+        return products
+
+    category = models.Category(name=f"Benchmark {uuid.uuid4().hex[:8]}")
+    db.add(category)
+    db.flush()
+    for i in range(count):
+        product = models.Product(
+            name=f"Benchmark product {i}",
+            price=round(random.uniform(10.0, 500.0), 2),
+            sku=f"BENCH-{uuid.uuid4().hex[:12]}",
+            category_id=category.id
+        )
+        db.add(product)
+        db.flush()
+        db.add(models.Inventory(product_id=product.id, quantity=1_000_000, low_stock_threshold=10))
+    db.commit()
+    return db.query(models.Product).limit(count).all()
+
+def generate_orders(products, count: int, prefix: str):
+    orders = []
+    now = datetime.now()
+    for i in range(count):
+        items = []
+        for product in random.sample(products, min(len(products), random.randint(1, 3))):
+            quantity = random.randint(1, 5)
+            items.append(schemas.sales.SaleItemCreate(
+                product_id=product.id,
+                quantity=quantity,
+                unit_price=product.price,
+                subtotal=round(product.price * quantity, 2)
+            ))
+        orders.append(schemas.SaleCreate(
+            order_id=f"{prefix}-{i}",
+            order_date=now - timedelta(minutes=random.randint(0, 60 * 24 * 30)),
+            customer_id=f"CUST-{random.randint(1000, 9999)}",
+            total_amount=round(sum(item.subtotal for item in items), 2),
+            platform=random.choice(["Amazon", "Walmart"]),
+            items=items
+        ))
+    return orders
+
+def run(orders: int, batch_size: int):
+    db = SessionLocal()
+    try:
+        products = ensure_products(db)
+        run_id = uuid.uuid4().hex[:8]
+
+        single_orders = generate_orders(products, orders, f"BENCH-SINGLE-{run_id}")
+        started = time.perf_counter()
+        for order in single_orders:
+            sales_service.create_sale(db=db, sale=order)
+        single_elapsed = time.perf_counter() - started
+
+        bulk_orders = generate_orders(products, orders, f"BENCH-BULK-{run_id}")
+        started = time.perf_counter()
+        result = sales_service.create_sales_bulk(db=db, sales=bulk_orders, batch_size=batch_size)
+        bulk_elapsed = time.perf_counter() - started
+
+        single_rate = orders / single_elapsed
+        bulk_rate = result["created"] / bulk_elapsed
+        print(f"single: {orders} orders in {single_elapsed:.2f}s ({single_rate:,.0f} orders/s)")
+        print(f"bulk:   {result['created']} orders in {bulk_elapsed:.2f}s ({bulk_rate:,.0f} orders/s), {result['failed']} failed")
+        print(f"speedup: {bulk_rate / single_rate:.1f}x")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark single vs bulk sale ingestion")
+    parser.add_argument("--orders", type=int, default=2000, help="Orders per path")
+    parser.add_argument("--batch-size", type=int, default=500, help="Bulk batch size")
+    args = parser.parse_args()
+    run(args.orders, args.batch_size)
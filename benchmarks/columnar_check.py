@@ -0,0 +1,119 @@
+"""
+Checks the columnar analytics engine against the SQL path and compares their
+latency. Every analytics function is run with both engines (cache bypassed)
+over several windows, period types and filters. Results must be equal, with
+float figures rounded to cents first: the engines sum in different orders, so
+only the unrounded floats may differ. Exits non-zero on a mismatch.
+
+    python -m benchmarks.columnar_check --days 365
+"""
+import argparse
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+from app.database import SessionLocal
+from app import models
+from app.services import columnar_service, materialized_views, sales_service
+
+PERIOD_TYPES = ("daily", "weekly", "monthly", "yearly")
+
+def same(sql, columnar, path="result"):
+    """
+    Compare two results; returns a description of the first difference or None
+    """
+    if isinstance(sql, dict) and isinstance(columnar, dict):
+        if sql.keys() != columnar.keys():
+            return f"{path}: keys {sorted(sql)} != {sorted(columnar)}"
+        for key in sql:
+            difference = same(sql[key], columnar[key], f"{path}.{key}")
+            if difference:
+                return difference
+        return None
+    if isinstance(sql, list) and isinstance(columnar, list):
+        if len(sql) != len(columnar):
+            return f"{path}: {len(sql)} rows != {len(columnar)} rows"
+        for index, (a, b) in enumerate(zip(sql, columnar)):
+            difference = same(a, b, f"{path}[{index}]")
+            if difference:
+                return difference
+        return None
+    if isinstance(sql, float) or isinstance(columnar, float):
+        if sql is not None and columnar is not None and round(sql, 2) == round(columnar, 2):
+            return None
+    elif sql == columnar:
+        return None
+    return f"{path}: {sql!r} != {columnar!r}"
+
+def normalized(result):
+    # Row order of the summary lists is not defined by the SQL path
+    if isinstance(result, dict) and "platforms" in result:
+        result = dict(result)
+        result.pop("top_products_refreshed_at")
+        result["platforms"] = sorted(result["platforms"], key=lambda p: p["platform"] or "")
+        result["top_products"] = sorted(result["top_products"], key=lambda p: (-p["total_quantity"], p["id"]))
+    return result
+
+def timed(call):
+    started = time.perf_counter()
+    result = call()
+    return result, (time.perf_counter() - started) * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--days", type=int, default=365, help="Length of the longest window")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        # The SQL top products read the materialized view for whole days
+        materialized_views.refresh_view()
+        started = time.perf_counter()
+        columnar_service.columnar_store.catch_up(db)
+        print(f"loaded {columnar_service.columnar_store.stats()} in {time.perf_counter() - started:.2f}s")
+
+        platform = db.query(models.Sale.platform).filter(models.Sale.platform.isnot(None)).limit(1).scalar()
+        category_id = db.query(models.Category.id).order_by(models.Category.id).limit(1).scalar()
+        end = datetime.now()
+        # Partial-day bounds exercise the rollup edges of the SQL path
+        windows = [
+            (end - timedelta(days=args.days), end),
+            (end - timedelta(days=30, hours=5), end - timedelta(days=2, hours=7)),
+            ((end - timedelta(days=7)).date(), end.date()),
+        ]
+
+        cases = []
+        for start, stop in windows:
+            cases.append(("summary", sales_service.get_sales_summary.uncached, dict(start_date=start, end_date=stop)))
+            for period_type in PERIOD_TYPES:
+                for filters in ({}, {"platform": platform}, {"category_id": category_id},
+                                {"platform": platform, "category_id": category_id}):
+                    cases.append((f"revenue {period_type} {filters}", sales_service.get_revenue_by_period.uncached,
+                                  dict(period_type=period_type, start_date=start, end_date=stop, **filters)))
+            span = stop - start
+            for filters in ({}, {"category_id": category_id}):
+                cases.append((f"compare {filters}", sales_service.compare_revenue.uncached,
+                              dict(period_type="daily", current_start=start, current_end=stop,
+                                   previous_start=start - span, previous_end=start, **filters)))
+
+        failures = 0
+        sql_times, columnar_times = [], []
+        for name, function, params in cases:
+            sql, sql_ms = timed(lambda: function(db, engine="sql", **params))
+            columnar, columnar_ms = timed(lambda: function(db, engine="columnar", **params))
+            sql_times.append(sql_ms)
+            columnar_times.append(columnar_ms)
+            difference = same(normalized(sql), normalized(columnar))
+            if difference:
+                failures += 1
+                print(f"FAIL {name}: {difference}")
+
+        print(f"{len(cases) - failures}/{len(cases)} cases match")
+        print(f"median latency: sql {statistics.median(sql_times):.2f} ms, "
+              f"columnar {statistics.median(columnar_times):.2f} ms")
+        return 1 if failures else 0
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,59 @@
+"""
+Diff two benchmark result files written by benchmarks.suite
+
+    python -m benchmarks.compare before.json after.json --fail-on-regression 10
+"""
+import argparse
+import json
+import sys
+
+METRICS = [
+    # name, lower is better
+    ("p50_ms", True),
+    ("p95_ms", True),
+    ("p99_ms", True),
+    ("throughput_rps", False),
+    ("statements", True),
+]
+
+def change(before, after):
+    if not before:
+        return 0.0
+    return (after - before) / before * 100
+
+def compare(before: dict, after: dict, threshold: float = None):
+    regressions = []
+    names = [name for name in after["endpoints"] if name in before["endpoints"]]
+    print(f"{'endpoint':40} " + " ".join(f"{metric:>22}" for metric, _ in METRICS))
+    for name in names:
+        old, new = before["endpoints"][name], after["endpoints"][name]
+        cells = []
+        for metric, lower_is_better in METRICS:
+            delta = change(old[metric], new[metric])
+            cells.append(f"{old[metric]:>8.1f}->{new[metric]:>8.1f} {delta:+5.0f}%")
+            worse = delta > 0 if lower_is_better else delta < 0
+            if threshold is not None and worse and abs(delta) > threshold:
+                regressions.append(f"{name} {metric} {delta:+.1f}%")
+        print(f"{name:40} " + " ".join(cells))
+
+    for name in sorted(set(before["endpoints"]) ^ set(after["endpoints"])):
+        print(f"{name:40} only in {'before' if name in before['endpoints'] else 'after'}")
+    return regressions
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare two benchmark result files")
+    parser.add_argument("before")
+    parser.add_argument("after")
+    parser.add_argument("--fail-on-regression", type=float, default=None, metavar="PERCENT",
+                        help="Exit non-zero if any metric gets worse by more than this")
+    args = parser.parse_args()
+
+    with open(args.before) as f:
+        before = json.load(f)
+    with open(args.after) as f:
+        after = json.load(f)
+
+    regressions = compare(before, after, args.fail_on_regression)
+    if regressions:
+        print("\nRegressions:\n  " + "\n  ".join(regressions))
+        sys.exit(1)
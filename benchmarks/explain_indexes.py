@@ -0,0 +1,101 @@
+"""
+Before/after EXPLAIN ANALYZE timings for the analytics indexes from migrations
+0002 and 0003. Each query is explained with the indexes in place, then again inside a
+transaction that drops them and is rolled back, so the schema is unchanged
+afterwards. DROP INDEX takes an exclusive lock: use a scratch database loaded
+with a large dataset.
+
+    python -m benchmarks.explain_indexes --days 365
+"""
+import argparse
+import json
+from datetime import datetime, timedelta
+from sqlalchemy import text
+from app.database import engine
+
+INDEXES = [
+    "ix_sales_order_date_platform",
+    "ix_sale_items_sale_id",
+    "ix_sale_items_product_id_sale_id",
+    "ix_inventory_low_stock",
+    "ix_sale_items_category_id_order_date",
+]
+
+# SQL equivalents of the sales_service / inventory_service query shapes
+QUERIES = {
+    "summary_totals": """
+        SELECT count(sales.id), sum(sales.total_amount)
+        FROM sales WHERE sales.order_date BETWEEN :start AND :end
+    """,
+    "summary_platforms": """
+        SELECT sales.platform, count(sales.id), sum(sales.total_amount)
+        FROM sales WHERE sales.order_date BETWEEN :start AND :end
+        GROUP BY sales.platform
+    """,
+    "summary_top_products": """
+        SELECT products.id, products.name, sum(sale_items.quantity), sum(sale_items.subtotal)
+        FROM products
+        JOIN sale_items ON products.id = sale_items.product_id
+        JOIN sales ON sale_items.sale_id = sales.id
+        WHERE sales.order_date BETWEEN :start AND :end
+        GROUP BY products.id, products.name
+        ORDER BY sum(sale_items.quantity) DESC LIMIT 5
+    """,
+    "revenue_by_category": """
+        SELECT date(sale_items.order_date), sum(sale_items.subtotal), count(DISTINCT sale_items.sale_id)
+        FROM sale_items
+        WHERE sale_items.category_id = :category_id AND sale_items.order_date BETWEEN :start AND :end
+        GROUP BY date(sale_items.order_date)
+    """,
+    "low_stock_alerts": """
+        SELECT inventory.* FROM inventory
+        WHERE inventory.quantity <= inventory.low_stock_threshold
+        ORDER BY inventory.id
+    """,
+}
+
+def explain(connection, sql: str, params: dict):
+    plan = connection.execute(
+        text("EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) " + sql), params
+    ).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    root = plan[0]
+    return root["Execution Time"], root["Plan"]["Node Type"]
+
+def run(days: int, category_id: int, repeat: int):
+    end = datetime.now()
+    params = {"start": end - timedelta(days=days), "end": end, "category_id": category_id}
+
+    def timings(connection):
+        results = {}
+        for name, sql in QUERIES.items():
+            # Best of N to take cache warm-up out of the comparison
+            runs = [explain(connection, sql, params) for _ in range(repeat)]
+            results[name] = min(runs, key=lambda run: run[0])
+        return results
+
+    with engine.connect() as connection:
+        with connection.begin():
+            after = timings(connection)
+
+        transaction = connection.begin()
+        try:
+            for index in INDEXES:
+                connection.execute(text(f"DROP INDEX IF EXISTS {index}"))
+            before = timings(connection)
+        finally:
+            transaction.rollback()
+
+    print(f"{'query':24} {'without indexes':>26} {'with indexes':>26}")
+    for name in QUERIES:
+        (before_ms, before_node), (after_ms, after_node) = before[name], after[name]
+        print(f"{name:24} {before_ms:>10.2f} ms {before_node:>13} {after_ms:>10.2f} ms {after_node:>13}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="EXPLAIN ANALYZE the analytics queries with and without the 0002 indexes")
+    parser.add_argument("--days", type=int, default=30, help="Size of the date window")
+    parser.add_argument("--category-id", type=int, default=1)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    run(args.days, args.category_id, args.repeat)
@@ -0,0 +1,157 @@
+"""
+Concurrent sales of a few hot products. Several writer threads create orders
+through create_sale, first with the read-modify-write inventory update it used
+to do and then with the atomic decrement, and the final stock of every product
+is checked against the units sold. A strict-mode run then oversells on purpose
+and checks that stock never goes below 0 and that every accepted unit was
+taken out of stock. Writes real rows, so point DATABASE_URL at a scratch
+database. Exits non-zero if the atomic path loses an update.
+
+    python -m benchmarks.inventory_contention --writers 16 --orders 200
+"""
+import argparse
+import random
+import sys
+import threading
+import time
+import uuid
+from unittest import mock
+from fastapi import HTTPException
+from app import models, schemas
+from app.database import SessionLocal
+from app.services import inventory_service, sales_service
+from benchmarks.bulk_sales import ensure_products
+
+def legacy_decrement(db, quantities, strict=None):
+    # What create_sale did before: read each row, compute in Python, write back
+    for product_id, quantity in quantities.items():
+        inventory = db.query(models.Inventory).filter(models.Inventory.product_id == product_id).first()
+        if inventory:
+            inventory.quantity = max(0, inventory.quantity - quantity)
+    db.flush()
+    return {}
+
+def make_order(products, prefix: str, index: int):
+    items = []
+    for product in random.sample(products, random.randint(1, len(products))):
+        quantity = random.randint(1, 3)
+        items.append(schemas.sales.SaleItemCreate(
+            product_id=product.id,
+            quantity=quantity,
+            unit_price=product.price,
+            subtotal=round(product.price * quantity, 2)
+        ))
+    return schemas.SaleCreate(
+        order_id=f"{prefix}-{index}",
+        customer_id=f"CUST-{random.randint(1000, 9999)}",
+        total_amount=round(sum(item.subtotal for item in items), 2),
+        platform="Amazon",
+        items=items
+    )
+
+def set_stock(products, quantity: int):
+    db = SessionLocal()
+    try:
+        db.query(models.Inventory).filter(
+            models.Inventory.product_id.in_([product.id for product in products])
+        ).update({models.Inventory.quantity: quantity}, synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+
+def stock(products):
+    db = SessionLocal()
+    try:
+        return dict(db.query(models.Inventory.product_id, models.Inventory.quantity).filter(
+            models.Inventory.product_id.in_([product.id for product in products])
+        ))
+    finally:
+        db.close()
+
+def run(products, writers: int, orders: int, strict: bool = False):
+    """
+    Returns (orders/s, units sold per product, rejected orders, failed orders)
+    """
+    prefix = f"CONTENTION-{uuid.uuid4().hex[:8]}"
+    sold = {product.id: 0 for product in products}
+    outcome = {"rejected": 0, "failed": 0}
+    lock = threading.Lock()
+
+    def writer(number: int):
+        db = SessionLocal()
+        try:
+            for index in range(orders):
+                order = make_order(products, f"{prefix}-{number}", index)
+                try:
+                    sales_service.create_sale(db, order)
+                except HTTPException:
+                    db.rollback()
+                    with lock:
+                        outcome["rejected"] += 1
+                    continue
+                except Exception:
+                    db.rollback()
+                    with lock:
+                        outcome["failed"] += 1
+                    continue
+                with lock:
+                    for item in order.items:
+                        sold[item.product_id] += item.quantity
+        finally:
+            db.close()
+
+    threads = [threading.Thread(target=writer, args=(number,)) for number in range(writers)]
+    with mock.patch.object(inventory_service, "INVENTORY_STRICT_STOCK", strict):
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+    return writers * orders / elapsed, sold, outcome["rejected"], outcome["failed"]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--writers", type=int, default=16)
+    parser.add_argument("--orders", type=int, default=200, help="Orders per writer")
+    parser.add_argument("--products", type=int, default=3, help="Number of hot products")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        products = ensure_products(db)[:args.products]
+    finally:
+        db.close()
+    initial = 10_000_000
+    ok = True
+
+    for name, patch in (("read-modify-write", legacy_decrement), ("atomic", None)):
+        set_stock(products, initial)
+        if patch is None:
+            rate, sold, _, failed = run(products, args.writers, args.orders)
+        else:
+            with mock.patch.object(inventory_service, "decrement_stock", patch):
+                rate, sold, _, failed = run(products, args.writers, args.orders)
+        final = stock(products)
+        lost = sum(final[product_id] - (initial - units) for product_id, units in sold.items())
+        print(f"{name:<18} {rate:>8,.0f} orders/s  {failed} failed  {lost} units of lost decrements")
+        if patch is None and (lost or failed):
+            ok = False
+            print("FAIL atomic decrement lost updates or failed orders")
+
+    # Strict mode: far fewer units in stock than the writers try to buy
+    per_product = args.writers * args.orders // 4
+    set_stock(products, per_product)
+    rate, sold, rejected, failed = run(products, args.writers, args.orders, strict=True)
+    final = stock(products)
+    print(f"{'strict':<18} {rate:>8,.0f} orders/s  {rejected} rejected  {failed} failed  final stock {final}")
+    for product_id, units in sold.items():
+        if final[product_id] < 0 or final[product_id] != per_product - units:
+            ok = False
+            print(f"FAIL product {product_id}: sold {units} of {per_product}, {final[product_id]} left")
+
+    set_stock(products, initial)
+    return 0 if ok else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,93 @@
+"""
+Concurrent HTTP load generator shared by the benchmark scripts
+"""
+import asyncio
+import os
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+from typing import Callable, Optional, Tuple
+import httpx
+
+# make_request(i) -> (method, path, json body or None)
+RequestFactory = Callable[[int], Tuple[str, str, Optional[object]]]
+
+def percentile(sorted_values, q: float):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(q * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+async def wait_until_ready(base_url: str, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient(base_url=base_url) as client:
+        while time.monotonic() < deadline:
+            try:
+                if (await client.get("/")).status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError(f"Server at {base_url} did not start")
+
+async def run_load(base_url: str, make_request: RequestFactory, concurrency: int, total: int,
+                   timeout: float = 60.0):
+    """
+    Send total requests with at most concurrency in flight and return latency
+    percentiles (ms), throughput (requests/s) and the error count
+    """
+    latencies = []
+    errors = 0
+    next_index = 0
+
+    async def worker(client):
+        nonlocal errors, next_index
+        while next_index < total:
+            index = next_index
+            next_index += 1
+            method, path, body = make_request(index)
+            started = time.perf_counter()
+            try:
+                response = await client.request(method, path, json=body)
+                if response.status_code >= 400:
+                    errors += 1
+            except httpx.HTTPError:
+                errors += 1
+            latencies.append(time.perf_counter() - started)
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=timeout) as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "requests": total,
+        "errors": errors,
+        "duration_s": elapsed,
+        "throughput_rps": total / elapsed if elapsed else 0.0,
+        "mean_ms": sum(latencies) / len(latencies) * 1000 if latencies else 0.0,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p95_ms": percentile(latencies, 0.95) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+    }
+
+@contextmanager
+def local_server(port: int, env: Optional[dict] = None, workers: int = 1):
+    """
+    Run uvicorn app.main:app on localhost for the duration of the block
+    """
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port),
+         "--workers", str(workers), "--log-level", "warning"],
+        env=dict(os.environ, **(env or {}))
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        asyncio.run(wait_until_ready(base_url))
+        yield base_url
+    finally:
+        server.terminate()
+        server.wait()
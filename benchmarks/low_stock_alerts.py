@@ -0,0 +1,146 @@
+"""
+Polling the low-stock listing against the pushed alerts. Times the
+GET /inventory/low-stock/alerts query and the snapshot a stream starts with,
+then subscribes to the alerts, takes a few products below their threshold
+through decrement_stock (the sale path) and back above it through
+update_inventory, and reports how long each alert took from the write to
+the subscriber. A decrement that is rolled back must raise no alert. Writes real
+rows, so point DATABASE_URL at a scratch database. Exits non-zero if an alert
+is missing, duplicated or raised for a rolled back change.
+
+    python -m benchmarks.low_stock_alerts --products 20
+"""
+import argparse
+import asyncio
+import sys
+import time
+from sqlalchemy import text
+from app import models, schemas
+from app.database import SessionLocal, engine
+from app.services import inventory_service, stock_alerts
+
+def time_calls(call, repeat: int):
+    db = SessionLocal()
+    try:
+        started = time.perf_counter()
+        for _ in range(repeat):
+            result = call(db)
+            db.rollback()
+        return (time.perf_counter() - started) / repeat * 1000, len(result)
+    finally:
+        db.close()
+
+def explain_snapshot():
+    inventory = models.Inventory
+    db = SessionLocal()
+    try:
+        query = db.query(inventory.product_id, inventory.id, inventory.quantity, inventory.low_stock_threshold).filter(
+            inventory.quantity <= inventory.low_stock_threshold
+        ).order_by(inventory.id)
+        statement = query.statement.compile(engine, compile_kwargs={"literal_binds": True})
+        return [line for (line,) in db.execute(text(f"EXPLAIN {statement}"))]
+    finally:
+        db.close()
+
+def pick_products(count: int):
+    # Products above their threshold, to be taken below it and back
+    db = SessionLocal()
+    try:
+        inventory = models.Inventory
+        return db.query(inventory.product_id, inventory.quantity, inventory.low_stock_threshold).filter(
+            inventory.quantity > inventory.low_stock_threshold
+        ).order_by(inventory.product_id).limit(count).all()
+    finally:
+        db.close()
+
+def set_quantity(product_id: int, quantity: int):
+    db = SessionLocal()
+    try:
+        inventory_service.update_inventory(db, product_id, schemas.InventoryUpdate(quantity=quantity), "benchmark")
+    finally:
+        db.close()
+
+def decrement(quantities, commit: bool = True):
+    db = SessionLocal()
+    try:
+        inventory_service.decrement_stock(db, quantities)
+        if commit:
+            db.commit()
+        else:
+            db.rollback()
+    finally:
+        db.close()
+
+async def push(products, timeout: float):
+    """
+    Returns (alerts received, latencies from the write to delivery in ms)
+    """
+    loop = asyncio.get_running_loop()
+    subscription = stock_alerts.stock_alert_hub.subscribe()
+    received = []
+    latencies = []
+    try:
+        for product_id, quantity, threshold in products:
+            # A rolled back sale raises nothing; then below the threshold in one
+            # sale and back above it with a stock count
+            await loop.run_in_executor(None, decrement, {product_id: quantity - threshold}, False)
+            committed = time.perf_counter()
+            await loop.run_in_executor(None, decrement, {product_id: quantity - threshold})
+            for step in ("sold", "restocked"):
+                try:
+                    events = await asyncio.wait_for(subscription.queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    print(f"FAIL no alert for product {product_id} after it was {step}")
+                    break
+                latencies.append((time.perf_counter() - committed) * 1000)
+                received.extend(events or [])
+                if step == "sold":
+                    committed = time.perf_counter()
+                    await loop.run_in_executor(None, set_quantity, product_id, quantity)
+        # Anything left over was not expected
+        await asyncio.sleep(0.5)
+        while not subscription.queue.empty():
+            received.extend(subscription.queue.get_nowait() or [])
+    finally:
+        stock_alerts.stock_alert_hub.unsubscribe(subscription)
+    return received, latencies
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--products", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=50, help="Polls timed per query")
+    parser.add_argument("--timeout", type=float, default=5.0, help="Seconds to wait for an alert")
+    args = parser.parse_args()
+
+    listing_ms, listed = time_calls(inventory_service.get_low_stock_alerts, args.repeat)
+    snapshot_ms, _ = time_calls(inventory_service.get_low_stock_snapshot, args.repeat)
+    print(f"{listed} products low on stock")
+    print(f"alerts listing: {listing_ms:.2f} ms per poll")
+    print(f"stream snapshot: {snapshot_ms:.2f} ms")
+    for line in explain_snapshot():
+        print(f"    {line}")
+
+    products = pick_products(args.products)
+    listener = stock_alerts.stock_alert_listener
+    listener.start()
+    try:
+        # Wait for the listener to connect; connecting closes earlier subscriptions
+        time.sleep(1.0)
+        received, latencies = asyncio.run(push(products, args.timeout))
+    finally:
+        listener.stop()
+
+    ok = True
+    expected = [(product_id, low) for product_id, _, _ in products for low in (True, False)]
+    actual = [(event["product_id"], event["low_stock"]) for event in received]
+    if actual != expected:
+        ok = False
+        print(f"FAIL expected {len(expected)} alerts in order, received {len(actual)}")
+    if latencies:
+        latencies.sort()
+        print(f"{len(latencies)} alerts, write to subscriber p50 {latencies[len(latencies) // 2]:.1f} ms, "
+              f"max {latencies[-1]:.1f} ms")
+    return 0 if ok else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
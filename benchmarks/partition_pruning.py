@@ -0,0 +1,111 @@
+"""
+Partition pruning of the analytics queries on the partitioned sales tables.
+Runs the sales_service analytics functions (cache bypassed, SQL engine) over
+their default 30-day and 365-day windows, captures the statements they issue
+and EXPLAIN ANALYZEs each one, reporting how many of the monthly partitions
+of sales and sale_items it scanned. Exits non-zero if a date-bounded
+statement scans every partition of a table that has more than the window needs.
+
+    python -m benchmarks.partition_pruning
+"""
+import argparse
+import json
+import re
+import sys
+from datetime import datetime, timedelta
+from sqlalchemy import event
+from app import partitions
+from app.database import SessionLocal, engine
+from app.services import sales_service
+
+# A range condition on the partition key, which pruning can use
+DATE_BOUNDED = re.compile(r"order_date\)? (BETWEEN|>=|>|<=|<) ")
+
+def capture(call):
+    """
+    Run call() and return the (statement, parameters) it executed
+    """
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        call()
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+    return statements
+
+def scanned_relations(plan, found=None):
+    found = set() if found is None else found
+    if "Relation Name" in plan:
+        found.add(plan["Relation Name"])
+    for child in plan.get("Plans", []):
+        scanned_relations(child, found)
+    return found
+
+def explain(statement: str, parameters):
+    connection = engine.raw_connection()
+    try:
+        cursor = connection.cursor()
+        cursor.execute("EXPLAIN (ANALYZE, FORMAT JSON) " + statement, parameters)
+        plan = cursor.fetchone()[0]
+        connection.rollback()
+    finally:
+        connection.close()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return plan[0]["Execution Time"], scanned_relations(plan[0]["Plan"])
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.parse_args()
+
+    with engine.connect() as connection:
+        all_partitions = {
+            table: {name for name, _ in partitions.monthly_partitions(connection, table)}
+            for table in sales_service.SALES_TABLES
+        }
+    print(", ".join(f"{table}: {len(names)} partitions" for table, names in all_partitions.items()))
+
+    end = datetime.now()
+    cases = [
+        ("summary, 30 days", lambda db: sales_service.get_sales_summary.uncached(
+            db, start_date=end - timedelta(days=30), end_date=end, engine="sql")),
+        ("revenue daily, default 30 days", lambda db: sales_service.get_revenue_by_period.uncached(
+            db, period_type="daily", end_date=end, engine="sql")),
+        ("revenue monthly, default 365 days", lambda db: sales_service.get_revenue_by_period.uncached(
+            db, period_type="monthly", end_date=end, engine="sql")),
+        ("sales list, 30 days", lambda db: sales_service.get_sales(
+            db, start_date=end - timedelta(days=30), end_date=end, limit=100)),
+        ("sales list, 365 days", lambda db: sales_service.get_sales(
+            db, start_date=end - timedelta(days=365), end_date=end, limit=100)),
+    ]
+
+    ok = True
+    db = SessionLocal()
+    try:
+        for name, call in cases:
+            for statement, parameters in capture(lambda: call(db)):
+                if not statement.lstrip().upper().startswith(("SELECT", "WITH")):
+                    continue
+                elapsed, relations = explain(statement, parameters)
+                counts = []
+                for table, names in all_partitions.items():
+                    scanned = relations & names
+                    if scanned:
+                        counts.append(f"{table} {len(scanned)}/{len(names)}")
+                    # A 365-day window needs at most 14 monthly partitions
+                    if len(names) > 14 and scanned == names and DATE_BOUNDED.search(statement):
+                        ok = False
+                        counts[-1] += " NOT PRUNED"
+                if counts:
+                    print(f"{name:<34} {elapsed:>9.2f} ms  {', '.join(counts)}")
+            db.rollback()
+    finally:
+        db.close()
+    return 0 if ok else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,98 @@
+"""
+Product lookups through the catalog cache against direct queries, and its
+consistency after writes. Starts a cache listener, reads random products by id
+and SKU, then renames products both through product_service and from a
+separate connection standing in for another worker, and checks that the next
+read returns the new name. Exits non-zero on a stale read.
+
+    python -m benchmarks.product_cache --lookups 20000
+"""
+import argparse
+import random
+import sys
+import time
+from sqlalchemy import text
+from app import models, schemas
+from app.database import SessionLocal, engine
+from app.services import product_cache, product_service
+
+def timed_lookups(db, products, lookups: int):
+    started = time.perf_counter()
+    for _ in range(lookups):
+        product_id, sku = random.choice(products)
+        if random.random() < 0.5:
+            product_service.get_product(db, product_id)
+        else:
+            product_service.get_product_by_sku(db, sku)
+        # A fresh identity map per lookup, as every request has its own session
+        db.expunge_all()
+    elapsed = time.perf_counter() - started
+    return lookups / elapsed if elapsed else 0.0
+
+def read_name(db, sku: str):
+    db.expunge_all()
+    return product_service.get_product_by_sku(db, sku).name
+
+def wait_until(condition, timeout: float = 5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--lookups", type=int, default=20000)
+    parser.add_argument("--writes", type=int, default=20, help="Renames checked for stale reads")
+    args = parser.parse_args()
+
+    cache = product_cache.product_cache
+    listener = product_cache.product_cache_listener
+    listener.start()
+    if product_cache.PRODUCT_CACHE_NOTIFY and not wait_until(lambda: cache.listening):
+        print("FAIL cache listener did not connect")
+        return 1
+
+    db = SessionLocal()
+    try:
+        products = [tuple(row) for row in db.query(models.Product.id, models.Product.sku).limit(5000)]
+        if not products:
+            print("no products, run data_generator.py first")
+            return 1
+
+        cache.maxsize, maxsize = 0, cache.maxsize
+        uncached = timed_lookups(db, products, args.lookups)
+        cache.maxsize = maxsize
+        cached = timed_lookups(db, products, args.lookups)
+        print(f"lookups/s: uncached {uncached:,.0f}, cached {cached:,.0f} ({cached / uncached:.1f}x)")
+        print(f"cache: {cache.stats()}")
+
+        stale = 0
+        for index in range(args.writes):
+            product_id, sku = random.choice(products)
+            original = product_service.get_product(db, product_id).name
+            renamed = f"{original} (check {index})"
+            # Writes from other workers only reach this one through LISTEN/NOTIFY
+            if index % 2 == 0 or not product_cache.PRODUCT_CACHE_NOTIFY:
+                product_service.update_product(db, product_id, schemas.ProductUpdate(name=renamed))
+            else:
+                with engine.begin() as connection:
+                    connection.execute(text("UPDATE products SET name = :name WHERE id = :id"),
+                                       {"name": renamed, "id": product_id})
+                    connection.execute(text("SELECT pg_notify(:channel, :payload)"),
+                                       {"channel": product_cache.PRODUCT_CACHE_CHANNEL, "payload": str(product_id)})
+            if not wait_until(lambda: read_name(db, sku) == renamed):
+                stale += 1
+                print(f"FAIL product {product_id} still read as {read_name(db, sku)!r}")
+            product_service.update_product(db, product_id, schemas.ProductUpdate(name=original))
+            db.expunge_all()
+
+        print(f"{args.writes - stale}/{args.writes} writes read back fresh, {listener.notifications} notifications")
+        return 1 if stale else 0
+    finally:
+        db.close()
+        listener.stop()
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,46 @@
+"""
+N+1 guard for the nested list/detail endpoints. Requests each endpoint at
+several page sizes against the configured database and exits non-zero if the
+number of SQL statements depends on the page size.
+
+    python -m benchmarks.query_guard
+"""
+import sys
+from fastapi.testclient import TestClient
+from app.main import app
+from app.query_counter import QueryCounter, assert_constant_query_count
+
+PAGE_SIZES = (1, 10, 100)
+
+def check(client: TestClient, name: str, path: str):
+    def call(page_size):
+        response = client.get(path.format(limit=page_size))
+        response.raise_for_status()
+
+    try:
+        counts = assert_constant_query_count(call, PAGE_SIZES)
+    except AssertionError as e:
+        print(f"FAIL {name}: {e}")
+        return False
+    print(f"ok   {name}: {counts[PAGE_SIZES[0]]} statements at every page size")
+    return True
+
+def main():
+    client = TestClient(app)
+    ok = all([
+        check(client, "GET /sales/", "/sales/?limit={limit}"),
+        check(client, "GET /products/", "/products/?limit={limit}"),
+        check(client, "GET /inventory/", "/inventory/?limit={limit}"),
+    ])
+
+    # Detail endpoint: history is one bounded keyset page whatever its length
+    inventory = client.get("/inventory/?limit=1").json()
+    if inventory:
+        with QueryCounter() as counter:
+            client.get(f"/inventory/{inventory[0]['product_id']}").raise_for_status()
+        print(f"info GET /inventory/{{product_id}}: {counter.count} statements")
+
+    return 0 if ok else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,250 @@
+"""
+End-to-end latency/throughput benchmark for every router endpoint. Optionally
+seeds a dataset, starts a local server, drives each endpoint with concurrent
+clients and records p50/p95/p99 latency, throughput and the number of SQL
+statements one request issues. Results go to a JSON file that
+benchmarks/compare.py can diff between runs.
+
+Write scenarios change the benchmarked database: they add sales, products and
+categories and rewrite stock and product descriptions. Endpoints left out:
+
+- DELETE /products/{id} and POST /inventory/ need a fresh product per
+  request, and taking seeded ones would change what the other scenarios read.
+- GET /inventory/low-stock/stream is a Server-Sent Events stream that stays
+  open, so it has no request latency to measure.
+
+    python -m benchmarks.suite --seed-sales 100000 --output results/before.json
+    python -m benchmarks.suite --output results/after.json
+    python -m benchmarks.compare results/before.json results/after.json
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import subprocess
+import uuid
+from datetime import date, datetime, timedelta
+from fastapi.testclient import TestClient
+from sqlalchemy import func
+from app.database import SessionLocal
+from app import models
+from app.main import app
+from app.query_counter import QueryCounter
+import data_generator
+from benchmarks.load import local_server, run_load
+
+def build_scenarios(db):
+    """
+    One request factory per endpoint, using ids that exist in the database
+    """
+    product = db.query(models.Product.id, models.Product.price, models.Product.category_id).join(
+        models.Inventory
+    ).first()
+    sale_id = db.query(func.max(models.Sale.id)).scalar()
+    if product is None or sale_id is None:
+        raise SystemExit("No products/sales to benchmark against; pass --seed-sales")
+    product_id, price, category_id = product
+    stocked = [
+        stocked_id for (stocked_id,) in db.query(models.Inventory.product_id).order_by(
+            models.Inventory.product_id
+        ).limit(100)
+    ]
+
+    today = date.today()
+    month_ago = today - timedelta(days=30)
+    run_id = uuid.uuid4().hex[:8]
+    order_numbers = itertools.count()
+    write_numbers = itertools.count()
+
+    # A finished job to read back; it expires like any other
+    job_id = uuid.uuid4().hex
+    now = datetime.now()
+    db.add(models.AnalyticsJob(
+        id=job_id, report="summary", key=f"bench:{run_id}", params={}, status="done", result={},
+        created_at=now, started_at=now, finished_at=now, expires_at=now + timedelta(days=1)
+    ))
+    db.commit()
+
+    def new_sale(_):
+        return ("POST", "/sales/", {
+            "order_id": f"BENCH-{run_id}-{next(order_numbers)}",
+            "order_date": datetime.now().isoformat(),
+            "customer_id": "CUST-BENCH",
+            "total_amount": price,
+            "platform": "Amazon",
+            "items": [{"product_id": product_id, "quantity": 1, "unit_price": price, "subtotal": price}]
+        })
+
+    def new_sales(_):
+        return ("POST", "/sales/bulk", [new_sale(None)[2] for _ in range(100)])
+
+    # Stock and descriptions alternate between two values, so every write changes the row
+    def set_stock(_):
+        return ("PUT", f"/inventory/{product_id}?change_reason=benchmark", {
+            "quantity": 100000 + next(write_numbers) % 2
+        })
+
+    def set_stock_bulk(_):
+        quantity = 100000 + next(write_numbers) % 2
+        return ("PUT", "/inventory/bulk?change_reason=benchmark", [
+            {"product_id": stocked_id, "quantity": quantity} for stocked_id in stocked
+        ])
+
+    def new_product(_):
+        number = next(write_numbers)
+        return ("POST", "/products/", {
+            "name": f"Benchmark product {number}",
+            "price": price,
+            "sku": f"BENCH-{run_id}-{number}",
+            "category_id": category_id
+        })
+
+    def describe_product(_):
+        return ("PUT", f"/products/{product_id}", {
+            "description": f"Benchmark description {next(write_numbers) % 2}"
+        })
+
+    def new_category(_):
+        return ("POST", "/categories/", {"name": f"Benchmark {run_id}-{next(write_numbers)}"})
+
+    def get(path):
+        return lambda _: ("GET", path, None)
+
+    def post(path):
+        return lambda _: ("POST", path, None)
+
+    compare_path = (
+        f"/sales/analytics/compare?period_type=monthly&current_start={month_ago}&current_end={today}"
+        f"&previous_start={month_ago - timedelta(days=30)}&previous_end={month_ago}"
+    )
+
+    return {
+        "GET /products/": get("/products/?limit=100"),
+        "GET /products/{id}": get(f"/products/{product_id}"),
+        "POST /products/": new_product,
+        "PUT /products/{id}": describe_product,
+        "GET /categories/": get("/categories/"),
+        "POST /categories/": new_category,
+        "GET /inventory/": get("/inventory/?limit=100"),
+        "GET /inventory/{product_id}": get(f"/inventory/{product_id}"),
+        "GET /inventory/{product_id}/history": get(f"/inventory/{product_id}/history"),
+        "GET /inventory/{product_id}/history/daily": get(f"/inventory/{product_id}/history/daily"),
+        "PUT /inventory/{product_id}": set_stock,
+        "PUT /inventory/bulk": set_stock_bulk,
+        "GET /inventory/low-stock/alerts": get("/inventory/low-stock/alerts"),
+        "GET /sales/": get("/sales/?limit=100"),
+        "GET /sales/{id}": get(f"/sales/{sale_id}"),
+        "GET /sales/export": get(f"/sales/export?start_date={today - timedelta(days=1)}&end_date={today}"),
+        "GET /sales/analytics/summary": get("/sales/analytics/summary"),
+        "GET /sales/analytics/revenue daily": get("/sales/analytics/revenue?period_type=daily"),
+        "GET /sales/analytics/revenue monthly": get("/sales/analytics/revenue?period_type=monthly"),
+        "GET /sales/analytics/series": get("/sales/analytics/series?period_type=daily"),
+        "GET /sales/analytics/compare": get(compare_path),
+        "GET /sales/analytics/cache": get("/sales/analytics/cache"),
+        # Identical submissions share the job in flight, as repeated dashboard requests would
+        "POST /sales/analytics/summary/jobs": post("/sales/analytics/summary/jobs"),
+        "POST /sales/analytics/revenue/jobs": post("/sales/analytics/revenue/jobs?period_type=monthly"),
+        "POST /sales/analytics/series/jobs": post("/sales/analytics/series/jobs?period_type=daily"),
+        "POST /sales/analytics/compare/jobs": post(compare_path.replace("/compare?", "/compare/jobs?")),
+        "GET /sales/analytics/jobs/{id}": get(f"/sales/analytics/jobs/{job_id}"),
+        "POST /sales/": new_sale,
+        "POST /sales/bulk": new_sales,
+        "GET /metrics": get("/metrics"),
+    }
+
+def count_statements(scenarios):
+    """
+    Statements issued by a single in-process request to each endpoint
+    """
+    client = TestClient(app)
+    counts = {}
+    for name, make_request in scenarios.items():
+        method, path, body = make_request(0)
+        with QueryCounter() as counter:
+            client.request(method, path, json=body)
+        counts[name] = counter.count
+    return counts
+
+def git_revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark every API endpoint")
+    parser.add_argument("--seed-sales", type=int, default=0, help="Seed this many sales first (e.g. 100000 to 10000000)")
+    parser.add_argument("--seed-days", type=int, default=365)
+    parser.add_argument("--seed-products", type=int, default=500)
+    parser.add_argument("--seed-workers", type=int, default=4)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=1000, help="Requests per endpoint")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers")
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--base-url", default=None, help="Benchmark an already running server instead of starting one")
+    parser.add_argument("--only", action="append", default=None, help="Only run endpoints whose name contains this")
+    parser.add_argument("--output", default="benchmark-results.json")
+    args = parser.parse_args()
+
+    if args.seed_sales:
+        data_generator.generate(
+            products=args.seed_products,
+            days=args.seed_days,
+            orders_per_day=args.seed_sales / args.seed_days,
+            workers=args.seed_workers
+        )
+
+    db = SessionLocal()
+    try:
+        scenarios = build_scenarios(db)
+        dataset = {
+            "sales": db.query(func.count(models.Sale.id)).scalar(),
+            "sale_items": db.query(func.count(models.SaleItem.id)).scalar(),
+            "products": db.query(func.count(models.Product.id)).scalar(),
+        }
+    finally:
+        db.close()
+
+    if args.only:
+        scenarios = {name: make for name, make in scenarios.items() if any(part in name for part in args.only)}
+
+    statements = count_statements(scenarios)
+
+    def run_all(base_url):
+        results = {}
+        for name, make_request in scenarios.items():
+            stats = asyncio.run(run_load(base_url, make_request, args.concurrency, args.requests))
+            stats["statements"] = statements[name]
+            results[name] = stats
+            print(
+                f"{name:40} p50 {stats['p50_ms']:8.1f} ms  p95 {stats['p95_ms']:8.1f} ms  "
+                f"p99 {stats['p99_ms']:8.1f} ms  {stats['throughput_rps']:8.0f} req/s  "
+                f"{stats['statements']:3} stmts  {stats['errors']} errors"
+            )
+        return results
+
+    if args.base_url:
+        endpoints = run_all(args.base_url)
+    else:
+        with local_server(args.port, workers=args.workers) as base_url:
+            endpoints = run_all(base_url)
+
+    output = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(),
+            "revision": git_revision(),
+            "concurrency": args.concurrency,
+            "requests_per_endpoint": args.requests,
+            "workers": args.workers,
+            "dataset": dataset,
+        },
+        "endpoints": endpoints,
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(output, f, indent=2)
+    print(f"Results written to {args.output}")
+
+if __name__ == "__main__":
+    main()
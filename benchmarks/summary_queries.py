@@ -0,0 +1,98 @@
+"""
+Statement count and latency of the single-statement analytics queries against
+the three-statement sales summary they replaced. Results are computed with the
+analytics cache bypassed and checked against the old queries.
+
+    python -m benchmarks.summary_queries --days 90 --repeat 20
+"""
+import argparse
+import statistics
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import text
+from app.database import SessionLocal, engine
+from app.query_counter import QueryCounter
+from app.services import sales_service
+
+# The summary as it was computed before: totals, platforms and top products
+# in separate round trips
+LEGACY_SUMMARY = [
+    """
+    SELECT count(sales.id), sum(sales.total_amount)
+    FROM sales WHERE sales.order_date BETWEEN :start AND :end
+    """,
+    """
+    SELECT sales.platform, count(sales.id), sum(sales.total_amount)
+    FROM sales WHERE sales.order_date BETWEEN :start AND :end
+    GROUP BY sales.platform
+    """,
+    """
+    SELECT products.id, products.name, sum(sale_items.quantity), sum(sale_items.subtotal)
+    FROM products
+    JOIN sale_items ON products.id = sale_items.product_id
+    JOIN sales ON sale_items.sale_id = sales.id
+    WHERE sales.order_date BETWEEN :start AND :end
+    GROUP BY products.id, products.name
+    ORDER BY sum(sale_items.quantity) DESC LIMIT 5
+    """,
+]
+
+def measure(call, repeat: int):
+    timings = []
+    with QueryCounter(engine) as counter:
+        for _ in range(repeat):
+            started = time.perf_counter()
+            result = call()
+            timings.append((time.perf_counter() - started) * 1000)
+    return result, counter.count // repeat, statistics.median(timings)
+
+def report(name: str, statements: int, median_ms: float):
+    print(f"{name:<28} {statements:>3} statements  {median_ms:8.2f} ms")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--days", type=int, default=90, help="Length of the analysed window")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    end = datetime.now()
+    start = end - timedelta(days=args.days)
+    params = {"start": start, "end": end}
+
+    db = SessionLocal()
+    try:
+        def legacy_summary():
+            return [db.execute(text(sql), params).all() for sql in LEGACY_SUMMARY]
+
+        legacy, statements, median_ms = measure(legacy_summary, args.repeat)
+        report("summary (3 queries)", statements, median_ms)
+
+        summary, statements, median_ms = measure(
+            lambda: sales_service.get_sales_summary.uncached(db, start, end), args.repeat
+        )
+        report("summary (single statement)", statements, median_ms)
+
+        (orders, revenue), = legacy[0]
+        assert summary["total_orders"] == orders, "total_orders differs from the legacy query"
+        assert abs(summary["total_revenue"] - float(revenue or 0)) < 0.01, "total_revenue differs"
+        assert len(summary["platforms"]) == len(legacy[1]), "platform rows differ"
+
+        _, statements, median_ms = measure(
+            lambda: sales_service.get_revenue_by_period.uncached(db, "daily", start, end), args.repeat
+        )
+        report("revenue by period", statements, median_ms)
+
+        previous_end = start
+        previous_start = previous_end - timedelta(days=args.days)
+        _, statements, median_ms = measure(
+            lambda: sales_service.compare_revenue.uncached(
+                db, "daily", start, end, previous_start, previous_end
+            ),
+            args.repeat
+        )
+        report("compare", statements, median_ms)
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,237 @@
+"""
+High-volume synthetic data generator.
+
+Rows are built column-wise in NumPy arrays and streamed into Postgres with
+COPY, one date range ("chunk") at a time. Each chunk draws from its own
+random stream derived from the seed and the chunk index, so the same seed
+produces the same values (dates, products, quantities, prices) no matter how
+many workers load it. Ids are taken from the tables' sequences as each chunk
+is loaded. They depend on the load order and on the rows already there, and
+so do the order ids and SKUs built from them.
+
+    python data_generator.py --products 500 --days 730 --orders-per-day 15000 --workers 8
+"""
+import argparse
+import io
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime, timedelta
+import numpy as np
+from sqlalchemy import text
+from app import partitions
+from app.database import SessionLocal, engine, Base
+from app.services import materialized_views, rollup_service
+
+# Create tables if they don't exist
+Base.metadata.create_all(bind=engine)
+
+PLATFORMS = ["Amazon", "Walmart"]
+CATEGORY_NAMES = ["Electronics", "Clothing", "Home & Kitchen", "Books", "Toys"]
+CHUNK_DAYS = 7
+
+def _copy(cursor, table: str, columns, rows):
+    """
+    COPY rows (an iterable of tab-separated lines) into table
+    """
+    buffer = io.StringIO()
+    buffer.writelines(rows)
+    buffer.seek(0)
+    cursor.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN", buffer)
+
+def _reserve_ids(cursor, table: str, count: int):
+    """
+    Take count ids from the table's serial sequence, as an array. Every id
+    comes from its own nextval, so no other writer, whether a loader or the
+    app, can be handed one of them. Concurrent writers may interleave, so the
+    ids are not necessarily consecutive.
+    """
+    cursor.execute(
+        "SELECT nextval(pg_get_serial_sequence(%s, 'id')) FROM generate_series(1, %s)", (table, count)
+    )
+    return np.array([row[0] for row in cursor.fetchall()], dtype=np.int64)
+
+def _product_weights(n_products: int, skew: float):
+    # Zipf-like popularity: product of rank r is chosen with weight 1 / r**skew
+    weights = 1.0 / np.arange(1, n_products + 1) ** skew
+    return weights / weights.sum()
+
+def create_catalog(n_products: int, seed: int):
+    """
+    Insert categories, products and inventory. Returns (product ids, prices).
+    """
+    rng = np.random.default_rng([seed, 0])
+    prices = np.round(rng.uniform(10.0, 500.0, n_products), 2)
+    category_index = rng.integers(0, len(CATEGORY_NAMES), n_products)
+    quantities = rng.integers(0, 101, n_products)
+    thresholds = rng.integers(5, 21, n_products)
+    now = datetime.now().isoformat()
+
+    connection = engine.raw_connection()
+    try:
+        cursor = connection.cursor()
+        category_ids = []
+        for name in CATEGORY_NAMES:
+            cursor.execute(
+                "INSERT INTO categories (name, description) VALUES (%s, %s) "
+                "ON CONFLICT (name) DO UPDATE SET name = EXCLUDED.name RETURNING id",
+                (name, f"Category for {name.lower()} products")
+            )
+            category_ids.append(cursor.fetchone()[0])
+
+        product_ids = _reserve_ids(cursor, "products", n_products)
+        _copy(cursor, "products", ["id", "name", "description", "price", "sku", "category_id", "created_at", "updated_at"], (
+            f"{product_id}\t{CATEGORY_NAMES[c]} item {product_id}\t\\N\t{price}\tGEN-{seed}-{product_id}\t{category_ids[c]}\t{now}\t{now}\n"
+            for product_id, price, c in zip(product_ids.tolist(), prices.tolist(), category_index.tolist())
+        ))
+        _copy(cursor, "inventory", ["product_id", "quantity", "low_stock_threshold", "last_restock_date", "created_at", "updated_at"], (
+            f"{product_id}\t{quantity}\t{threshold}\t{now}\t{now}\t{now}\n"
+            for product_id, quantity, threshold in zip(product_ids.tolist(), quantities.tolist(), thresholds.tolist())
+        ))
+        connection.commit()
+    finally:
+        connection.close()
+    return product_ids, prices
+
+def generate_chunk(chunk_index: int, start_day: date, days: int, product_ids, prices, categories,
+                   orders_per_day: float, items_per_order: int, skew: float, seed: int):
+    """
+    Generate and COPY the sales and sale items for one date range. Returns the
+    number of (sales, sale_items) rows written.
+    """
+    rng = np.random.default_rng([seed, 1, chunk_index])
+    n_products = len(product_ids)
+
+    orders_by_day = rng.poisson(orders_per_day, days)
+    n_orders = int(orders_by_day.sum())
+    if n_orders == 0:
+        return 0, 0
+
+    day_of_order = np.repeat(np.arange(days), orders_by_day)
+    seconds = rng.integers(0, 86_400, n_orders)
+    base = np.datetime64(start_day.isoformat(), "s")
+    order_dates = base + (day_of_order * 86_400 + seconds).astype("timedelta64[s]")
+    order_dates_text = np.datetime_as_string(order_dates, unit="s")
+    platforms = rng.integers(0, len(PLATFORMS), n_orders)
+    customers = rng.integers(1000, 100_000, n_orders)
+
+    items_per = rng.integers(1, items_per_order + 1, n_orders)
+    n_items = int(items_per.sum())
+    item_order = np.repeat(np.arange(n_orders), items_per)
+    item_products = rng.choice(n_products, n_items, p=_product_weights(n_products, skew))
+    quantities = rng.integers(1, 6, n_items)
+    unit_prices = prices[item_products]
+    subtotals = np.round(unit_prices * quantities, 2)
+    order_starts = np.concatenate(([0], np.cumsum(items_per)[:-1]))
+    totals = np.round(np.add.reduceat(subtotals, order_starts), 2)
+
+    connection = engine.raw_connection()
+    try:
+        cursor = connection.cursor()
+        sale_ids = _reserve_ids(cursor, "sales", n_orders)
+        _copy(cursor, "sales", ["id", "order_id", "order_date", "customer_id", "total_amount", "platform", "status", "created_at", "updated_at"], (
+            f"{sale_id}\tGEN-{seed}-{sale_id}\t{order_date}\tCUST-{customer}\t{total}\t{PLATFORMS[platform]}\tcompleted\t{order_date}\t{order_date}\n"
+            for sale_id, order_date, customer, total, platform in zip(
+                sale_ids.tolist(), order_dates_text.tolist(), customers.tolist(), totals.tolist(), platforms.tolist()
+            )
+        ))
+        _copy(cursor, "sale_items", ["sale_id", "product_id", "quantity", "unit_price", "subtotal", "category_id", "order_date", "created_at"], (
+            f"{sale_id}\t{product_id}\t{quantity}\t{unit_price}\t{subtotal}\t{category_id}\t{order_date}\t{order_date}\n"
+            for sale_id, product_id, quantity, unit_price, subtotal, category_id, order_date in zip(
+                sale_ids[item_order].tolist(), product_ids[item_products].tolist(), quantities.tolist(),
+                unit_prices.tolist(), subtotals.tolist(), categories[item_products].tolist(),
+                order_dates_text[item_order].tolist()
+            )
+        ))
+        connection.commit()
+    finally:
+        connection.close()
+    return n_orders, n_items
+
+def _generate_chunk(args):
+    return generate_chunk(*args)
+
+def _init_worker():
+    # Connections inherited from the parent process must not be reused
+    engine.dispose(close=False)
+
+def generate_sales(product_ids, prices, days: int = 365, orders_per_day: float = 10, items_per_order: int = 3,
+                   skew: float = 1.0, seed: int = 42, workers: int = 1, end_day: date = None):
+    """
+    Generate sales for the given products over the days ending today (or
+    end_day), backfill the analytics rollup for that range and refresh the
+    materialized views
+    """
+    started = time.perf_counter()
+    end_day = end_day or date.today()
+    start_day = end_day - timedelta(days=days - 1)
+    product_ids = np.asarray(product_ids)
+    prices = np.asarray(prices, dtype=np.float64)
+
+    # Sale items carry their product's category; \N is COPY's NULL
+    with engine.connect() as connection:
+        category_of = dict(connection.execute(
+            text("SELECT id, category_id FROM products WHERE id = ANY(:ids)"),
+            {"ids": product_ids.tolist()}
+        ).all())
+    categories = np.array([
+        "\\N" if category_of.get(product_id) is None else str(category_of[product_id])
+        for product_id in product_ids.tolist()
+    ], dtype=object)
+
+    # COPY into a partitioned table needs the partitions of every generated month
+    with engine.begin() as connection:
+        for table in ("sales", "sale_items"):
+            partitions.create_monthly_partitions(connection, table, start_day, end_day)
+
+    chunks = []
+    for chunk_index, offset in enumerate(range(0, days, CHUNK_DAYS)):
+        chunks.append((
+            chunk_index, start_day + timedelta(days=offset), min(CHUNK_DAYS, days - offset),
+            product_ids, prices, categories, orders_per_day, items_per_order, skew, seed
+        ))
+
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as executor:
+            results = list(executor.map(_generate_chunk, chunks))
+    else:
+        results = [_generate_chunk(chunk) for chunk in chunks]
+
+    n_sales = sum(sales for sales, _ in results)
+    n_items = sum(items for _, items in results)
+
+    with engine.begin() as connection:
+        connection.execute(text("ANALYZE sales"))
+        connection.execute(text("ANALYZE sale_items"))
+
+    db = SessionLocal()
+    try:
+        rollup_service.rebuild_sales_daily_rollup(db, start_day=start_day, end_day=end_day)
+    finally:
+        db.close()
+    materialized_views.refresh_view()
+
+    elapsed = time.perf_counter() - started
+    rows = n_sales + n_items
+    print(f"Generated {n_sales:,} sales and {n_items:,} sale items in {elapsed:.1f}s "
+          f"({rows / elapsed * 60:,.0f} rows/min)")
+    return n_sales, n_items
+
+def generate(products: int = 50, days: int = 365, orders_per_day: float = 10, items_per_order: int = 3,
+             skew: float = 1.0, seed: int = 42, workers: int = 1, end_day: date = None):
+    """
+    Generate a product catalog and its sales history
+    """
+    product_ids, prices = create_catalog(products, seed)
+    return generate_sales(product_ids, prices, days, orders_per_day, items_per_order, skew, seed, workers, end_day)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a large deterministic sales dataset")
+    parser.add_argument("--products", type=int, default=50)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--orders-per-day", type=float, default=10, help="Mean orders per day (Poisson)")
+    parser.add_argument("--items-per-order", type=int, default=3, help="Maximum line items per order")
+    parser.add_argument("--skew", type=float, default=1.0, help="Product popularity skew, 0 for uniform")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--workers", type=int, default=1, help="Parallel loader processes")
+    args = parser.parse_args()
+    generate(args.products, args.days, args.orders_per_day, args.items_per_order, args.skew, args.seed, args.workers)
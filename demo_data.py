@@ -3,6 +3,7 @@ from datetime import datetime, timedelta, date
 from sqlalchemy.orm import Session
 from app.database import SessionLocal, engine, Base
 from app import models
+import data_generator
 import string
 
 # Create tables if they don't exist
@@ -22,9 +23,9 @@ def create_demo_data():
                 name=category_name,
                 description=f"Category for {category_name.lower()} products"
             )
-            db.add(category)
-            db.flush()
             categories.append(category)
+        db.add_all(categories)
+        db.flush()
         
         # Create products
         products = []
@@ -42,93 +43,41 @@ def create_demo_data():
             for name in product_names[category.name]:
                 for platform in platforms:
                     price = round(random.uniform(10.0, 500.0), 2)
-                    product = models.Product(
+                    products.append(models.Product(
                         name=f"{name} - {platform}",
                         description=f"This is a {name.lower()} available on {platform}.",
                         price=price,
                         category_id=category.id,
                         sku=generate_sku()
-                    )
-                    db.add(product)
-                    db.flush()  # To get the product ID
-                    products.append(product)
-                    
-                    # Create inventory for each product
-                    quantity = random.randint(0, 100)
-                    threshold = random.randint(5, 20)
-                    inventory = models.Inventory(
-                        product_id=product.id,
-                        quantity=quantity,
-                        low_stock_threshold=threshold,
-                        last_restock_date=datetime.now() - timedelta(days=random.randint(0, 30))
-                    )
-                    db.add(inventory)
+                    ))
+        db.add_all(products)
+        db.flush()  # To get the product IDs
         
-        db.commit()
-        
-        # Create sales data for the past year
-        end_date = datetime.now()
-        start_date = end_date - timedelta(days=365)
-        current_date = start_date
+        # Create inventory for each product
+        for product in products:
+            quantity = random.randint(0, 100)
+            threshold = random.randint(5, 20)
+            db.add(models.Inventory(
+                product_id=product.id,
+                quantity=quantity,
+                low_stock_threshold=threshold,
+                last_restock_date=datetime.now() - timedelta(days=random.randint(0, 30))
+            ))
         
-        order_id_counter = 1000
+        db.commit()
         
-        while current_date <= end_date:
-            # Generate 5-15 sales per day
-            for _ in range(random.randint(5, 15)):
-                # Create a sale with 1-3 items
-                order_id = f"ORD-{order_id_counter}"
-                order_id_counter += 1
-                
-                platform = random.choice(platforms)
-                customer_id = f"CUST-{random.randint(1000, 9999)}"
-                
-                # Select 1-3 products for this order
-                order_products = random.sample(products, random.randint(1, 3))
-                
-                total_amount = 0
-                sale_items = []
-                
-                for product in order_products:
-                    quantity = random.randint(1, 5)
-                    unit_price = product.price
-                    subtotal = round(unit_price * quantity, 2)
-                    total_amount += subtotal
-                    
-                    sale_item = {
-                        "product_id": product.id,
-                        "quantity": quantity,
-                        "unit_price": unit_price,
-                        "subtotal": subtotal
-                    }
-                    sale_items.append(sale_item)
-                
-                # Create the sale
-                sale = models.Sale(
-                    order_id=order_id,
-                    order_date=current_date + timedelta(hours=random.randint(0, 23), minutes=random.randint(0, 59)),
-                    customer_id=customer_id,
-                    total_amount=total_amount,
-                    platform=platform,
-                    status="completed"
-                )
-                db.add(sale)
-                db.flush()
-                
-                # Add sale items
-                for item_data in sale_items:
-                    sale_item = models.SaleItem(
-                        sale_id=sale.id,
-                        product_id=item_data["product_id"],
-                        quantity=item_data["quantity"],
-                        unit_price=item_data["unit_price"],
-                        subtotal=item_data["subtotal"]
-                    )
-                    db.add(sale_item)
-            
-            current_date += timedelta(days=1)
+        # Create sales data for the past year: ~10 orders a day with 1-3 items,
+        # bulk loaded with COPY (this also backfills the analytics rollup)
+        data_generator.generate_sales(
+            [product.id for product in products],
+            [product.price for product in products],
+            days=366,
+            orders_per_day=10,
+            items_per_order=3,
+            skew=0,
+            seed=random.randrange(2 ** 32)
+        )
         
-        db.commit()
         print("Demo data created successfully!")
         
     except Exception as e:
@@ -138,4 +87,4 @@ def create_demo_data():
         db.close()
 
 if __name__ == "__main__":
-    create_demo_data()
\ No newline at end of file
+    create_demo_data()
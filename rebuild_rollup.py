@@ -0,0 +1,26 @@
+import argparse
+from datetime import date
+from app.database import SessionLocal, engine, Base
+from app import models
+from app.services import rollup_service
+
+# Create tables if they don't exist
+Base.metadata.create_all(bind=engine)
+
+def rebuild_rollup(start_day: date = None, end_day: date = None):
+    db = SessionLocal()
+    try:
+        rollup_service.rebuild_sales_daily_rollup(db, start_day=start_day, end_day=end_day)
+        print("Sales daily rollup rebuilt successfully!")
+    except Exception as e:
+        db.rollback()
+        print(f"Error rebuilding sales daily rollup: {e}")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backfill the sales_daily_rollup table from raw sales")
+    parser.add_argument("--start", type=date.fromisoformat, default=None, help="First day to rebuild (YYYY-MM-DD)")
+    parser.add_argument("--end", type=date.fromisoformat, default=None, help="Last day to rebuild (YYYY-MM-DD)")
+    args = parser.parse_args()
+    rebuild_rollup(args.start, args.end)